@@ -1,10 +1,10 @@
 import argparse
+import asyncio
 import json
 from typing import Any
 
 import tiktoken
 from beartype import beartype
-
 from webarena.agent.prompts import *
 from webarena.browser_env import Trajectory
 from webarena.browser_env.actions import (
@@ -15,10 +15,7 @@ from webarena.browser_env.actions import (
     create_playwright_action,
 )
 from webarena.browser_env.utils import Observation, StateInfo
-from webarena.llms import (
-    call_llm,
-    lm_config,
-)
+from webarena.llms import call_llm, lm_config
 from webarena.llms.tokenizers import Tokenizer
 
 
@@ -34,6 +31,16 @@ class Agent:
         """Predict the next action given the observation"""
         raise NotImplementedError
 
+    async def anext_action(
+        self, trajectory: Trajectory, intent: str, meta_data: Any
+    ) -> Action:
+        """Async version of `next_action`. By default the prediction runs
+        in a worker thread so that the event loop is not blocked by LLM
+        calls"""
+        return await asyncio.to_thread(
+            self.next_action, trajectory, intent, meta_data
+        )
+
     def reset(
         self,
         test_config_file: str,
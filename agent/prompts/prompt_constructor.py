@@ -5,6 +5,9 @@ from typing import Any, TypedDict
 
 from webarena.browser_env import Action, ActionParsingError, Trajectory
 from webarena.browser_env.env_config import URL_MAPPINGS
+from webarena.browser_env.observation_delta import (
+    render_observation_delta,
+)
 from webarena.browser_env.utils import StateInfo
 from webarena.llms import lm_config
 from webarena.llms.tokenizers import Tokenizer
@@ -119,6 +122,27 @@ class PromptConstructor(object):
     ) -> APIInput:
         raise NotImplementedError
 
+    def get_observation(self, state_info: StateInfo) -> str:
+        """The observation in the prompt. With "observation_delta" in the
+        instruction meta data, a non-keyframe observation is rendered as
+        the last keyframe observation followed by what changed since then,
+        so the prompt stays self-contained and its page part only changes
+        with the keyframes"""
+        obs = state_info["observation"][self.obs_modality]
+        if self.obs_modality != "text" or not self.instruction[
+            "meta_data"
+        ].get("observation_delta", False):
+            return obs
+        text_meta_data = state_info["info"]["observation_metadata"]["text"]
+        delta = text_meta_data.get("observation_delta")
+        if delta is None or delta["keyframe"]:
+            return obs
+        # the current tab titles with the page of the keyframe
+        tabs = obs.split("\n\n", 1)[0]
+        keyframe_page = delta["keyframe_observation"].split("\n\n", 1)[-1]
+        changes = render_observation_delta(delta)
+        return f"{tabs}\n\n{keyframe_page}\n\n{changes}"
+
     def map_url_to_real(self, url: str) -> str:
         """Map the urls to their real world counterparts"""
         for i, j in URL_MAPPINGS.items():
@@ -169,7 +193,7 @@ class DirectPromptConstructor(PromptConstructor):
         keywords = self.instruction["meta_data"]["keywords"]
         state_info: StateInfo = trajectory[-1]  # type: ignore[assignment]
 
-        obs = state_info["observation"][self.obs_modality]
+        obs = self.get_observation(state_info)
         max_obs_length = self.lm_config.gen_config["max_obs_length"]
         if max_obs_length:
             obs = self.tokenizer.decode(self.tokenizer.encode(obs)[:max_obs_length])  # type: ignore[arg-type]
@@ -227,7 +251,7 @@ class CoTPromptConstructor(PromptConstructor):
         keywords = self.instruction["meta_data"]["keywords"]
         state_info: StateInfo = trajectory[-1]  # type: ignore[assignment]
 
-        obs = state_info["observation"][self.obs_modality]
+        obs = self.get_observation(state_info)
         max_obs_length = self.lm_config.gen_config["max_obs_length"]
         if max_obs_length:
             obs = self.tokenizer.decode(self.tokenizer.encode(obs)[:max_obs_length])  # type: ignore[arg-type]
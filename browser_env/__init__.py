@@ -32,17 +32,25 @@ from .actions import (
     is_equivalent,
 )
 from .async_envs import AsyncScriptBrowserEnv
+from .async_runner import AsyncEpisodeRunner, EpisodeResult
+from .checkpoint import BrowserCheckpoint
 from .envs import ScriptBrowserEnv
-from .processors import ObservationMetadata
+from .processors import ObservationMetadata, ScreenshotConfig
+from .screencast import ScreencastConfig
 from .trajectory import Trajectory
 from .utils import DetachedPage, StateInfo
 
 __all__ = [
     "ScriptBrowserEnv",
     "AsyncScriptBrowserEnv",
+    "AsyncEpisodeRunner",
+    "EpisodeResult",
+    "BrowserCheckpoint",
     "DetachedPage",
     "StateInfo",
     "ObservationMetadata",
+    "ScreenshotConfig",
+    "ScreencastConfig",
     "Action",
     "ActionTypes",
     "action2str",
@@ -0,0 +1,403 @@
+"""Keep the accessibility tree of a page up to date from CDP events, and
+store it compactly"""
+from typing import Any, Callable
+
+import numpy as np
+import numpy.typing as npt
+from playwright.sync_api import CDPSession
+
+
+class IncrementalAccessibilityTree:
+    """The accessibility tree of the page of `client`, patched between the
+    observations with the nodes of the Accessibility.nodesUpdated events
+    instead of refetched. The new children of the updated nodes are fetched
+    with Accessibility.getChildAXNodes.
+    A new document, more than `max_dirty_ratio` of the nodes updated or
+    more than `max_child_requests` children requests fall back to
+    Accessibility.getFullAXTree."""
+
+    def __init__(
+        self,
+        client: CDPSession,
+        max_dirty_ratio: float = 0.2,
+        max_child_requests: int = 50,
+    ) -> None:
+        self.client = client
+        self.max_dirty_ratio = max_dirty_ratio
+        self.max_child_requests = max_child_requests
+        # the nodes of the tree by nodeId
+        self.nodes: dict[str, dict[str, Any]] = {}
+        self.root_id: str | None = None
+        # the nodes updated since the last fetch
+        self.updated: dict[str, dict[str, Any]] = {}
+        self.stale = True
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        client.on("Accessibility.nodesUpdated", self._on_nodes_updated)
+        client.on("Accessibility.loadComplete", self._on_load_complete)
+
+    def _on_nodes_updated(self, event: dict[str, Any]) -> None:
+        for node in event["nodes"]:
+            self.updated[node["nodeId"]] = node
+
+    def _on_load_complete(self, event: dict[str, Any]) -> None:
+        # a new document, none of the nodes are valid anymore
+        self.stale = True
+
+    def fetch(self) -> tuple[list[dict[str, Any]], int]:
+        """The nodes of the tree, the root first, and the number of CDP
+        calls made. The nodes are copies, the caller can modify them."""
+        if not self.stale and len(self.updated) <= self.max_dirty_ratio * len(
+            self.nodes
+        ):
+            calls = self._apply_updates()
+            if calls is not None:
+                nodes = self._reachable_nodes()
+                if nodes is not None:
+                    self.incremental_fetches += 1
+                    return nodes, calls
+        self._fetch_full_tree()
+        nodes = self._reachable_nodes()
+        assert nodes is not None
+        return nodes, 1
+
+    def _fetch_full_tree(self) -> None:
+        response = self.client.send("Accessibility.getFullAXTree", {})
+        # the events received while waiting for the response are older than
+        # the tree
+        self.updated = {}
+        self.stale = False
+        self.nodes = {}
+        for node in response["nodes"]:
+            # a few nodes are repeated in the accessibility tree
+            self.nodes.setdefault(node["nodeId"], node)
+        self.root_id = response["nodes"][0]["nodeId"]
+        self.full_fetches += 1
+
+    def _apply_updates(self) -> int | None:
+        """Patch the tree with the updated nodes, return the number of
+        CDP calls made, None if the budget is exceeded"""
+        updated, self.updated = self.updated, {}
+        self.nodes.update(updated)
+        calls = 0
+        # the updated nodes that have children we have not seen yet
+        parent_ids = [
+            node_id
+            for node_id, node in updated.items()
+            if any(
+                child_id not in self.nodes
+                for child_id in node.get("childIds", [])
+            )
+        ]
+        while parent_ids:
+            if calls == self.max_child_requests:
+                return None
+            parent_id = parent_ids.pop()
+            try:
+                response = self.client.send(
+                    "Accessibility.getChildAXNodes", {"id": parent_id}
+                )
+            except Exception:
+                # the node is gone
+                return None
+            calls += 1
+            for child in response["nodes"]:
+                if child["nodeId"] in self.nodes:
+                    continue
+                self.nodes[child["nodeId"]] = child
+                if child.get("childIds"):
+                    parent_ids.append(child["nodeId"])
+        return calls
+
+    def _reachable_nodes(self) -> list[dict[str, Any]] | None:
+        """Copy the nodes reachable from the root in pre-order and forget the
+        removed ones, None if the root is gone"""
+        if self.root_id not in self.nodes:
+            return None
+        nodes = []
+        reachable = {}
+        stack = [self.root_id]
+        while stack:
+            node_id = stack.pop()
+            node = self.nodes.get(node_id)  # type: ignore[arg-type]
+            if node is None or node_id in reachable:
+                continue
+            reachable[node_id] = node
+            nodes.append({**node, "childIds": list(node.get("childIds", []))})
+            stack.extend(reversed(node.get("childIds", [])))
+        self.nodes = reachable  # type: ignore[assignment]
+        return nodes
+
+
+class ColumnarAccessibilityTree:
+    """An accessibility tree stored by column instead of as CDP dicts.
+    The roles and names are codes into a table of interned strings, the
+    tree is a parent array and the child lists of all nodes in one index
+    array, and the bounding boxes are one float array, NaN where there is
+    no box. A node is addressed by its index, the root is index 0.
+
+    A node whose role or name is missing, or whose name is not a string,
+    gets the role code -1 and is rendered as nothing. A node without
+    backend node id gets -1."""
+
+    def __init__(
+        self,
+        node_ids: list[str],
+        strings: list[str],
+        role_codes: npt.NDArray[np.int32],
+        name_codes: npt.NDArray[np.int32],
+        properties: list[tuple[tuple[str, Any], ...]],
+        hover_texts: dict[int, str],
+        backend_ids: npt.NDArray[np.int64],
+        parents: npt.NDArray[np.int32],
+        child_offsets: npt.NDArray[np.int32],
+        child_indices: npt.NDArray[np.int32],
+        bounds: npt.NDArray[np.float64],
+        resolved: npt.NDArray[np.bool_],
+        bounding_box_thunk: Callable[[str], Any] | None = None,
+        union_bounds: list[Any] | None = None,
+    ) -> None:
+        self.node_ids = node_ids
+        self.strings = strings
+        self.role_codes = role_codes
+        self.name_codes = name_codes
+        self.properties = properties
+        # the hover text of the links, from the attribute name source
+        self.hover_texts = hover_texts
+        self.backend_ids = backend_ids
+        self.parents = parents
+        # the children of node i are child_indices[child_offsets[i]:
+        # child_offsets[i + 1]]
+        self.child_offsets = child_offsets
+        self.child_indices = child_indices
+        self.bounds = bounds
+        # whether the bounding box of each node is known, its row of
+        # `bounds` is NaN if it has none
+        self.resolved = resolved
+        # makes the lazy bounding box of a backend node id
+        self.bounding_box_thunk = bounding_box_thunk
+        # the bounding boxes of trees made from nodes that carry them
+        self.union_bounds = union_bounds
+
+    @classmethod
+    def from_nodes(
+        cls,
+        nodes: list[dict[str, Any]],
+        bounding_box_thunk: Callable[[str], Any] | None = None,
+    ) -> "ColumnarAccessibilityTree":
+        """Build the tree from the CDP nodes, the root first. The repeated
+        nodes are dropped, as are the children that are not in the tree.
+        The `union_bound` of the nodes, when they carry one, is kept."""
+        interned: dict[str, int] = {}
+        strings: list[str] = []
+
+        def intern(string: str) -> int:
+            code = interned.get(string)
+            if code is None:
+                code = interned[string] = len(strings)
+                strings.append(string)
+            return code
+
+        cursors: dict[str, int] = {}
+        unique_nodes = []
+        for node in nodes:
+            if node["nodeId"] not in cursors:
+                cursors[node["nodeId"]] = len(unique_nodes)
+                unique_nodes.append(node)
+
+        num_nodes = len(unique_nodes)
+        role_codes = np.full(num_nodes, -1, dtype=np.int32)
+        name_codes = np.full(num_nodes, -1, dtype=np.int32)
+        backend_ids = np.full(num_nodes, -1, dtype=np.int64)
+        parents = np.full(num_nodes, -1, dtype=np.int32)
+        child_offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+        child_indices: list[int] = []
+        properties: list[tuple[tuple[str, Any], ...]] = []
+        hover_texts: dict[int, str] = {}
+        has_bounds = any("union_bound" in node for node in unique_nodes)
+        union_bounds: list[Any] | None = [] if has_bounds else None
+        for cursor, node in enumerate(unique_nodes):
+            role = node.get("role", {}).get("value")
+            name = node.get("name", {}).get("value")
+            if role is not None and isinstance(name, str):
+                role_codes[cursor] = intern(role)
+                name_codes[cursor] = intern(name)
+            node_properties = []
+            for property in node.get("properties", []):
+                try:
+                    node_properties.append(
+                        (property["name"], property["value"]["value"])
+                    )
+                except (KeyError, TypeError):
+                    pass
+            properties.append(tuple(node_properties))
+            for source in node.get("name", {}).get("sources", []):
+                if source.get("type", "") == "attribute" and source.get(
+                    "value", {}
+                ).get("value", ""):
+                    hover_texts[cursor] = source["value"]["value"]
+                    break
+            # the node info of a node needs both
+            if "backendDOMNodeId" in node and (
+                union_bounds is None or "union_bound" in node
+            ):
+                backend_ids[cursor] = int(node["backendDOMNodeId"])
+            if union_bounds is not None:
+                union_bounds.append(node.get("union_bound"))
+            for child_id in node["childIds"]:
+                child_cursor = cursors.get(child_id)
+                if child_cursor is not None:
+                    child_indices.append(child_cursor)
+                    if parents[child_cursor] == -1:
+                        parents[child_cursor] = cursor
+            child_offsets[cursor + 1] = len(child_indices)
+
+        return cls(
+            node_ids=list(cursors),
+            strings=strings,
+            role_codes=role_codes,
+            name_codes=name_codes,
+            properties=properties,
+            hover_texts=hover_texts,
+            backend_ids=backend_ids,
+            parents=parents,
+            child_offsets=child_offsets,
+            child_indices=np.asarray(child_indices, dtype=np.int32),
+            bounds=np.full((num_nodes, 4), np.nan),
+            resolved=np.zeros(num_nodes, dtype=np.bool_),
+            bounding_box_thunk=bounding_box_thunk,
+            union_bounds=union_bounds,
+        )
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def role(self, idx: int) -> str | None:
+        code = self.role_codes[idx]
+        return None if code < 0 else self.strings[code]
+
+    def name(self, idx: int) -> str | None:
+        code = self.name_codes[idx]
+        return None if code < 0 else self.strings[code]
+
+    def nodes_with_role(self, role: str) -> npt.NDArray[np.int64]:
+        """The nodes with the role that can be shown"""
+        if role not in self.strings:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(
+            (self.role_codes == self.strings.index(role))
+            & (self.backend_ids >= 0)
+        )
+
+    def children(self, idx: int) -> npt.NDArray[np.int32]:
+        return self.child_indices[
+            self.child_offsets[idx] : self.child_offsets[idx + 1]
+        ]
+
+    def set_bounds(
+        self, indices: npt.NDArray[np.int64], bounds: npt.NDArray[np.float64]
+    ) -> None:
+        """Record the bounding boxes of the nodes, a NaN row for none"""
+        self.bounds[indices] = bounds
+        self.resolved[indices] = True
+
+    def pending_bounds(self) -> npt.NDArray[np.int64]:
+        """The nodes with a backend node id whose box is not known yet"""
+        return np.flatnonzero(~self.resolved & (self.backend_ids >= 0))
+
+    def union_bound(self, idx: int) -> Any:
+        """The lazy bounding box of the node for obs_nodes_info, None if
+        the tree has no way to resolve it"""
+        if self.union_bounds is not None:
+            return self.union_bounds[idx]
+        if self.bounding_box_thunk is None:
+            return None
+        thunk = self.bounding_box_thunk(str(self.backend_ids[idx]))
+        if self.resolved[idx]:
+            bound = self.bounds[idx]
+            thunk.bounding_box = None if np.isnan(bound[0]) else bound.tolist()
+            thunk.already_forced = True
+        return thunk
+
+    def prune(
+        self, removal_mask: npt.NDArray[np.bool_]
+    ) -> "ColumnarAccessibilityTree":
+        """The tree without the nodes in `removal_mask`, see
+        TextObservationProcessor.prune_tree. The root is kept."""
+        removal_mask = np.asarray(removal_mask, dtype=np.bool_).copy()
+        removal_mask[0] = False
+        kept = np.flatnonzero(~removal_mask)
+        new_cursors = np.cumsum(~removal_mask, dtype=np.int32) - 1
+        parents = np.full(len(kept), -1, dtype=np.int32)
+        child_offsets = np.zeros(len(kept) + 1, dtype=np.int32)
+        child_indices: list[int] = []
+        for new_cursor, cursor in enumerate(kept.tolist()):
+            stack = self.children(cursor).tolist()[::-1]
+            while stack:
+                child_cursor = stack.pop()
+                if removal_mask[child_cursor]:
+                    stack.extend(self.children(child_cursor).tolist()[::-1])
+                    continue
+                new_child_cursor = int(new_cursors[child_cursor])
+                child_indices.append(new_child_cursor)
+                if parents[new_child_cursor] == -1:
+                    parents[new_child_cursor] = new_cursor
+            child_offsets[new_cursor + 1] = len(child_indices)
+
+        kept_list = kept.tolist()
+        return ColumnarAccessibilityTree(
+            node_ids=[self.node_ids[cursor] for cursor in kept_list],
+            strings=self.strings,
+            role_codes=self.role_codes[kept],
+            name_codes=self.name_codes[kept],
+            properties=[self.properties[cursor] for cursor in kept_list],
+            hover_texts={
+                int(new_cursors[cursor]): hover_text
+                for cursor, hover_text in self.hover_texts.items()
+                if not removal_mask[cursor]
+            },
+            backend_ids=self.backend_ids[kept],
+            parents=parents,
+            child_offsets=child_offsets,
+            child_indices=np.asarray(child_indices, dtype=np.int32),
+            bounds=self.bounds[kept],
+            resolved=self.resolved[kept],
+            bounding_box_thunk=self.bounding_box_thunk,
+            union_bounds=(
+                None
+                if self.union_bounds is None
+                else [self.union_bounds[cursor] for cursor in kept_list]
+            ),
+        )
+
+    def to_nodes(self) -> list[dict[str, Any]]:
+        """The CDP dicts of the nodes, for the consumers of the dict tree"""
+        nodes = []
+        for idx, node_id in enumerate(self.node_ids):
+            node: dict[str, Any] = {
+                "nodeId": node_id,
+                "childIds": [
+                    self.node_ids[child] for child in self.children(idx)
+                ],
+                "properties": [
+                    {"name": name, "value": {"value": value}}
+                    for name, value in self.properties[idx]
+                ],
+            }
+            if self.role_codes[idx] >= 0:
+                node["role"] = {"value": self.role(idx)}
+                node["name"] = {"value": self.name(idx)}
+                if idx in self.hover_texts:
+                    node["name"]["sources"] = [
+                        {
+                            "type": "attribute",
+                            "value": {"value": self.hover_texts[idx]},
+                        }
+                    ]
+            if self.parents[idx] >= 0:
+                node["parentId"] = self.node_ids[self.parents[idx]]
+            if self.backend_ids[idx] >= 0:
+                node["backendDOMNodeId"] = int(self.backend_ids[idx])
+                node["union_bound"] = self.union_bound(idx)
+            nodes.append(node)
+        return nodes
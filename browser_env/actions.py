@@ -19,7 +19,6 @@ from playwright.async_api import BrowserContext as ABrowserContext
 from playwright.async_api import Locator as ALocator
 from playwright.async_api import Page as APage
 from playwright.sync_api import BrowserContext, Locator, Page
-
 from webarena.browser_env.constants import (
     ASCII_CHARSET,
     FREQ_UNICODE_CHARSET,
@@ -110,7 +109,9 @@ class Action(TypedDict):
 
 @beartype
 def action2str(
-    action: Action, action_set_tag: str = "id_accessibility_tree", semantic_element: str = ""
+    action: Action,
+    action_set_tag: str = "id_accessibility_tree",
+    semantic_element: str = "",
 ) -> str:
     """Return the string representation of an action
 
@@ -830,7 +831,9 @@ async def aexecute_mouse_hover(left: float, top: float, page: APage) -> None:
     )
 
 
-def execute_mouse_click(left: float, top: float, page: Page, doubleclick=False) -> None:
+def execute_mouse_click(
+    left: float, top: float, page: Page, doubleclick=False
+) -> None:
     """Click at coordinates (left, top)."""
     viewport_size = page.viewport_size
     assert viewport_size
@@ -841,13 +844,17 @@ def execute_mouse_click(left: float, top: float, page: Page, doubleclick=False)
         page.mouse.click(x, y)
 
 
-async def aexecute_mouse_click(left: float, top: float, page: APage) -> None:
+async def aexecute_mouse_click(
+    left: float, top: float, page: APage, doubleclick: bool = False
+) -> None:
     """Click at coordinates (left, top)."""
     viewport_size = page.viewport_size
     assert viewport_size
-    await page.mouse.click(
-        left * viewport_size["width"], top * viewport_size["height"]
-    )
+    x, y = left * viewport_size["width"], top * viewport_size["height"]
+    if doubleclick:
+        await page.mouse.dblclick(x, y)
+    else:
+        await page.mouse.click(x, y)
 
 
 def execute_keyboard_type(text: str, page: Page) -> None:
@@ -897,12 +904,18 @@ def execute_type(keys: list[int], page: Page) -> None:
 async def aexecute_type(keys: list[int], page: APage) -> None:
     """Send keystrokes to the focused element."""
     text = "".join([_id2key[key] for key in keys])
-    await page.keyboard.type(text)
+    if len(text) == 0:
+        await page.keyboard.press("Backspace")
+    else:
+        await page.keyboard.type(text)
 
 
 def execute_focus(
-    element_role: int, element_name: str, nth: int, page: Page,
-    ignore_in_viewport: bool = False
+    element_role: int,
+    element_name: str,
+    nth: int,
+    page: Page,
+    ignore_in_viewport: bool = False,
 ) -> None:
     """Click the specified DOM element."""
     element_role_str = _id2role[element_role]
@@ -924,7 +937,10 @@ def execute_focus(
                 )
         for locator_idx in range(locators.count()):
             locator = locators.nth(locator_idx)
-            if is_in_viewport(locator, page.viewport_size) or ignore_in_viewport:
+            if (
+                is_in_viewport(locator, page.viewport_size)
+                or ignore_in_viewport
+            ):
                 bounding_box = locator.bounding_box()
                 assert bounding_box
                 element_location_list.append(
@@ -1136,13 +1152,24 @@ def execute_action(
                 element_center = obseration_processor.get_element_center(element_id)  # type: ignore[attr-defined]
                 if element_center[1] > 1 or element_center[1] < 0:
                     print("attempt to click element outside of viewport")
-                    assert False, "attempt to click an element outside of viewport"
+                    assert (
+                        False
+                    ), "attempt to click an element outside of viewport"
                 execute_mouse_click(element_center[0], element_center[1], page)
-            elif action["element_role"] is not None and action["element_name"] is not None:
+            elif (
+                action["element_role"] is not None
+                and action["element_name"] is not None
+            ):
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
                 nth = action["nth"]
-                execute_focus(element_role, element_name, nth, page, ignore_in_viewport=True)
+                execute_focus(
+                    element_role,
+                    element_name,
+                    nth,
+                    page,
+                    ignore_in_viewport=True,
+                )
                 execute_click_current(page)
             elif action["pw_code"]:
                 parsed_code = parse_playwright_code(action["pw_code"])
@@ -1156,11 +1183,20 @@ def execute_action(
                 element_id = action["element_id"]
                 element_center = obseration_processor.get_element_center(element_id)  # type: ignore[attr-defined]
                 execute_mouse_hover(element_center[0], element_center[1], page)
-            elif action["element_role"] is not None and action["element_name"] is not None:
+            elif (
+                action["element_role"] is not None
+                and action["element_name"] is not None
+            ):
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
                 nth = action["nth"]
-                execute_focus(element_role, element_name, nth, page, ignore_in_viewport=True)
+                execute_focus(
+                    element_role,
+                    element_name,
+                    nth,
+                    page,
+                    ignore_in_viewport=True,
+                )
             elif action["pw_code"]:
                 parsed_code = parse_playwright_code(action["pw_code"])
                 locator_code = parsed_code[:-1]
@@ -1174,18 +1210,34 @@ def execute_action(
             if action["element_id"] is not None:
                 element_id = action["element_id"]
                 element_center = obseration_processor.get_element_center(element_id)  # type: ignore[attr-defined]
-                if len(action['text']) == 0:
+                if len(action["text"]) == 0:
                     # clear the text by double clicking and pressing backspace
-                    execute_mouse_click(element_center[0], element_center[1], page, doubleclick=True)
+                    execute_mouse_click(
+                        element_center[0],
+                        element_center[1],
+                        page,
+                        doubleclick=True,
+                    )
                     execute_type(action["text"], page)
                 else:
-                    execute_mouse_click(element_center[0], element_center[1], page)
+                    execute_mouse_click(
+                        element_center[0], element_center[1], page
+                    )
                     execute_type(action["text"], page)
-            elif action["element_role"] is not None and action["element_name"] is not None:
+            elif (
+                action["element_role"] is not None
+                and action["element_name"] is not None
+            ):
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
                 nth = action["nth"]
-                execute_focus(element_role, element_name, nth, page, ignore_in_viewport=True)
+                execute_focus(
+                    element_role,
+                    element_name,
+                    nth,
+                    page,
+                    ignore_in_viewport=True,
+                )
                 execute_type(action["text"], page)
             elif action["pw_code"]:
                 parsed_code = parse_playwright_code(action["pw_code"])
@@ -1245,9 +1297,14 @@ def execute_action(
 
 
 async def aexecute_action(
-    action: Action, page: APage, browser_ctx: ABrowserContext
+    action: Action,
+    page: APage,
+    browser_ctx: ABrowserContext,
+    obseration_processor: ObservationProcessor | None = None,
 ) -> APage:
-    """Execute the async action on the ChromeDriver."""
+    """Execute the async action on the ChromeDriver.
+    The element id based actions need the AsyncTextObservationProcessor that
+    produced the current observation."""
     action_type = action["action_type"]
     match action_type:
         case ActionTypes.NONE:
@@ -1274,7 +1331,15 @@ async def aexecute_action(
             # check each kind of locator in order
             # TODO[shuyanzh]: order is temp now
             if action["element_id"]:
-                raise NotImplementedError
+                element_id = action["element_id"]
+                element_center = await obseration_processor.aget_element_center(element_id)  # type: ignore[union-attr]
+                if element_center[1] > 1 or element_center[1] < 0:
+                    assert (
+                        False
+                    ), "attempt to click an element outside of viewport"
+                await aexecute_mouse_click(
+                    element_center[0], element_center[1], page
+                )
             elif action["element_role"] and action["element_name"]:
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
@@ -1292,7 +1357,11 @@ async def aexecute_action(
                 raise ValueError("No proper locator found for click action")
         case ActionTypes.HOVER:
             if action["element_id"]:
-                raise NotImplementedError
+                element_id = action["element_id"]
+                element_center = await obseration_processor.aget_element_center(element_id)  # type: ignore[union-attr]
+                await aexecute_mouse_hover(
+                    element_center[0], element_center[1], page
+                )
             elif action["element_role"] and action["element_name"]:
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
@@ -1311,7 +1380,16 @@ async def aexecute_action(
                 )
         case ActionTypes.TYPE:
             if action["element_id"]:
-                raise NotImplementedError
+                element_id = action["element_id"]
+                element_center = await obseration_processor.aget_element_center(element_id)  # type: ignore[union-attr]
+                # clear the text by double clicking and pressing backspace
+                await aexecute_mouse_click(
+                    element_center[0],
+                    element_center[1],
+                    page,
+                    doubleclick=len(action["text"]) == 0,
+                )
+                await aexecute_type(action["text"], page)
             elif action["element_role"] and action["element_name"]:
                 element_role = int(action["element_role"])
                 element_name = action["element_name"]
@@ -1512,6 +1590,7 @@ def create_playwright_action(playwright_code: str) -> Action:
 
     raise ActionParsingError(f"Unknown playwright action {action}")
 
+
 @beartype
 def create_id_based_action(action_str: str) -> Action:
     """Main function to return individual id based action"""
@@ -0,0 +1,201 @@
+"""An on-disk cache of static assets shared by all browser contexts.
+It is installed on a context with `context.route("**/*", cache.handle)`."""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from playwright.sync_api import Request, Route
+
+CACHEABLE_RESOURCE_TYPES = ("script", "stylesheet", "font", "image")
+# the request headers that change the content of a static asset
+VARY_HEADERS = ("accept", "accept-language")
+# the body is stored decoded, so the transport headers do not apply anymore
+DROPPED_RESPONSE_HEADERS = (
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+    "set-cookie",
+)
+
+
+class AssetCache:
+    """A content-addressed cache of GET responses.
+    entries/<key>.json maps the sha256 of the url and the `vary_headers` to
+    the status, the headers and the sha256 of the body, the body is stored
+    in blobs/<sha256>. When the blobs exceed `max_size` bytes, the least
+    recently used entries are evicted. Several processes can share the same
+    directory, all files are written atomically. Each process rescans the
+    directory after writing `rescan_fraction` of `max_size`, so the cache
+    exceeds `max_size` by at most that much per process."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_size: int = 1 << 30,
+        resource_types: tuple[str, ...] = CACHEABLE_RESOURCE_TYPES,
+        vary_headers: tuple[str, ...] = VARY_HEADERS,
+        rescan_fraction: float = 0.05,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.entry_dir = self.cache_dir / "entries"
+        self.blob_dir = self.cache_dir / "blobs"
+        self.entry_dir.mkdir(parents=True, exist_ok=True)
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.resource_types = resource_types
+        self.vary_headers = vary_headers
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rescan_fraction = rescan_fraction
+        # the size of the blobs when the directory was last scanned plus
+        # the blobs written by this process since then
+        self.size = self.disk_size()
+        self.written_since_scan = 0
+
+    def disk_size(self) -> int:
+        """The size of the blobs of all processes"""
+        size = 0
+        for blob_path in self.blob_dir.iterdir():
+            try:
+                size += blob_path.stat().st_size
+            except FileNotFoundError:
+                # evicted by another process
+                continue
+        return size
+
+    def key(self, request: Request) -> str:
+        headers = request.headers
+        parts = [request.method, request.url] + [
+            f"{name}:{headers.get(name, '')}" for name in self.vary_headers
+        ]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def is_cacheable(self, request: Request) -> bool:
+        return (
+            request.method == "GET"
+            and request.resource_type in self.resource_types
+        )
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> tuple[dict[str, Any], bytes] | None:
+        entry_path = self.entry_dir / f"{key}.json"
+        try:
+            entry = json.loads(entry_path.read_text())
+            body = (self.blob_dir / entry["body"]).read_bytes()
+        except (OSError, ValueError, KeyError):
+            # not cached, or evicted by another process
+            return None
+        # the modification time of the entry is its last access time
+        os.utime(entry_path)
+        return entry, body
+
+    def put(
+        self, key: str, status: int, headers: dict[str, str], body: bytes
+    ) -> None:
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self.blob_dir / digest
+        if not blob_path.exists():
+            self._write_atomic(blob_path, body)
+            self.size += len(body)
+            self.written_since_scan += len(body)
+        entry = {"status": status, "headers": headers, "body": digest}
+        self._write_atomic(
+            self.entry_dir / f"{key}.json", json.dumps(entry).encode()
+        )
+        if (
+            self.size > self.max_size
+            or self.written_since_scan > self.rescan_fraction * self.max_size
+        ):
+            # the other processes write to the directory as well
+            self.size = self.disk_size()
+            self.written_since_scan = 0
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the blobs fit in
+        90% of `max_size`"""
+        entries = []
+        for entry_path in self.entry_dir.glob("*.json"):
+            try:
+                entries.append((entry_path.stat().st_mtime, entry_path))
+            except OSError:
+                continue
+        entries.sort()
+
+        target = self.max_size * 0.9
+        for _, entry_path in entries:
+            if self.size <= target:
+                break
+            try:
+                digest = json.loads(entry_path.read_text())["body"]
+                entry_path.unlink()
+            except (OSError, ValueError, KeyError):
+                # evicted by another process
+                continue
+            blob_path = self.blob_dir / digest
+            try:
+                blob_size = blob_path.stat().st_size
+                # blobs may be shared by several entries, the lookup of the
+                # other entries then misses and refetches the asset
+                blob_path.unlink()
+            except FileNotFoundError:
+                # another process is evicting as well, catch up with it
+                self.size = self.disk_size()
+            else:
+                self.size -= blob_size
+            self.evictions += 1
+        # the other processes may have evicted at the same time
+        self.size = self.disk_size()
+        self.written_since_scan = 0
+
+    def handle(self, route: Route, request: Request) -> None:
+        if not self.is_cacheable(request):
+            route.fallback()
+            return
+
+        key = self.key(request)
+        cached = self.get(key)
+        if cached is not None:
+            entry, body = cached
+            self.hits += 1
+            route.fulfill(
+                status=entry["status"], headers=entry["headers"], body=body
+            )
+            return
+
+        self.misses += 1
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Exception:
+            # let the browser load it, e.g., the page is closing
+            route.fallback()
+            return
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in DROPPED_RESPONSE_HEADERS
+        }
+        cache_control = response.headers.get("cache-control", "")
+        if response.status == 200 and "no-store" not in cache_control:
+            self.put(key, response.status, headers, body)
+        route.fulfill(status=response.status, headers=headers, body=body)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self.size,
+        }
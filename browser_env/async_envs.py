@@ -2,18 +2,23 @@ import asyncio
 import json
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-import numpy as np
-import numpy.typing as npt
 from gymnasium import Env
-from gymnasium.spaces import Box, Text
-from playwright.async_api import Page, ViewportSize, async_playwright
+from playwright.async_api import (
+    Browser,
+    CDPSession,
+    Page,
+    ViewportSize,
+    async_playwright,
+)
 
 from .actions import Action, aexecute_action, get_action_space
-from .utils import DetachedPage, png_bytes_to_numpy
+from .processors import AsyncObservationHandler, ObservationMetadata
+from .utils import DetachedPage, Observation
 
 
-class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
+class AsyncScriptBrowserEnv(Env[dict[str, Observation], Action]):
     """
     The goal of this environment is to produce a prototype of a browser environment.
     In the end, we want to support a fully configurable browser environment with wide
@@ -29,13 +34,10 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         slow_mo: int = 0,
         timeout: int = 30000,
         viewport_size: ViewportSize = {"width": 1280, "height": 720},
+        browser: Browser | None = None,
+        observation_type: str = "html",
+        current_viewport_only: bool = False,
     ):
-        self.observation_space = Box(
-            0,
-            255,
-            (viewport_size["height"], viewport_size["width"], 4),
-            np.uint8,
-        )
         # TODO: make Space[Action] = ActionSpace
         self.action_space = get_action_space()  # type: ignore[assignment]
         self.headless = headless
@@ -43,13 +45,59 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         self.reset_finished = False
         self.timeout = timeout
         self.viewport_size = viewport_size
+        # a browser shared by many envs running on the same event loop,
+        # each env then only owns its browser context
+        self.shared_browser = browser
+        # the event loop of the sync wrappers, kept across calls
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.current_viewport_only = current_viewport_only
+
+        match observation_type:
+            case "html" | "accessibility_tree":
+                self.text_observation_type = observation_type
+                self.image_observation_type = ""
+                self.main_observation_type = "text"
+            case "image":
+                self.image_observation_type = observation_type
+                self.text_observation_type = ""  # type: ignore[assignment]
+                self.main_observation_type = "image"
+            case _:
+                raise ValueError(
+                    f"Unsupported observation type: {observation_type}"
+                )
+
+        self.observation_handler = AsyncObservationHandler(
+            self.main_observation_type,
+            self.text_observation_type,
+            self.image_observation_type,
+            self.current_viewport_only,
+            self.viewport_size,
+        )
 
-    async def setup(self, config_file: Path | None = None) -> None:
-        self.context_manager = async_playwright()
-        self.playwright = await self.context_manager.__aenter__()
-        self.browser = await self.playwright.chromium.launch(
-            headless=self.headless, slow_mo=self.slow_mo
+        self.observation_space = (
+            self.observation_handler.get_observation_space()
         )
+
+    def _run(self, coroutine: Any) -> Any:
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(coroutine)
+
+    async def _teardown(self) -> None:
+        if self.shared_browser is not None:
+            await self.context.close()
+        else:
+            await self.context_manager.__aexit__()
+
+    async def setup(self, config_file: Path | None = None) -> None:
+        if self.shared_browser is not None:
+            self.browser = self.shared_browser
+        else:
+            self.context_manager = async_playwright()
+            self.playwright = await self.context_manager.__aenter__()
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless, slow_mo=self.slow_mo
+            )
         if config_file:
             with open(config_file, "r") as f:
                 instance_config = json.load(f)
@@ -70,12 +118,30 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         if start_url:
             await self.page.goto(start_url)
 
+    async def aget_page_client(self, page: Page) -> CDPSession:
+        """The CDP session of the page, created on first use so that the
+        tabs opened by actions get one as well"""
+        if not hasattr(page, "client"):
+            client = await page.context.new_cdp_session(page)
+            if self.text_observation_type == "accessibility_tree":
+                await client.send("Accessibility.enable")
+            page.client = client  # type: ignore[attr-defined]
+        return page.client  # type: ignore[attr-defined,no-any-return]
+
+    async def _aget_obs(self) -> dict[str, Observation]:
+        return await self.observation_handler.aget_observation(
+            self.page, await self.aget_page_client(self.page)
+        )
+
+    def _get_obs_metadata(self) -> dict[str, ObservationMetadata]:
+        return self.observation_handler.get_observation_metadata()
+
     async def areset(
         self,
         *,
         seed: int | None = None,
         options: dict[str, str] | None = None,
-    ) -> tuple[npt.NDArray[np.uint8], dict[str, object]]:
+    ) -> tuple[dict[str, Observation], dict[str, object]]:
         """
         Reset the environment.
         :param options: options for the environment. The options are:
@@ -83,7 +149,7 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         """
         super().reset(seed=seed, options=options)
         if self.reset_finished:
-            await self.context_manager.__aexit__()
+            await self._teardown()
         if options is not None and "config_file" in options:
             config_file = Path(options["config_file"])
             if config_file.exists():
@@ -93,11 +159,15 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         else:
             await self.setup()
         self.reset_finished = True
+        observation = await self._aget_obs()
         content = await self.page.content()
-        screenshot = png_bytes_to_numpy(await self.page.screenshot())
         return (
-            screenshot,
-            {"page": DetachedPage(self.page.url, content)},
+            observation,
+            {
+                "page": DetachedPage(self.page.url, content),
+                "fail_error": "",
+                "observation_metadata": self._get_obs_metadata(),
+            },
         )
 
     def reset(
@@ -105,49 +175,59 @@ class AsyncScriptBrowserEnv(Env[npt.NDArray[np.uint8], Action]):
         *,
         seed: int | None = None,
         options: dict[str, str] | None = None,
-    ) -> tuple[npt.NDArray[np.uint8], dict[str, object]]:
-        return asyncio.run(self.areset(seed=seed, options=options))
+    ) -> tuple[dict[str, Observation], dict[str, object]]:
+        return self._run(self.areset(seed=seed, options=options))  # type: ignore[no-any-return]
 
     async def aclose(self) -> None:
         if self.reset_finished:
-            await self.context_manager.__aexit__()
+            await self._teardown()
+            self.reset_finished = False
 
     def close(self) -> None:
-        asyncio.run(self.aclose())
+        self._run(self.aclose())
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
 
     async def astep(
         self, action: Action
-    ) -> tuple[npt.NDArray[np.uint8], float, bool, bool, dict[str, object]]:
+    ) -> tuple[dict[str, Observation], float, bool, bool, dict[str, object]]:
         if not self.reset_finished:
             raise RuntimeError("Call reset first before calling step.")
         success = False
         fail_error = ""
         try:
-            self.page = await aexecute_action(action, self.page, self.context)
+            self.page = await aexecute_action(
+                action,
+                self.page,
+                self.context,
+                self.observation_handler.action_processor,
+            )
             success = True
         except Exception as e:
             fail_error = str(e)
 
         try:
             content = await self.page.content()
-            screenshot = png_bytes_to_numpy(await self.page.screenshot())
+            observation = await self._aget_obs()
         except:
             await self.page.wait_for_load_state("load")
             content = await self.page.content()
-            screenshot = png_bytes_to_numpy(await self.page.screenshot())
+            observation = await self._aget_obs()
 
         return (
-            screenshot,
+            observation,
             float(success),
             False,
             False,
             {
                 "page": DetachedPage(self.page.url, content),
                 "fail_error": fail_error,
+                "observation_metadata": self._get_obs_metadata(),
             },
         )
 
     def step(
         self, action: Action
-    ) -> tuple[npt.NDArray[np.uint8], float, bool, bool, dict[str, object]]:
-        return asyncio.run(self.astep(action), debug=True)
+    ) -> tuple[dict[str, Observation], float, bool, bool, dict[str, object]]:
+        return self._run(self.astep(action))  # type: ignore[no-any-return]
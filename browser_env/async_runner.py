@@ -0,0 +1,151 @@
+"""Run many AsyncScriptBrowserEnv episodes concurrently on a single event
+loop"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
+
+from playwright.async_api import Browser, ViewportSize, async_playwright
+
+from .actions import Action, ActionTypes, create_stop_action
+from .async_envs import AsyncScriptBrowserEnv
+from .trajectory import Trajectory
+from .utils import StateInfo
+
+
+class AsyncAgent(Protocol):
+    """An agent whose action prediction can be awaited.
+    While one agent waits for the LLM, the loop runs the browser work of
+    the other episodes. `agent.agent.Agent` implements it by running the
+    blocking `next_action` in a worker thread."""
+
+    def reset(self, test_config_file: str) -> None:
+        ...
+
+    async def anext_action(
+        self, trajectory: Trajectory, intent: str, meta_data: Any
+    ) -> Action:
+        ...
+
+
+@dataclass
+class EpisodeResult:
+    config_file: str
+    trajectory: Trajectory = field(default_factory=list)
+    error: str = ""
+    duration: float = 0.0
+
+
+class AsyncEpisodeRunner:
+    """Keep one event loop and one browser alive and run the episodes of
+    many config files concurrently, at most `max_concurrency` at a time.
+    Every episode gets its own AsyncScriptBrowserEnv (i.e., browser context)
+    and its own agent built by `agent_factory`."""
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], Any],
+        max_concurrency: int = 4,
+        max_steps: int = 30,
+        action_set_tag: str = "playwright",
+        headless: bool = True,
+        slow_mo: int = 0,
+        viewport_size: ViewportSize = {"width": 1280, "height": 720},
+        env_kwargs: dict[str, Any] | None = None,
+    ) -> None:
+        self.agent_factory = agent_factory
+        self.max_concurrency = max_concurrency
+        self.max_steps = max_steps
+        self.action_set_tag = action_set_tag
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self.viewport_size = viewport_size
+        self.env_kwargs = env_kwargs or {}
+
+    def describe_action(self, action: Action, state_info: StateInfo) -> str:
+        """The text of the action stored in the action history"""
+        # avoid circular import
+        from .helper_functions import get_action_description
+
+        return get_action_description(
+            action,
+            state_info["info"]["observation_metadata"],
+            action_set_tag=self.action_set_tag,
+            prompt_constructor=None,
+        )
+
+    async def arun_episode(
+        self,
+        browser: Browser,
+        semaphore: asyncio.Semaphore,
+        config_file: str,
+    ) -> EpisodeResult:
+        async with semaphore:
+            result = EpisodeResult(config_file)
+            start = time.perf_counter()
+            env = AsyncScriptBrowserEnv(
+                headless=self.headless,
+                slow_mo=self.slow_mo,
+                viewport_size=self.viewport_size,
+                browser=browser,
+                **self.env_kwargs,
+            )
+            trajectory = result.trajectory
+            try:
+                with open(config_file) as f:
+                    intent = json.load(f).get("intent", "")
+                agent = self.agent_factory()
+                agent.reset(config_file)
+                obs, info = await env.areset(
+                    options={"config_file": config_file}
+                )
+                state_info: StateInfo = {"observation": obs, "info": info}  # type: ignore[typeddict-item]
+                trajectory.append(state_info)
+                meta_data: dict[str, Any] = {"action_history": ["None"]}
+                for _ in range(self.max_steps):
+                    action = await agent.anext_action(
+                        trajectory, intent, meta_data
+                    )
+                    trajectory.append(action)
+                    meta_data["action_history"].append(
+                        self.describe_action(action, state_info)
+                    )
+                    if action["action_type"] == ActionTypes.STOP:
+                        break
+                    obs, _, terminated, _, info = await env.astep(action)
+                    state_info = {"observation": obs, "info": info}  # type: ignore[typeddict-item]
+                    trajectory.append(state_info)
+                    if terminated:
+                        trajectory.append(create_stop_action(""))
+                        break
+                else:
+                    trajectory.append(
+                        create_stop_action(
+                            f"Early stop: Reach max steps {self.max_steps}"
+                        )
+                    )
+            except Exception as e:
+                result.error = repr(e)
+            finally:
+                await env.aclose()
+            result.duration = time.perf_counter() - start
+            return result
+
+    async def arun(self, config_files: list[str]) -> list[EpisodeResult]:
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(
+                headless=self.headless, slow_mo=self.slow_mo
+            )
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            results = await asyncio.gather(
+                *[
+                    self.arun_episode(browser, semaphore, config_file)
+                    for config_file in config_files
+                ]
+            )
+            await browser.close()
+        return list(results)
+
+    def run(self, config_files: list[str]) -> list[EpisodeResult]:
+        return asyncio.run(self.arun(config_files))
@@ -0,0 +1,70 @@
+"""Snapshot the state of a browser context so that an episode can be forked"""
+from dataclasses import dataclass, field
+from typing import Any
+
+# the scroll offsets and the values of the form fields of a page,
+# the fields are identified by their position in the document
+CAPTURE_PAGE_STATE_JS = """
+() => ({
+    scrollX: window.scrollX,
+    scrollY: window.scrollY,
+    fields: Array.from(
+        document.querySelectorAll("input, textarea, select")
+    ).map((el) => ({
+        tag: el.tagName,
+        type: el.type || "",
+        value: el.type === "file" ? null : el.value,
+        checked: "checked" in el ? el.checked : null,
+    })),
+})
+"""
+
+RESTORE_PAGE_STATE_JS = """
+(state) => {
+    const elements = document.querySelectorAll("input, textarea, select");
+    state.fields.forEach((field, idx) => {
+        const el = elements[idx];
+        // the page changed since the checkpoint, skip the mismatched fields
+        if (
+            !el
+            || el.tagName !== field.tag
+            || (el.type || "") !== field.type
+        ) {
+            return;
+        }
+        let changed = false;
+        if (field.value !== null && el.value !== field.value) {
+            el.value = field.value;
+            changed = true;
+        }
+        if (field.checked !== null && el.checked !== field.checked) {
+            el.checked = field.checked;
+            changed = true;
+        }
+        if (changed) {
+            el.dispatchEvent(new Event("input", { bubbles: true }));
+            el.dispatchEvent(new Event("change", { bubbles: true }));
+        }
+    });
+    window.scrollTo(state.scrollX, state.scrollY);
+}
+"""
+
+
+@dataclass
+class PageCheckpoint:
+    url: str
+    scroll_x: float = 0.0
+    scroll_y: float = 0.0
+    fields: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class BrowserCheckpoint:
+    """Everything needed to rebuild a browser context.
+    `storage_state` holds the cookies and the localStorage of all origins."""
+
+    storage_state: dict[str, Any]
+    pages: list[PageCheckpoint]
+    current_page: int = 0
+    geolocation: dict[str, float] | None = None
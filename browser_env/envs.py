@@ -1,32 +1,59 @@
 import json
 import re
 import time
+import weakref
 from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Union
+from typing import Any, Hashable, Union
 
 import numpy as np
 import numpy.typing as npt
+import utils
 from beartype import beartype
 from beartype.door import is_bearable
 from gymnasium import Env
 from gymnasium.spaces import Box, Text
-import utils
 from playwright.sync_api import (
+    Browser,
+    BrowserContext,
     CDPSession,
     Page,
     Playwright,
+    Request,
+    Route,
     ViewportSize,
     expect,
     sync_playwright,
 )
 
 from .actions import Action, execute_action, get_action_space
-from .processors import ObservationHandler, ObservationMetadata
+from .asset_cache import AssetCache
+from .checkpoint import (
+    CAPTURE_PAGE_STATE_JS,
+    RESTORE_PAGE_STATE_JS,
+    BrowserCheckpoint,
+    PageCheckpoint,
+)
+from .page_fingerprint import PageFingerprinter
+from .processors import (
+    LazyObservation,
+    ObservationHandler,
+    ObservationMetadata,
+    ScreenshotConfig,
+)
+from .resource_blocking import (
+    BLOCKED_RESOURCE_TYPES,
+    BLOCKED_URL_PATTERNS,
+    ResourceBlocker,
+)
+from .screencast import Screencast, ScreencastConfig, ScreencastFrame
+from .settle import PageSettler
+from .tracing import TRACE_POLICIES, TraceStaging
 from .utils import (
     AccessibilityTree,
     DetachedPage,
+    LazyDetachedPage,
     Observation,
     png_bytes_to_numpy,
 )
@@ -86,6 +113,30 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
         save_trace_enabled: bool = False,
         sleep_after_execution: float = 0.0,
         port: int = None,
+        persistent_browser: bool = False,
+        browser_pool_size: int = 1,
+        settle_strategy: str = "sleep",
+        network_idle_time: float = 0.5,
+        dom_quiet_time: float = 0.2,
+        asset_cache_dir: str | None = None,
+        asset_cache_size: int = 1 << 30,
+        block_resources: bool | None = None,
+        blocked_resource_types: tuple[str, ...] = BLOCKED_RESOURCE_TYPES,
+        blocked_url_patterns: tuple[str, ...] = BLOCKED_URL_PATTERNS,
+        har_mode: str = "off",
+        har_dir: str | None = None,
+        eager_page_content: bool = False,
+        observation_modalities: tuple[str, ...] | None = None,
+        screenshot_config: ScreenshotConfig | None = None,
+        screencast_config: ScreencastConfig | None = None,
+        trace_policy: str | None = None,
+        trace_every_n: int = 10,
+        trace_snapshots: bool = True,
+        bounds_source: str = "snapshot",
+        incremental_accessibility_tree: bool = False,
+        observation_delta: bool = False,
+        keyframe_interval: int = 10,
+        reuse_unchanged_observation: bool = False,
     ):
         # TODO: make Space[Action] = ActionSpace
         self.action_space = get_action_space()  # type: ignore[assignment]
@@ -94,9 +145,73 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
         self.current_viewport_only = current_viewport_only
         self.reset_finished = False
         self.viewport_size = viewport_size
-        self.save_trace_enabled = save_trace_enabled
+        # which tasks are traced, see TRACE_POLICIES, save_trace_enabled
+        # is a shorthand for "always"
+        if trace_policy is None:
+            trace_policy = "always" if save_trace_enabled else "off"
+        if trace_policy not in TRACE_POLICIES:
+            raise ValueError(f"Unsupported trace policy: {trace_policy}")
+        if trace_policy == "every_n" and trace_every_n < 1:
+            raise ValueError("trace_every_n must be positive")
+        self.trace_policy = trace_policy
+        self.save_trace_enabled = trace_policy != "off"
+        self.trace_every_n = trace_every_n
+        self.trace_snapshots = trace_snapshots
+        self.trace_count = 0
+        self.traced_contexts: weakref.WeakSet[
+            BrowserContext
+        ] = weakref.WeakSet()
+        # created by the first `restore` of a traced task, closed by `close`
+        self.trace_staging: TraceStaging | None = None
+        # the traces of the contexts replaced by `restore` in the current
+        # task, in the staging directory
+        self.trace_segments: list[Path] = []
         self.sleep_after_execution = sleep_after_execution
         self.port = port
+        # keep the launched chromium processes alive across resets and only
+        # recreate the browser context, see `_launch_browsers`
+        self.persistent_browser = persistent_browser
+        self.browser_pool_size = browser_pool_size
+        self.browsers: list[Browser] = []
+        self.browser_cursor = 0
+        # (config file, context) built ahead of time by `prefetch`
+        self.prefetched: tuple[str, BrowserContext] | None = None
+        self.instance_config: dict[str, Any] = {}
+
+        # "sleep": always sleep for sleep_after_execution
+        # "event": wait for network idle and DOM quiescence, with
+        # sleep_after_execution as the upper bound
+        if settle_strategy not in ["sleep", "event"]:
+            raise ValueError(f"Unsupported settle strategy: {settle_strategy}")
+        self.settle_strategy = settle_strategy
+        self.page_settler = PageSettler(
+            network_idle_time=network_idle_time,
+            dom_quiet_time=dom_quiet_time,
+        )
+
+        # serve the static assets of all contexts from an on-disk cache
+        self.asset_cache = (
+            AssetCache(asset_cache_dir, max_size=asset_cache_size)
+            if asset_cache_dir
+            else None
+        )
+
+        # "record": save the network traffic of each task to
+        # har_dir/<config file name>.har
+        # "replay": serve the requests from the recorded HAR, the requests
+        # missing from it are aborted and reported in info["har_misses"]
+        if har_mode not in ["off", "record", "replay"]:
+            raise ValueError(f"Unsupported HAR mode: {har_mode}")
+        if har_mode != "off" and har_dir is None:
+            raise ValueError(f"HAR mode {har_mode} requires har_dir")
+        self.har_mode = har_mode
+        self.har_dir = Path(har_dir) if har_dir else None
+        self.har_path: Path | None = None
+        self.har_misses: list[str] = []
+        # info["page"] serializes the html only when it is read, unless
+        # eager_page_content is set
+        self.eager_page_content = eager_page_content
+        self.detached_page: DetachedPage | None = None
 
         match observation_type:
             case "html" | "accessibility_tree":
@@ -112,71 +227,320 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
                     f"Unsupported observation type: {observation_type}"
                 )
 
+        # text-only runs never look at the pixels, so by default they skip
+        # images, media, web fonts and trackers
+        if block_resources is None:
+            block_resources = self.main_observation_type == "text"
+        self.resource_blocker = (
+            ResourceBlocker(blocked_resource_types, blocked_url_patterns)
+            if block_resources
+            else None
+        )
+
+        # the screenshot is taken lazily when obs["image"] is read, a
+        # modality that is not listed is not in the observation at all
+        if observation_modalities is None:
+            observation_modalities = (
+                ("text", "image") if self.text_observation_type else ("image",)
+            )
+        self.observation_modalities = observation_modalities
+        self.obs: dict[str, Observation] | None = None
+
+        # stream the frames of every page over CDP, obs["image"] is then the
+        # latest frame instead of a fresh screenshot
+        self.screencast = (
+            Screencast(screencast_config) if screencast_config else None
+        )
+
         self.observation_handler = ObservationHandler(
             self.main_observation_type,
             self.text_observation_type,
             self.image_observation_type,
             self.current_viewport_only,
             self.viewport_size,
+            screenshot_config,
+            self.screencast,
+            bounds_source,
+            incremental_accessibility_tree,
+            observation_delta,
+            keyframe_interval,
         )
 
         self.observation_space = (
             self.observation_handler.get_observation_space()
         )
 
-    @beartype
-    def setup(self, config_file: Path | None = None) -> None:
+        # reuse the previous observation and its meta data when the action
+        # did not change the page, e.g., a failed click, see
+        # info["observation_reuse"]
+        self.page_fingerprinter = (
+            PageFingerprinter(
+                count_accessibility_events=(
+                    self.text_observation_type == "accessibility_tree"
+                )
+            )
+            if reuse_unchanged_observation
+            else None
+        )
+        self.page_fingerprint: Hashable | None = None
+        self.observation_reuse_hits = 0
+        self.observation_reuse_steps = 0
+
+    def _launch_browsers(self) -> None:
+        """Start the playwright driver and launch the browser pool"""
         self.context_manager = sync_playwright()
         self.playwright = self.context_manager.__enter__()
-        self.browser = self.playwright.chromium.launch(
-            headless=self.headless, slow_mo=self.slow_mo
-        )
+        pool_size = self.browser_pool_size if self.persistent_browser else 1
+        self.browsers = [
+            self.playwright.chromium.launch(
+                headless=self.headless, slow_mo=self.slow_mo
+            )
+            for _ in range(pool_size)
+        ]
+        self.browser_cursor = 0
+
+    def _next_browser(self) -> Browser:
+        """Pick the browser for the next context in a round-robin fashion"""
+        idx = self.browser_cursor % len(self.browsers)
+        self.browser_cursor += 1
+        if not self.browsers[idx].is_connected():
+            # the browser crashed, replace it instead of failing the task
+            self.browsers[idx] = self.playwright.chromium.launch(
+                headless=self.headless, slow_mo=self.slow_mo
+            )
+        return self.browsers[idx]
+
+    def _teardown(self) -> None:
+        """Release the resources of the current episode.
+        In persistent mode only the browser context is closed."""
+        if self.persistent_browser:
+            try:
+                self.context.close()
+            except Exception:
+                pass
+        else:
+            if self.har_mode == "record":
+                # the HAR is written when the context is closed
+                self.context.close()
+            self.context_manager.__exit__()
+            self.browsers = []
 
+    @staticmethod
+    def _load_instance_config(config_file: Path | None) -> dict[str, Any]:
         if config_file:
             with open(config_file, "r") as f:
                 instance_config = json.load(f)
         else:
             instance_config = {}
-
+        return instance_config
+
+    def _get_har_path(self, config_file: Path | str | None) -> Path | None:
+        if self.har_mode == "off" or config_file is None:
+            return None
+        assert self.har_dir is not None
+        return self.har_dir / f"{Path(config_file).stem}.har"
+
+    def _on_har_miss(self, route: Route, request: Request) -> None:
+        # reached only when the HAR has no entry for the request, never go
+        # to the network in replay mode
+        self.har_misses.append(request.url)
+        route.abort()
+
+    def _new_context(
+        self, instance_config: dict[str, Any], har_path: Path | None = None
+    ) -> BrowserContext:
         storage_state = instance_config.get("storage_state", None)
-        start_url = instance_config.get("start_url", None)
         geolocation = instance_config.get("geolocation", None)
 
-        self.context = self.browser.new_context(
+        record_har = self.har_mode == "record" and har_path is not None
+        if record_har:
+            har_path.parent.mkdir(parents=True, exist_ok=True)  # type: ignore[union-attr]
+        context = self._next_browser().new_context(
             viewport=self.viewport_size,
             storage_state=storage_state,
             geolocation=geolocation,
             device_scale_factor=1,
+            record_har_path=har_path if record_har else None,
         )
-        if self.save_trace_enabled:
-            self.context.tracing.start(screenshots=True, snapshots=True)
+        # the handler registered last runs first, blocked requests are
+        # aborted before the cache or the HAR is consulted
+        if self.har_mode == "replay" and har_path is not None:
+            if not har_path.exists():
+                raise ValueError(f"HAR file {har_path} does not exist.")
+            context.route("**/*", self._on_har_miss)
+            context.route_from_har(har_path, not_found="fallback")
+        elif self.asset_cache is not None:
+            context.route("**/*", self.asset_cache.handle)
+        if self.resource_blocker is not None:
+            context.route("**/*", self.resource_blocker.handle)
+        return context
+
+    def _should_trace(self) -> bool:
+        """Whether the next task is traced, called once per `reset`"""
+        if self.trace_policy == "off":
+            return False
+        self.trace_count += 1
+        if self.trace_policy == "every_n":
+            return (self.trace_count - 1) % self.trace_every_n == 0
+        return True
+
+    def _start_tracing(self, context: BrowserContext) -> None:
+        context.tracing.start(screenshots=True, snapshots=self.trace_snapshots)
+        self.traced_contexts.add(context)
+
+    def _discard_trace_segments(self) -> None:
+        for segment in self.trace_segments:
+            segment.unlink(missing_ok=True)
+        self.trace_segments = []
+
+    def _new_page(
+        self,
+        context: BrowserContext,
+        url: str | None = None,
+        wait_until: str = "load",
+    ) -> Page:
+        page = context.new_page()
+        client = page.context.new_cdp_session(page)  # talk to chrome devtools
+        if self.text_observation_type == "accessibility_tree":
+            client.send("Accessibility.enable")
+        page.client = client  # type: ignore # TODO[shuyanzh], fix this hackey client
+        if self.settle_strategy == "event":
+            self.page_settler.track(client)
+        if self.screencast is not None:
+            self.screencast.track(client)
+        if self.page_fingerprinter is not None:
+            self.page_fingerprinter.track(client)
+        if url:
+            page.goto(url, wait_until=wait_until)  # type: ignore[arg-type]
+        return page
+
+    def _open_start_pages(
+        self,
+        context: BrowserContext,
+        instance_config: dict[str, Any],
+        wait_until: str = "load",
+    ) -> None:
+        start_url = instance_config.get("start_url", None)
         if start_url:
-            start_urls = start_url.split(" |AND| ")
-            for url in start_urls:
-                page = self.context.new_page()
-                client = page.context.new_cdp_session(
-                    page
-                )  # talk to chrome devtools
-                if self.text_observation_type == "accessibility_tree":
-                    client.send("Accessibility.enable")
-                page.client = client  # type: ignore # TODO[shuyanzh], fix this hackey client
-                page.goto(url)
-            # set the first page as the current page
-            self.page = self.context.pages[0]
-            self.page.bring_to_front()
+            for url in start_url.split(" |AND| "):
+                self._new_page(context, url, wait_until=wait_until)
+        else:
+            self._new_page(context)
+
+    @beartype
+    def setup(self, config_file: Path | None = None) -> None:
+        if not self.browsers:
+            self._launch_browsers()
+
+        self._discard_trace_segments()
+        prefetched = self.prefetched
+        self.prefetched = None
+        trace = self._should_trace()
+        if (
+            prefetched is not None
+            and config_file is not None
+            and prefetched[0] == str(config_file)
+        ):
+            # hand over the context built while the previous task was running
+            self.instance_config = self._load_instance_config(config_file)
+            self.context = prefetched[1]
+            # the loading of the start pages is not in the trace
+            if trace:
+                self._start_tracing(self.context)
+            for page in self.context.pages:
+                page.wait_for_load_state("load")
+        else:
+            if prefetched is not None:
+                prefetched[1].close()
+            self.instance_config = self._load_instance_config(config_file)
+            self.context = self._new_context(
+                self.instance_config, self._get_har_path(config_file)
+            )
+            if trace:
+                self._start_tracing(self.context)
+            self._open_start_pages(self.context, self.instance_config)
+        self.har_path = self._get_har_path(config_file)
+        self.har_misses = []
+        self.browser = self.context.browser  # type: ignore[assignment]
+
+        # set the first page as the current page
+        self.page = self.context.pages[0]
+        self.page.bring_to_front()
+
+    @beartype
+    def prefetch(self, config_file: Path | str) -> None:
+        """Build the context of the next task ahead of time.
+        The start urls are only committed here, the browser keeps loading
+        them while the agent works on the current task. The next call to
+        `reset` with the same config file adopts the prefetched context."""
+        if not self.persistent_browser:
+            raise ValueError("Prefetching requires persistent_browser=True")
+        if not self.browsers:
+            self._launch_browsers()
+        if self.prefetched is not None:
+            self.prefetched[1].close()
+            self.prefetched = None
+
+        instance_config = self._load_instance_config(Path(config_file))
+        context = self._new_context(
+            instance_config, self._get_har_path(config_file)
+        )
+        self._open_start_pages(context, instance_config, wait_until="commit")
+        self.prefetched = (str(config_file), context)
+
+    def _detach_page(self) -> DetachedPage:
+        """The info["page"] of the current step"""
+        if self.eager_page_content:
+            self.detached_page = DetachedPage(
+                self.page.url, self.page.content()
+            )
         else:
-            self.page = self.context.new_page()
-            client = self.page.context.new_cdp_session(self.page)
-            if self.text_observation_type == "accessibility_tree":
-                client.send("Accessibility.enable")
-            self.page.client = client  # type: ignore
+            self.detached_page = LazyDetachedPage(self.page)
+        return self.detached_page
+
+    def _expire_step_handles(self) -> None:
+        """Called before the live page changes"""
+        if isinstance(self.detached_page, LazyDetachedPage):
+            self.detached_page.expire()
+        self.detached_page = None
+        if isinstance(self.obs, LazyObservation):
+            self.obs.expire()
 
     def get_page_client(self, page: Page) -> CDPSession:
         return page.client  # type: ignore
 
-    def _get_obs(self) -> dict[str, Observation]:
+    def screencast_frames(self) -> list[ScreencastFrame]:
+        """The last frames streamed from the current page, oldest first,
+        for debugging"""
+        if self.screencast is None:
+            raise RuntimeError("The screencast is not enabled")
+        return self.screencast.recent_frames(self.get_page_client(self.page))
+
+    def _settle(self) -> float:
+        """Wait for the page to settle after an action, return the time
+        spent"""
+        if self.settle_strategy == "event":
+            return self.page_settler.settle(
+                self.page,
+                self.get_page_client(self.page),
+                self.sleep_after_execution,
+            )
+        if self.sleep_after_execution > 0:
+            if self.screencast is not None:
+                # keep dispatching the frames and their acks while waiting
+                self.page.wait_for_timeout(self.sleep_after_execution * 1000)
+            else:
+                time.sleep(self.sleep_after_execution)
+        return self.sleep_after_execution
+
+    def _get_obs(
+        self, observation_modalities: tuple[str, ...] | None = None
+    ) -> dict[str, Observation]:
         obs = self.observation_handler.get_observation(
-            self.page, self.get_page_client(self.page), self
+            self.page,
+            self.get_page_client(self.page),
+            self,
+            modalities=observation_modalities or self.observation_modalities,
         )
         return obs
 
@@ -184,6 +548,50 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
         metadata = self.observation_handler.get_observation_metadata()
         return metadata
 
+    def _fingerprint_page(self) -> Hashable | None:
+        if self.page_fingerprinter is None:
+            return None
+        return self.page_fingerprinter.fingerprint(
+            self.page, self.get_page_client(self.page)
+        )
+
+    def _get_step_obs(
+        self, observation_modalities: tuple[str, ...] | None = None
+    ) -> tuple[dict[str, Observation], bool]:
+        """The observation after an action, the previous one when the page
+        did not change since it was taken, and whether it was reused"""
+        if self.page_fingerprinter is None:
+            return self._get_obs(observation_modalities), False
+        fingerprint = self._fingerprint_page()
+        previous = self.obs
+        unchanged = (
+            fingerprint is not None
+            and fingerprint == self.page_fingerprint
+            and isinstance(previous, LazyObservation)
+            and set(previous)
+            == set(observation_modalities or self.observation_modalities)
+        )
+        self.page_fingerprint = fingerprint
+        self.observation_reuse_steps += 1
+        if not unchanged:
+            return self._get_obs(observation_modalities), False
+        self.observation_reuse_hits += 1
+        observation = self.observation_handler.reuse_observation(
+            previous,  # type: ignore[arg-type]
+            self.page,
+            self.get_page_client(self.page),
+        )
+        return observation, True
+
+    def _observation_reuse_info(self, reused: bool) -> dict[str, Any]:
+        return {
+            "reused": reused,
+            "hits": self.observation_reuse_hits,
+            "steps": self.observation_reuse_steps,
+            "hit_rate": self.observation_reuse_hits
+            / max(self.observation_reuse_steps, 1),
+        }
+
     @beartype
     def reset(
         self,
@@ -197,8 +605,9 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
             - "storage_state": the storage state of the browser. It is a file path to a json file.
         """
         super().reset(seed=seed, options=options)
+        self._expire_step_handles()
         if self.reset_finished:
-            self.context_manager.__exit__()
+            self._teardown()
 
         if options is not None and "config_file" in options:
             config_file = Path(options["config_file"])
@@ -210,60 +619,204 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
             self.setup()
         self.reset_finished = True
 
-        if self.sleep_after_execution > 0:
-            time.sleep(self.sleep_after_execution)
+        return self._initial_observation()
+
+    def _initial_observation(
+        self,
+    ) -> tuple[dict[str, Observation], dict[str, Any]]:
+        settle_time = self._settle()
 
+        self.observation_handler.text_processor.reset_observation_delta()
+        # the hit rate is per episode
+        self.observation_reuse_hits = 0
+        self.observation_reuse_steps = 0
+        self.page_fingerprint = self._fingerprint_page()
         observation = self._get_obs()
         self.obs = observation
         observation_metadata = self._get_obs_metadata()
         info = {
-            "page": DetachedPage(self.page.url, ""),
+            "page": self._detach_page(),
             "fail_error": "",
             "observation_metadata": observation_metadata,
+            "settle_time": settle_time,
+            "har_misses": list(self.har_misses),
         }
+        if self.page_fingerprinter is not None:
+            info["observation_reuse"] = self._observation_reuse_info(False)
 
         return (observation, info)
 
-    def save_trace(self, trace_path: str | Path) -> None:
-        if self.save_trace_enabled:
-            self.context.tracing.stop(path=trace_path)
+    def checkpoint(self) -> BrowserCheckpoint:
+        """Capture the cookies, localStorage, open tabs, scroll offsets and
+        form values of the current episode, see `restore`"""
+        if not self.reset_finished:
+            raise RuntimeError("Call reset first before calling checkpoint.")
+        pages = []
+        for page in self.context.pages:
+            try:
+                state = page.evaluate(CAPTURE_PAGE_STATE_JS)
+            except Exception:
+                # the page is navigating, only keep its url
+                state = {"scrollX": 0, "scrollY": 0, "fields": []}
+            pages.append(
+                PageCheckpoint(
+                    url=page.url,
+                    scroll_x=state["scrollX"],
+                    scroll_y=state["scrollY"],
+                    fields=state["fields"],
+                )
+            )
+        return BrowserCheckpoint(
+            storage_state=self.context.storage_state(),  # type: ignore[arg-type]
+            pages=pages,
+            current_page=self.context.pages.index(self.page),
+            geolocation=self.instance_config.get("geolocation", None),
+        )
+
+    def restore(
+        self, checkpoint: BrowserCheckpoint
+    ) -> tuple[dict[str, Observation], dict[str, Any]]:
+        """Rebuild the state captured by `checkpoint` in a fresh context
+        and return the observation like `reset`. The tabs are reloaded from
+        their urls before the scroll offsets and the form values are put
+        back. The same checkpoint can be restored many times.
+        A traced task stays traced, the trace of the replaced context is
+        written by `save_trace` along with the final one."""
+        self._expire_step_handles()
+        if not self.browsers:
+            self._launch_browsers()
+        traced = self.reset_finished and self.context in self.traced_contexts
+        if traced:
+            if self.trace_staging is None:
+                self.trace_staging = TraceStaging()
+            self.traced_contexts.discard(self.context)
+            segment = self.trace_staging.staging_path("restore.zip")
+            self.context.tracing.stop(path=segment)
+            self.trace_segments.append(segment)
+        # keep replaying the HAR of the episode, a checkpoint is never
+        # recorded into it though
+        context = self._new_context(
+            {
+                "storage_state": checkpoint.storage_state,
+                "geolocation": checkpoint.geolocation,
+            },
+            self.har_path if self.har_mode == "replay" else None,
+        )
+        if traced:
+            self._start_tracing(context)
+        for page_checkpoint in checkpoint.pages:
+            page = self._new_page(context, page_checkpoint.url)
+            try:
+                page.evaluate(
+                    RESTORE_PAGE_STATE_JS,
+                    {
+                        "scrollX": page_checkpoint.scroll_x,
+                        "scrollY": page_checkpoint.scroll_y,
+                        "fields": page_checkpoint.fields,
+                    },
+                )
+            except Exception:
+                pass
+        if not context.pages:
+            self._new_page(context)
+
+        if self.reset_finished:
+            # only the context is replaced, the browser is kept
+            try:
+                self.context.close()
+            except Exception:
+                pass
+        self.context = context
+        self.browser = self.context.browser  # type: ignore[assignment]
+        self.instance_config = {"geolocation": checkpoint.geolocation}
+        self.page = self.context.pages[
+            min(checkpoint.current_page, len(self.context.pages) - 1)
+        ]
+        self.page.bring_to_front()
+        self.reset_finished = True
+
+        return self._initial_observation()
+
+    def save_trace(
+        self, trace_path: str | Path, success: bool | None = None
+    ) -> None:
+        """Stop tracing the current context and write the trace to
+        `trace_path`. With the "failures" policy the trace of a successful
+        task is discarded.
+        The traces of the contexts replaced by `restore` are written next to
+        it, as <name>-before-restore-<i> in the order of the restores."""
+        if self.context not in self.traced_contexts:
+            return
+        self.traced_contexts.discard(self.context)
+        if self.trace_policy == "failures" and success:
+            self.context.tracing.stop()
+            self._discard_trace_segments()
+            return
+        trace_path = Path(trace_path)
+        for idx, segment in enumerate(self.trace_segments):
+            name = f"{trace_path.stem}-before-restore-{idx}"
+            TraceStaging.move(
+                segment, trace_path.with_name(name + trace_path.suffix)
+            )
+        self.trace_segments = []
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        self.context.tracing.stop(path=trace_path)
 
     def close(self) -> None:
+        self._expire_step_handles()
+        if self.prefetched is not None:
+            self.prefetched[1].close()
+            self.prefetched = None
         if self.reset_finished:
+            self._teardown()
+        if self.browsers:
             self.context_manager.__exit__()
+            self.browsers = []
+        self.reset_finished = False
+
+        self.trace_segments = []
+        if self.trace_staging is not None:
+            self.trace_staging.close()
+            self.trace_staging = None
 
         if self.port is not None:
             utils.release_gitlab_port(self.port)
 
-
-    def step2(self, f):
-        '''
+    def step2(self, f, observation_modalities: tuple[str, ...] | None = None):
+        """
         experimenting with alternative ui for actions
-        '''
+        """
         if not self.reset_finished:
             raise RuntimeError("Call reset first before calling step.")
 
         success = False
         fail_error = ""
+        self._expire_step_handles()
+        if self.settle_strategy == "event":
+            self.page_settler.track(self.get_page_client(self.page))
         try:
             f()
             success = True
         except Exception as e:
             fail_error = str(e)
+        if self.screencast is not None:
+            self.screencast.invalidate_frames()
 
-        # hard sleep TODO[shuyanzh] suboptimal, may need to check network
-        if self.sleep_after_execution > 0:
-            time.sleep(self.sleep_after_execution)
+        settle_time = self._settle()
 
-        observation = self._get_obs()
+        observation, reused = self._get_step_obs(observation_modalities)
         observation_metadata = self._get_obs_metadata()
         self.obs = observation
 
         info = {
-            "page": DetachedPage(self.page.url, self.page.content()),
+            "page": self._detach_page(),
             "fail_error": fail_error,
             "observation_metadata": observation_metadata,
+            "settle_time": settle_time,
+            "har_misses": list(self.har_misses),
         }
+        if self.page_fingerprinter is not None:
+            info["observation_reuse"] = self._observation_reuse_info(reused)
         msg = (
             observation,
             float(success),  # reward
@@ -274,13 +827,20 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
         return msg
 
     def step(
-        self, action: Action
+        self,
+        action: Action,
+        observation_modalities: tuple[str, ...] | None = None,
     ) -> tuple[dict[str, Observation], float, bool, bool, dict[str, Any]]:
+        """Execute the action and return the observation of the modalities
+        in `observation_modalities`, by default those of the env"""
         if not self.reset_finished:
             raise RuntimeError("Call reset first before calling step.")
 
         success = False
         fail_error = ""
+        self._expire_step_handles()
+        if self.settle_strategy == "event":
+            self.page_settler.track(self.get_page_client(self.page))
         try:
             self.page = execute_action(
                 action,
@@ -292,20 +852,24 @@ class ScriptBrowserEnv(Env[dict[str, Observation], Action]):
         except Exception as e:
             print(f"Failed to execute action {action}: {e}")
             fail_error = str(e)
+        if self.screencast is not None:
+            self.screencast.invalidate_frames()
 
-        # hard sleep TODO[shuyanzh] suboptimal, may need to check network
-        if self.sleep_after_execution > 0:
-            time.sleep(self.sleep_after_execution)
+        settle_time = self._settle()
 
-        observation = self._get_obs()
+        observation, reused = self._get_step_obs(observation_modalities)
         observation_metadata = self._get_obs_metadata()
         self.obs = observation
 
         info = {
-            "page": DetachedPage(self.page.url, self.page.content()),
+            "page": self._detach_page(),
             "fail_error": fail_error,
             "observation_metadata": observation_metadata,
+            "settle_time": settle_time,
+            "har_misses": list(self.har_misses),
         }
+        if self.page_fingerprinter is not None:
+            info["observation_reuse"] = self._observation_reuse_info(reused)
         msg = (
             observation,
             float(success),  # reward
@@ -0,0 +1,112 @@
+"""Describe a text observation as the change from the last keyframe"""
+from typing import TypedDict
+
+
+class ObservationDelta(TypedDict):
+    # a keyframe carries no diff, the full observation has to be used
+    keyframe: bool
+    # the node texts of the added and changed nodes, and of the removed
+    # nodes as they were, by node id, all since the keyframe
+    added: dict[str, str]
+    removed: dict[str, str]
+    changed: dict[str, str]
+    # the full text observation of the keyframe the delta applies to
+    keyframe_observation: str
+
+
+class ObservationDiffer:
+    """Diff the nodes of each text observation against those of the last
+    keyframe by their stable ids, so that a delta is complete on its own
+    given the keyframe observation.
+    A keyframe is emitted for the first observation, every
+    `keyframe_interval` observations, when the url changes and when more
+    than `max_change_ratio` of the nodes changed since the keyframe."""
+
+    def __init__(
+        self, keyframe_interval: int = 10, max_change_ratio: float = 0.5
+    ) -> None:
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be positive")
+        self.keyframe_interval = keyframe_interval
+        self.max_change_ratio = max_change_ratio
+        self.reset()
+
+    def reset(self) -> None:
+        """The next observation is a keyframe"""
+        self.keyframe_nodes: dict[str, str] | None = None
+        self.keyframe_url = ""
+        self.keyframe_observation = ""
+        self.since_keyframe = 0
+
+    def diff(
+        self, nodes: dict[str, str], url: str, observation: str = ""
+    ) -> ObservationDelta:
+        """`nodes` maps the stable id of each node to its text and
+        `observation` is the full text, kept if this is a keyframe"""
+        self.since_keyframe += 1
+        base = self.keyframe_nodes
+        if (
+            base is None
+            or url != self.keyframe_url
+            or self.since_keyframe >= self.keyframe_interval
+        ):
+            return self._keyframe(nodes, url, observation)
+
+        added = {
+            node_id: text
+            for node_id, text in nodes.items()
+            if node_id not in base
+        }
+        removed = {
+            node_id: text
+            for node_id, text in base.items()
+            if node_id not in nodes
+        }
+        # the html element ids are tree positions, a node whose id moved
+        # has changed as well
+        changed = {
+            node_id: text
+            for node_id, text in nodes.items()
+            if node_id in base and base[node_id] != text
+        }
+        num_changes = len(added) + len(removed) + len(changed)
+        if num_changes > self.max_change_ratio * max(len(nodes), 1):
+            return self._keyframe(nodes, url, observation)
+        return {
+            "keyframe": False,
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "keyframe_observation": self.keyframe_observation,
+        }
+
+    def _keyframe(
+        self, nodes: dict[str, str], url: str, observation: str
+    ) -> ObservationDelta:
+        self.keyframe_nodes = nodes
+        self.keyframe_url = url
+        self.keyframe_observation = observation
+        self.since_keyframe = 0
+        return {
+            "keyframe": True,
+            "added": {},
+            "removed": {},
+            "changed": {},
+            "keyframe_observation": observation,
+        }
+
+
+def render_observation_delta(delta: ObservationDelta) -> str:
+    """A compact "what changed" text of a non-keyframe delta"""
+    if not (delta["added"] or delta["removed"] or delta["changed"]):
+        return "No change since the observation above."
+    lines = ["Changes since the observation above:"]
+    for title, nodes in [
+        ("Added", delta["added"]),
+        ("Removed", delta["removed"]),
+        ("Changed", delta["changed"]),
+    ]:
+        if nodes:
+            lines.append(f"{title}:")
+            lines.extend(f"\t{text}" for text in nodes.values())
+    return "\n".join(lines)
@@ -0,0 +1,107 @@
+"""A cheap fingerprint of the page to detect that an action changed nothing"""
+import weakref
+from typing import Any, Hashable
+
+from playwright.sync_api import CDPSession, Page
+
+# installs a DOM version counter in the document on the first call, a new
+# document gets a new token so it never matches the fingerprint of the
+# previous one. Besides the mutations, the counter is bumped by the events
+# that change the rendered tree without touching the DOM: form values,
+# focus, hovering and the scroll of inner elements.
+PAGE_FINGERPRINT_JS = """
+() => {
+    let state = window.__webarenaPageVersion;
+    if (!state) {
+        state = {token: Math.random().toString(36).slice(2), version: 0};
+        const bump = () => { state.version += 1; };
+        state.observer = new MutationObserver((records) => {
+            state.version += records.length;
+        });
+        state.observer.observe(document, {
+            subtree: true,
+            childList: true,
+            attributes: true,
+            characterData: true,
+        });
+        for (const type of [
+            "input", "change", "focusin", "focusout", "mouseover", "scroll",
+        ]) {
+            document.addEventListener(type, bump, true);
+        }
+        window.__webarenaPageVersion = state;
+    }
+    // the mutations not yet delivered to the observer
+    state.version += state.observer.takeRecords().length;
+    return [
+        location.href,
+        document.title,
+        state.token,
+        state.version,
+        window.scrollX,
+        window.scrollY,
+        window.innerWidth,
+        window.innerHeight,
+        document.readyState,
+    ];
+}
+"""
+
+
+class AccessibilityEventCounter:
+    """Count the Accessibility events of a page, the accessibility tree
+    changed since the last fingerprint if the count did"""
+
+    def __init__(self, client: CDPSession) -> None:
+        self.count = 0
+        client.on("Accessibility.nodesUpdated", self._on_event)
+        client.on("Accessibility.loadComplete", self._on_event)
+
+    def _on_event(self, event: dict[str, Any]) -> None:
+        self.count += 1
+
+
+class PageFingerprinter:
+    """Fingerprint the current page in one round-trip: the url, the title,
+    a DOM version counter, the scroll offsets and the viewport come from
+    the page, the number of Accessibility events is known without asking
+    the browser. The text observation starts with the titles of all tabs,
+    the other tabs add their url and one round-trip for their title.
+    Two equal fingerprints mean the observation of the first one can be
+    reused for the second one."""
+
+    def __init__(self, count_accessibility_events: bool = False) -> None:
+        # the Accessibility domain has to be enabled for the events
+        self.count_accessibility_events = count_accessibility_events
+        self.counters: weakref.WeakKeyDictionary[
+            CDPSession, AccessibilityEventCounter
+        ] = weakref.WeakKeyDictionary()
+
+    def track(self, client: CDPSession) -> AccessibilityEventCounter | None:
+        """Start counting the Accessibility events of the page behind the
+        client, it is called lazily by `fingerprint`"""
+        if not self.count_accessibility_events:
+            return None
+        if client not in self.counters:
+            try:
+                self.counters[client] = AccessibilityEventCounter(client)
+            except Exception:
+                # the session is detached, e.g., the page is closed
+                return None
+        return self.counters[client]
+
+    def fingerprint(self, page: Page, client: CDPSession) -> Hashable | None:
+        """None if the page cannot be fingerprinted, e.g., during a
+        navigation, it never matches"""
+        counter = self.track(client)
+        try:
+            page_state = tuple(page.evaluate(PAGE_FINGERPRINT_JS))
+            tabs = tuple(
+                # the current tab is part of the page state
+                None if tab == page else (tab.url, tab.title())
+                for tab in page.context.pages
+            )
+        except Exception:
+            return None
+        events = counter.count if counter is not None else None
+        return (page_state, tabs, events)
@@ -1,21 +1,32 @@
+import asyncio
+import base64
 import json
 import re
+import time
+import weakref
 from collections import defaultdict
-from typing import Any, TypedDict, Union
+from dataclasses import dataclass, replace
+from typing import Any, Callable, TypedDict, Union
 
 import numpy as np
 import numpy.typing as npt
 from gymnasium import spaces
+from playwright.async_api import CDPSession as ACDPSession
+from playwright.async_api import Page as APage
 from playwright.sync_api import CDPSession, Page, ViewportSize
 from utils import log_to_file
-
+from webarena.browser_env.accessibility_tree import (
+    ColumnarAccessibilityTree,
+    IncrementalAccessibilityTree,
+)
 from webarena.browser_env.constants import (
     ASCII_CHARSET,
     FREQ_UNICODE_CHARSET,
     IGNORED_ACTREE_PROPERTIES,
     UTTERANCE_MAX_LENGTH,
 )
-
+from webarena.browser_env.observation_delta import ObservationDiffer
+from webarena.browser_env.screencast import Screencast
 from webarena.browser_env.utils import (
     AccessibilityTree,
     AccessibilityTreeNode,
@@ -24,11 +35,77 @@ from webarena.browser_env.utils import (
     DOMNode,
     DOMTree,
     Observation,
+    image_bytes_to_numpy,
     png_bytes_to_numpy,
 )
 
 IN_VIEWPORT_RATIO_THRESHOLD = 0.6
 
+# the window metrics of BrowserConfig in one round trip
+WINDOW_METRICS_JS = """
+    () => [
+        window.pageYOffset,
+        window.pageXOffset,
+        window.screen.width,
+        window.screen.height,
+        window.devicePixelRatio,
+    ]
+"""
+
+BOUNDING_CLIENT_RECT_JS = """
+    function() {
+        if (this.nodeType == 3) {
+            var range = document.createRange();
+            range.selectNode(this);
+            var rect = range.getBoundingClientRect().toJSON();
+            range.detach();
+            return rect;
+        } else {
+            return this.getBoundingClientRect().toJSON();
+        }
+    }
+"""
+
+
+# the bounding client rects of many nodes in one call, a target is the path
+# of the node from the main document, as child indices, "s" for the open
+# shadow root and "d" for the content document of an iframe, and the
+# expected node name. A node that cannot be reached resolves to null.
+BATCH_BOUNDING_CLIENT_RECTS_JS = """
+    (targets) => targets.map(([path, nodeName]) => {
+        try {
+            let node = document;
+            for (const step of path) {
+                if (step === "s") {
+                    node = node.shadowRoot;
+                } else if (step === "d") {
+                    node = node.contentDocument;
+                } else {
+                    node = node.childNodes[step];
+                }
+                if (!node) {
+                    return null;
+                }
+            }
+            if (node.nodeName !== nodeName) {
+                return null;
+            }
+            let rect;
+            if (node.nodeType == 3) {
+                const range = node.ownerDocument.createRange();
+                range.selectNode(node);
+                rect = range.getBoundingClientRect();
+                range.detach();
+            } else {
+                rect = node.getBoundingClientRect();
+            }
+            return [rect.x, rect.y, rect.width, rect.height];
+        } catch (e) {
+            return null;
+        }
+    })
+"""
+
 
 class ObservationProcessor:
     def process(self, page: Page, client: CDPSession, env=None) -> Observation:
@@ -51,14 +128,37 @@ class TextObservationProcessor(ObservationProcessor):
         observation_type: str,
         current_viewport_only: bool,
         viewport_size: ViewportSize,
+        bounds_source: str = "snapshot",
+        incremental_accessibility_tree: bool = False,
+        observation_delta: bool = False,
+        keyframe_interval: int = 10,
     ):
         self.observation_type = observation_type
         self.current_viewport_only = current_viewport_only
         self.viewport_size = viewport_size
+        # where the viewport filtering takes the bounding boxes from
+        # "snapshot": the layout bounds of the DOMSnapshot, no extra calls
+        # "client_rect": getBoundingClientRect in the page
+        if bounds_source not in ["snapshot", "client_rect"]:
+            raise ValueError(f"Unsupported bounds source: {bounds_source}")
+        self.bounds_source = bounds_source
+        # patch the accessibility tree of each page from the CDP events
+        # instead of refetching it for every observation
+        self.incremental_accessibility_tree = incremental_accessibility_tree
+        self.accessibility_trees: weakref.WeakKeyDictionary[
+            CDPSession, IncrementalAccessibilityTree
+        ] = weakref.WeakKeyDictionary()
+        # diff each observation against the last keyframe in
+        # meta_data["observation_delta"]
+        self.observation_differ = (
+            ObservationDiffer(keyframe_interval) if observation_delta else None
+        )
         self.observation_tag = "text"
         self.meta_data = (
             create_empty_metadata()
         )  # use the store meta data of this observation type
+        # the CDP calls of the current observation
+        self.cdp_calls = 0
 
     class BoundingBoxThunk:
         """
@@ -81,17 +181,22 @@ class TextObservationProcessor(ObservationProcessor):
                     self.client, self.backend_node_id
                 )
 
-                if response.get("result", {}).get("subtype", "") == "error":
-                    self.bounding_box = None
-                else:
-                    x = response["result"]["value"]["x"]
-                    y = response["result"]["value"]["y"]
-                    width = response["result"]["value"]["width"]
-                    height = response["result"]["value"]["height"]
-                    self.bounding_box = [x, y, width, height]
+                self.bounding_box = self.response_to_bounding_box(response)
 
             return self.bounding_box
 
+        @staticmethod
+        def response_to_bounding_box(
+            response: dict[str, Any]
+        ) -> list[float] | None:
+            if response.get("result", {}).get("subtype", "") == "error":
+                return None
+            x = response["result"]["value"]["x"]
+            y = response["result"]["value"]["y"]
+            width = response["result"]["value"]["width"]
+            height = response["result"]["value"]["height"]
+            return [x, y, width, height]
+
         def __str__(self):
             return f"BoundingBoxThunk(backend_id={self.backend_node_id}, bb={self.bounding_box}, forced={self.already_forced})"
 
@@ -105,6 +210,13 @@ class TextObservationProcessor(ObservationProcessor):
             bbth.already_forced = True
             return bbth
 
+    def needs_dom_snapshot(self) -> bool:
+        """Whether the observation reads the DOMSnapshot: the html tree is
+        built from it and the viewport filtering takes the layout bounds
+        from it"""
+        return self.observation_type == "html" or (
+            self.current_viewport_only and self.bounds_source == "snapshot"
+        )
 
     def fetch_browser_info(
         self,
@@ -112,30 +224,36 @@ class TextObservationProcessor(ObservationProcessor):
         client: CDPSession,
     ) -> BrowserInfo:
         # extract domtree
-        tree = client.send(
-            "DOMSnapshot.captureSnapshot",
-            {
-                "computedStyles": [],
-                "includeDOMRects": True,
-                "includePaintOrder": True,
-            },
-        )
+        tree = None
+        if self.needs_dom_snapshot():
+            tree = client.send(
+                "DOMSnapshot.captureSnapshot",
+                {"computedStyles": [], "includeDOMRects": True},
+            )
+            self.cdp_calls += 1
 
+        # extract browser info
+        return self.build_browser_info(tree, *page.evaluate(WINDOW_METRICS_JS))
+
+    def build_browser_info(
+        self,
+        tree: dict[str, Any] | None,
+        win_top_bound: float,
+        win_left_bound: float,
+        win_width: float,
+        win_height: float,
+        device_pixel_ratio: float,
+    ) -> BrowserInfo:
         # calibrate the bounds, in some cases, the bounds are scaled somehow
-        bounds = tree["documents"][0]["layout"]["bounds"]
-        b = bounds[0]
-        n = b[2] / self.viewport_size["width"]
-        bounds = [[x / n for x in bound] for bound in bounds]
-        tree["documents"][0]["layout"]["bounds"] = bounds
+        if tree is not None:
+            bounds = tree["documents"][0]["layout"]["bounds"]
+            b = bounds[0]
+            n = b[2] / self.viewport_size["width"]
+            bounds = [[x / n for x in bound] for bound in bounds]
+            tree["documents"][0]["layout"]["bounds"] = bounds
 
-        # extract browser info
-        win_top_bound = page.evaluate("window.pageYOffset")
-        win_left_bound = page.evaluate("window.pageXOffset")
-        win_width = page.evaluate("window.screen.width")
-        win_height = page.evaluate("window.screen.height")
         win_right_bound = win_left_bound + win_width
         win_lower_bound = win_top_bound + win_height
-        device_pixel_ratio = page.evaluate("window.devicePixelRatio")
         assert device_pixel_ratio == 1.0, "devicePixelRatio is not 1.0"
 
         config: BrowserConfig = {
@@ -166,19 +284,7 @@ class TextObservationProcessor(ObservationProcessor):
                 "Runtime.callFunctionOn",
                 {
                     "objectId": remote_object_id,
-                    "functionDeclaration": """
-                        function() {
-                            if (this.nodeType == 3) {
-                                var range = document.createRange();
-                                range.selectNode(this);
-                                var rect = range.getBoundingClientRect().toJSON();
-                                range.detach();
-                                return rect;
-                            } else {
-                                return this.getBoundingClientRect().toJSON();
-                            }
-                        }
-                    """,
+                    "functionDeclaration": BOUNDING_CLIENT_RECT_JS,
                     "returnByValue": True,
                 },
             )
@@ -218,6 +324,246 @@ class TextObservationProcessor(ObservationProcessor):
         ratio = overlap_width * overlap_height / width * height
         return ratio
 
+    @staticmethod
+    def get_elements_in_viewport_ratio(
+        bounds: npt.NDArray[np.float64], config: BrowserConfig
+    ) -> npt.NDArray[np.float64]:
+        """`get_element_in_viewport_ratio` of all rows [x, y, width,
+        height] of `bounds` at once"""
+        x, y, width, height = bounds.T
+        overlap_width = np.maximum(
+            0, np.minimum(x + width, config["win_width"]) - np.maximum(x, 0)
+        )
+        overlap_height = np.maximum(
+            0,
+            np.minimum(y + height, config["win_height"]) - np.maximum(y, 0),
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return overlap_width * overlap_height / width * height
+
+    @classmethod
+    def viewport_removal_mask(
+        cls,
+        nodes: DOMTree | AccessibilityTree,
+        config: BrowserConfig,
+    ) -> npt.NDArray[np.bool_]:
+        """Whether each node is removed by the viewport filtering: it has
+        no bounding box, it is invisible or mostly outside of the viewport.
+        The bounding boxes must be resolved."""
+        bounds = np.full((len(nodes), 4), np.nan)
+        for cursor, node in enumerate(nodes):
+            if node["union_bound"] and node["union_bound"].force():
+                bounds[cursor] = node["union_bound"].force()
+        return cls.bounds_removal_mask(bounds, config)
+
+    @classmethod
+    def bounds_removal_mask(
+        cls, bounds: npt.NDArray[np.float64], config: BrowserConfig
+    ) -> npt.NDArray[np.bool_]:
+        """The viewport removal mask of the (x, y, width, height) rows of
+        `bounds`, NaN for no bounding box"""
+        width, height = bounds[:, 2], bounds[:, 3]
+        ratio = cls.get_elements_in_viewport_ratio(bounds, config)
+        return (
+            np.isnan(width)
+            | (width == 0)
+            | (height == 0)
+            | (ratio < IN_VIEWPORT_RATIO_THRESHOLD)
+        )
+
+    def make_bounding_box_thunk(
+        self, client: CDPSession, backend_node_id: str
+    ) -> "TextObservationProcessor.BoundingBoxThunk":
+        return TextObservationProcessor.BoundingBoxThunk(
+            client, backend_node_id
+        )
+
+    @staticmethod
+    def backend_node_paths(
+        root: dict[str, Any], backend_node_ids: set[int]
+    ) -> dict[int, tuple[list[int | str], str]]:
+        """The path of each node in the DOM.getDocument tree `root` whose
+        backend node id is in `backend_node_ids`, see
+        BATCH_BOUNDING_CLIENT_RECTS_JS"""
+        paths: dict[int, tuple[list[int | str], str]] = {}
+        stack: list[tuple[dict[str, Any], list[int | str]]] = [(root, [])]
+        while stack:
+            node, path = stack.pop()
+            if node["backendNodeId"] in backend_node_ids:
+                paths[node["backendNodeId"]] = (path, node["nodeName"])
+            if "contentDocument" in node:
+                stack.append((node["contentDocument"], path + ["d"]))
+            for shadow_root in node.get("shadowRoots", []):
+                # closed and user agent shadow roots are not reachable
+                if shadow_root.get("shadowRootType") == "open":
+                    stack.append((shadow_root, path + ["s"]))
+            for idx, child in enumerate(node.get("children", [])):
+                stack.append((child, path + [idx]))
+        return paths
+
+    @staticmethod
+    def pending_bounding_boxes(
+        nodes: DOMTree | AccessibilityTree,
+    ) -> list["TextObservationProcessor.BoundingBoxThunk"]:
+        return [
+            node["union_bound"]
+            for node in nodes
+            if node["union_bound"] and not node["union_bound"].already_forced
+        ]
+
+    @staticmethod
+    def batch_bounding_client_rects_expression(
+        paths: dict[int, tuple[list[int | str], str]],
+        thunks: list["TextObservationProcessor.BoundingBoxThunk"],
+    ) -> str:
+        targets = [
+            paths[int(thunk.backend_node_id)]
+            for thunk in thunks
+            if int(thunk.backend_node_id) in paths
+        ]
+        return f"({BATCH_BOUNDING_CLIENT_RECTS_JS})({json.dumps(targets)})"
+
+    @staticmethod
+    def fill_bounding_boxes(
+        paths: dict[int, tuple[list[int | str], str]],
+        thunks: list["TextObservationProcessor.BoundingBoxThunk"],
+        rects: list[list[float] | None],
+    ) -> list["TextObservationProcessor.BoundingBoxThunk"]:
+        """Fill the thunks from the batched rects, return the thunks that
+        were not resolved"""
+        unresolved = []
+        rects_iter = iter(rects)
+        for thunk in thunks:
+            rect = (
+                next(rects_iter)
+                if int(thunk.backend_node_id) in paths
+                else None
+            )
+            if rect is None:
+                unresolved.append(thunk)
+            else:
+                thunk.bounding_box = rect
+                thunk.already_forced = True
+        return unresolved
+
+    @staticmethod
+    def join_snapshot_bounds(
+        backend_node_ids: npt.NDArray[np.int64], info: BrowserInfo
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.bool_]]:
+        """The layout bounds of the nodes in the DOMSnapshot of `info`, in
+        viewport coordinates, and whether the node is in the main document.
+        A node of the main document without a layout object, e.g., with
+        display: none, gets an empty box as from getBoundingClientRect."""
+        document = info["DOMTree"]["documents"][0]
+        layout = document["layout"]
+        config = info["config"]
+        document_ids = np.asarray(
+            document["nodes"]["backendNodeId"], dtype=np.int64
+        )
+        layout_ids = document_ids[
+            np.asarray(layout["nodeIndex"], dtype=np.int64)
+        ]
+        layout_bounds = np.asarray(layout["bounds"], dtype=np.float64).reshape(
+            -1, 4
+        ) - [
+            config["win_left_bound"],
+            config["win_top_bound"],
+            0,
+            0,
+        ]
+        # the first layout object of a node, e.g., of an inline element that
+        # is split by a block
+        layout_ids, first = np.unique(layout_ids, return_index=True)
+        layout_bounds = layout_bounds[first]
+
+        bounds = np.zeros((len(backend_node_ids), 4))
+        in_document = np.isin(backend_node_ids, document_ids)
+        if len(layout_ids):
+            cursors = np.minimum(
+                np.searchsorted(layout_ids, backend_node_ids),
+                len(layout_ids) - 1,
+            )
+            has_layout = layout_ids[cursors] == backend_node_ids
+            bounds[has_layout] = layout_bounds[cursors[has_layout]]
+        return bounds, in_document
+
+    def fill_bounding_boxes_from_snapshot(
+        self, nodes: DOMTree | AccessibilityTree, info: BrowserInfo
+    ) -> None:
+        """Resolve the bounding boxes of the nodes of the main document from
+        the DOMSnapshot bounds, without any CDP call"""
+        thunks = self.pending_bounding_boxes(nodes)
+        if not thunks or info["DOMTree"] is None:
+            return
+        bounds, in_document = self.join_snapshot_bounds(
+            np.array([int(thunk.backend_node_id) for thunk in thunks]), info
+        )
+        for thunk, bound, found in zip(thunks, bounds.tolist(), in_document):
+            if found:
+                thunk.bounding_box = bound
+                thunk.already_forced = True
+
+    def resolve_bounding_boxes(
+        self,
+        client: CDPSession,
+        nodes: DOMTree | AccessibilityTree,
+        info: BrowserInfo,
+    ) -> None:
+        """Resolve the bounding boxes needed by the viewport filtering"""
+        if self.bounds_source == "snapshot":
+            self.fill_bounding_boxes_from_snapshot(nodes, info)
+        # the nodes outside of the main document, e.g., in an iframe
+        self.force_bounding_boxes(client, nodes)
+
+    def force_bounding_boxes(
+        self, client: CDPSession, nodes: DOMTree | AccessibilityTree
+    ) -> None:
+        """Resolve the bounding boxes of all nodes with a few CDP calls
+        instead of two calls per node. The nodes that cannot be reached
+        from the main document, e.g., in a closed shadow root, fall back to
+        the per-node resolution."""
+        self.force_thunks(client, self.pending_bounding_boxes(nodes))
+
+    def force_thunks(
+        self,
+        client: CDPSession,
+        thunks: list["TextObservationProcessor.BoundingBoxThunk"],
+    ) -> None:
+        """Resolve the bounding boxes of the thunks, see
+        `force_bounding_boxes`"""
+        if not thunks:
+            return
+        try:
+            # keep the whitespace text nodes so that the child indices
+            # match the childNodes in the page
+            client.send("DOM.enable", {"includeWhitespace": "all"})
+            root = client.send(
+                "DOM.getDocument", {"depth": -1, "pierce": True}
+            )
+            client.send("DOM.disable")
+            paths = self.backend_node_paths(
+                root["root"],
+                {int(thunk.backend_node_id) for thunk in thunks},
+            )
+            response = client.send(
+                "Runtime.evaluate",
+                {
+                    "expression": self.batch_bounding_client_rects_expression(
+                        paths, thunks
+                    ),
+                    "returnByValue": True,
+                },
+            )
+            self.cdp_calls += 4
+            unresolved = self.fill_bounding_boxes(
+                paths, thunks, response["result"]["value"]
+            )
+        except Exception:
+            unresolved = thunks
+        for thunk in unresolved:
+            thunk.force()
+            self.cdp_calls += 2
+
     def fetch_page_html(
         self,
         info: BrowserInfo,
@@ -225,6 +571,14 @@ class TextObservationProcessor(ObservationProcessor):
         client: CDPSession,
         current_viewport_only: bool,
     ) -> DOMTree:
+        dom_tree = self.build_dom_tree(info, client)
+        # remove the nodes that are not in the current viewport
+        if current_viewport_only:
+            self.resolve_bounding_boxes(client, dom_tree, info)
+            dom_tree = self.filter_dom_tree_in_viewport(dom_tree, info)
+        return dom_tree
+
+    def build_dom_tree(self, info: BrowserInfo, client: CDPSession) -> DOMTree:
         # adopted from [natbot](https://github.com/nat/natbot)
         tree = info["DOMTree"]
         strings = tree["strings"]
@@ -284,10 +638,14 @@ class TextObservationProcessor(ObservationProcessor):
 
             # get the bound
             if cur_node["parentId"] == "-1":
-                cur_node["union_bound"] = TextObservationProcessor.BoundingBoxThunk.constant([0.0, 0.0, 10.0, 10.0])
+                cur_node[
+                    "union_bound"
+                ] = TextObservationProcessor.BoundingBoxThunk.constant(
+                    [0.0, 0.0, 10.0, 10.0]
+                )
             else:
                 # lazy evaluation
-                cur_node["union_bound"] = TextObservationProcessor.BoundingBoxThunk(
+                cur_node["union_bound"] = self.make_bounding_box_thunk(
                     client, cur_node["backendNodeId"]
                 )
 
@@ -297,63 +655,50 @@ class TextObservationProcessor(ObservationProcessor):
         for parent_id, child_ids in graph.items():
             dom_tree[int(parent_id)]["childIds"] = child_ids
 
-        # remove the nodes that are not in the current viewport
-        if current_viewport_only:
+        return dom_tree
 
-            def remove_node_in_graph(node: DOMNode) -> None:
-                # update the node information in the accessibility tree
-                node_id = node["nodeId"]
-                parent_id = node["parentId"]
-                child_ids = node["childIds"]
-
-                # update the children of the parent node
-                assert dom_tree[int(parent_id)]["parentId"] != "[REMOVED]"
-                # remove the nodeid from parent
-                index = dom_tree[int(parent_id)]["childIds"].index(node_id)
-                dom_tree[int(parent_id)]["childIds"].pop(index)
-
-                # Insert children_nodeids in the same location
-                for child_id in child_ids:
-                    dom_tree[int(parent_id)]["childIds"].insert(
-                        index, child_id
+    @staticmethod
+    def prune_tree(
+        nodes: DOMTree | AccessibilityTree,
+        removal_mask: npt.NDArray[np.bool_] | list[bool],
+    ) -> Any:
+        """Remove the nodes in `removal_mask` from the tree in one pass. The
+        surviving descendants of a removed node take its place in the child
+        list of the nearest surviving ancestor, in order, and point to that
+        ancestor as their parent."""
+        cursors = {node["nodeId"]: cursor for cursor, node in enumerate(nodes)}
+        for node, removed in zip(nodes, removal_mask):
+            if removed:
+                continue
+            child_ids = []
+            # (child id, whether it is reached through a removed node)
+            stack = [
+                (child_id, False) for child_id in reversed(node["childIds"])
+            ]
+            while stack:
+                child_id, spliced = stack.pop()
+                child_cursor = cursors.get(child_id)
+                if child_cursor is None or not removal_mask[child_cursor]:
+                    child_ids.append(child_id)
+                    if spliced and child_cursor is not None:
+                        nodes[child_cursor]["parentId"] = node["nodeId"]
+                else:
+                    stack.extend(
+                        (grandchild_id, True)
+                        for grandchild_id in reversed(
+                            nodes[child_cursor]["childIds"]
+                        )
                     )
-                    index += 1
-
-                # update children node's parent
-                for child_id in child_ids:
-                    dom_tree[int(child_id)]["parentId"] = parent_id
-                # mark as removed
-                dom_tree[int(node_id)]["parentId"] = "[REMOVED]"
-
-            config = info["config"]
-            for cursor, node in enumerate(dom_tree):
-                if not node["union_bound"] or not node["union_bound"].force():
-                    remove_node_in_graph(node)
-                    continue
-
-                [x, y, width, height] = node["union_bound"].force()
-
-                # invisible node
-                if width == 0.0 or height == 0.0:
-                    remove_node_in_graph(node)
-                    continue
-
-                in_viewport_ratio = self.get_element_in_viewport_ratio(
-                    elem_left_bound=float(x),
-                    elem_top_bound=float(y),
-                    width=float(width),
-                    height=float(height),
-                    config=config,
-                )
-
-                if in_viewport_ratio < IN_VIEWPORT_RATIO_THRESHOLD:
-                    remove_node_in_graph(node)
+            node["childIds"] = child_ids
+        return [
+            node for node, removed in zip(nodes, removal_mask) if not removed
+        ]
 
-            dom_tree = [
-                node
-                for node in dom_tree
-                if node.get("parentId", "-1") != "[REMOVED]"
-            ]
+    def filter_dom_tree_in_viewport(
+        self, dom_tree: DOMTree, info: BrowserInfo
+    ) -> DOMTree:
+        removal_mask = self.viewport_removal_mask(dom_tree, info["config"])
+        dom_tree = self.prune_tree(dom_tree, removal_mask)
 
         return dom_tree
 
@@ -366,8 +711,12 @@ class TextObservationProcessor(ObservationProcessor):
             node["nodeId"]: idx for idx, node in enumerate(dom_tree)
         }
 
-        def dfs(node_cursor: int, depth: int) -> str:
-            tree_str = ""
+        # an explicit stack instead of the recursion, deep trees do not hit
+        # the recursion limit and each line is written once
+        lines: list[str] = []
+        stack = [(0, 0)]
+        while stack:
+            node_cursor, depth = stack.pop()
             node = dom_tree[node_cursor]
             indent = "\t" * depth
             valid_node = True
@@ -384,20 +733,20 @@ class TextObservationProcessor(ObservationProcessor):
                         "union_bound": node["union_bound"],
                         "text": node_str,
                     }
-                    tree_str += f"{indent}{node_str}\n"
+                    lines.append(f"{indent}{node_str}\n")
 
             except Exception as e:
                 valid_node = False
 
-            for child_ids in node["childIds"]:
-                child_cursor = nodeid_to_cursor[child_ids]
-                child_depth = depth + 1 if valid_node else depth
-                child_str = dfs(child_cursor, child_depth)
-                tree_str += child_str
-
-            return tree_str
+            child_depth = depth + 1 if valid_node else depth
+            stack.extend(
+                [
+                    (nodeid_to_cursor[child_ids], child_depth)
+                    for child_ids in reversed(node["childIds"])
+                ]
+            )
 
-        html = dfs(0, 0)
+        html = "".join(lines)
         return html, obs_nodes_info
 
     def fetch_page_accessibility_tree(
@@ -405,319 +754,408 @@ class TextObservationProcessor(ObservationProcessor):
         info: BrowserInfo,
         client: CDPSession,
         current_viewport_only: bool,
-    ) -> AccessibilityTree:
-        accessibility_tree: AccessibilityTree = client.send(
-            "Accessibility.getFullAXTree", {}
-        )["nodes"]
-
-        # a few nodes are repeated in the accessibility tree
-        seen_ids = set()
-        _accessibility_tree = []
-        for node in accessibility_tree:
-            if node["nodeId"] not in seen_ids:
-                _accessibility_tree.append(node)
-                seen_ids.add(node["nodeId"])
-        accessibility_tree = _accessibility_tree
-
-        nodeid_to_cursor = {}
-        for cursor, node in enumerate(accessibility_tree):
-            nodeid_to_cursor[node["nodeId"]] = cursor
-            # usually because the node is not visible etc
-            if "backendDOMNodeId" not in node:
-                node["union_bound"] = None
-                continue
-            backend_node_id = str(node["backendDOMNodeId"])
-            if node["role"]["value"] == "RootWebArea":
-                # always inside the viewport
-                node["union_bound"] = TextObservationProcessor.BoundingBoxThunk.constant([0.0, 0.0, 10.0, 10.0])
-            else:
-                # lazy evaluation
-                node["union_bound"] = TextObservationProcessor.BoundingBoxThunk(
-                    client, backend_node_id
-                )
+    ) -> ColumnarAccessibilityTree:
+        accessibility_tree = self.build_accessibility_tree(
+            self.fetch_accessibility_nodes(client), client
+        )
         # filter nodes that are not in the current viewport
         if current_viewport_only:
+            self.resolve_tree_bounding_boxes(client, accessibility_tree, info)
+            accessibility_tree = self.filter_accessibility_tree_in_viewport(
+                accessibility_tree, info
+            )
+        return accessibility_tree
 
-            def remove_node_in_graph(node: AccessibilityTreeNode) -> None:
-                # update the node information in the accessibility tree
-                nodeid = node["nodeId"]
-                node_cursor = nodeid_to_cursor[nodeid]
-                parent_nodeid = node["parentId"]
-                children_nodeids = node["childIds"]
-                parent_cursor = nodeid_to_cursor[parent_nodeid]
-                # update the children of the parent node
-                assert (
-                    accessibility_tree[parent_cursor].get("parentId", "Root")
-                    is not None
-                )
-                # remove the nodeid from parent's childIds
-                index = accessibility_tree[parent_cursor]["childIds"].index(
-                    nodeid
-                )
-                accessibility_tree[parent_cursor]["childIds"].pop(index)
-                # Insert children_nodeids in the same location
-                for child_nodeid in children_nodeids:
-                    accessibility_tree[parent_cursor]["childIds"].insert(
-                        index, child_nodeid
-                    )
-                    index += 1
-                # update children node's parent
-                for child_nodeid in children_nodeids:
-                    child_cursor = nodeid_to_cursor[child_nodeid]
-                    accessibility_tree[child_cursor][
-                        "parentId"
-                    ] = parent_nodeid
-                # mark as removed
-                accessibility_tree[node_cursor]["parentId"] = "[REMOVED]"
-
-            config = info["config"]
-            for node in accessibility_tree:
-                if not node["union_bound"] or not node["union_bound"].force():
-                    remove_node_in_graph(node)
-                    continue
-
-                [x, y, width, height] = node["union_bound"].force()
-
-                # invisible node
-                if width == 0 or height == 0:
-                    remove_node_in_graph(node)
-                    continue
-
-                in_viewport_ratio = self.get_element_in_viewport_ratio(
-                    elem_left_bound=float(x),
-                    elem_top_bound=float(y),
-                    width=float(width),
-                    height=float(height),
-                    config=config,
-                )
+    def fetch_accessibility_nodes(
+        self, client: CDPSession
+    ) -> AccessibilityTree:
+        if not self.incremental_accessibility_tree:
+            self.cdp_calls += 1
+            return client.send("Accessibility.getFullAXTree", {})["nodes"]
+        if client not in self.accessibility_trees:
+            self.accessibility_trees[client] = IncrementalAccessibilityTree(
+                client
+            )
+        tree = self.accessibility_trees[client]
+        full_fetches = tree.full_fetches
+        nodes, calls = tree.fetch()
+        self.cdp_calls += calls
+        self.meta_data["accessibility_tree_fetch"] = (
+            "full" if tree.full_fetches > full_fetches else "incremental"
+        )
+        return nodes  # type: ignore[return-value]
+
+    def build_accessibility_tree(
+        self, accessibility_tree: AccessibilityTree, client: CDPSession
+    ) -> ColumnarAccessibilityTree:
+        # a few nodes are repeated in the accessibility tree, the columnar
+        # tree keeps the first one
+        tree = ColumnarAccessibilityTree.from_nodes(
+            accessibility_tree,
+            # lazy evaluation
+            lambda backend_node_id: self.make_bounding_box_thunk(
+                client, backend_node_id
+            ),
+        )
+        # always inside the viewport
+        tree.set_bounds(
+            tree.nodes_with_role("RootWebArea"),
+            np.array([0.0, 0.0, 10.0, 10.0]),
+        )
+        return tree
 
-                if in_viewport_ratio < IN_VIEWPORT_RATIO_THRESHOLD:
-                    remove_node_in_graph(node)
+    def fill_tree_bounds_from_snapshot(
+        self, tree: ColumnarAccessibilityTree, info: BrowserInfo
+    ) -> None:
+        """Join the DOMSnapshot bounds on the backend node id column"""
+        pending = tree.pending_bounds()
+        if not len(pending) or info["DOMTree"] is None:
+            return
+        bounds, in_document = self.join_snapshot_bounds(
+            tree.backend_ids[pending], info
+        )
+        tree.set_bounds(pending[in_document], bounds[in_document])
 
-            accessibility_tree = [
-                node
-                for node in accessibility_tree
-                if node.get("parentId", "Root") != "[REMOVED]"
-            ]
+    @staticmethod
+    def pending_tree_bounding_boxes(
+        tree: ColumnarAccessibilityTree,
+    ) -> tuple[npt.NDArray[np.int64], list[Any]]:
+        pending = tree.pending_bounds()
+        return pending, [tree.union_bound(idx) for idx in pending.tolist()]
+
+    @staticmethod
+    def set_tree_bounds_from_thunks(
+        tree: ColumnarAccessibilityTree,
+        pending: npt.NDArray[np.int64],
+        thunks: list["TextObservationProcessor.BoundingBoxThunk"],
+    ) -> None:
+        bounds = np.full((len(thunks), 4), np.nan)
+        for row, thunk in enumerate(thunks):
+            if thunk.bounding_box is not None:
+                bounds[row] = thunk.bounding_box
+        tree.set_bounds(pending, bounds)
+
+    def resolve_tree_bounding_boxes(
+        self,
+        client: CDPSession,
+        tree: ColumnarAccessibilityTree,
+        info: BrowserInfo,
+    ) -> None:
+        """Resolve the bounding boxes needed by the viewport filtering into
+        the bounds column of the tree"""
+        if self.bounds_source == "snapshot":
+            self.fill_tree_bounds_from_snapshot(tree, info)
+        # the nodes outside of the main document, e.g., in an iframe
+        pending, thunks = self.pending_tree_bounding_boxes(tree)
+        self.force_thunks(client, thunks)
+        self.set_tree_bounds_from_thunks(tree, pending, thunks)
+
+    def filter_accessibility_tree_in_viewport(
+        self, accessibility_tree: ColumnarAccessibilityTree, info: BrowserInfo
+    ) -> ColumnarAccessibilityTree:
+        removal_mask = self.bounds_removal_mask(
+            accessibility_tree.bounds, info["config"]
+        )
+        accessibility_tree = accessibility_tree.prune(removal_mask)
 
         return accessibility_tree
 
     @staticmethod
-    def accessibility_tree_to_web_things(
-        accessibility_tree: AccessibilityTree, env
+    def web_thing_fields(
+        role: str,
+        name: str,
+        properties: tuple[tuple[str, Any], ...],
+        hover_text: str | None,
     ):
-        """Parse the accessibility tree into a recursive data structure"""
-        from webarena.browser_env.web_things import WebThing # avoid circular import
-        node_id_to_idx = {}
-        for idx, node in enumerate(accessibility_tree):
-            node_id_to_idx[node["nodeId"]] = idx
+        """The role, name, property names and values of the WebThing of a
+        node of the accessibility tree, None if the node has no WebThing"""
+        valid_node = True
 
-        obs_nodes_info = {}
+        name = "".join(
+            character for character in name if ord(character) < 256
+        ).strip()
 
-        def dfs(idx: int, obs_node_id: str, parent):
-            node = accessibility_tree[idx]
-            valid_node = True
+        property_names, property_values = [], []
 
-            try:
-                role = node["role"]["value"]
-                name = node["name"]["value"]
-                name = "".join(character for character in name if ord(character) < 256).strip()
-                node_str = f"[{obs_node_id}] {role} {repr(name)}"
-
-                property_names, property_values = [], []
-
-                for property in node.get("properties", []):
-                    if property["name"] in IGNORED_ACTREE_PROPERTIES:
-                        continue
-                    if "name" not in property or "value" not in property or "value" not in property["value"]:
-                        continue
-                    property_names.append(property["name"])
-                    property_values.append(property["value"]["value"])
-
-                if role=="link" and "sources" in node["name"]: # some links have extra descriptions that you get when you hover over them, add that here
-                    sources = node["name"]["sources"]
-                    for source in sources:
-                        if source.get("type", "") == "attribute" and source.get("value", {}).get("value", ""):
-                            hover_text = source["value"]["value"]
-                            if hover_text not in name:
-                                property_names.append("hover_text")
-                                property_values.append(hover_text)
-                            break
-
-                # check valid
-                if not node_str.strip():
-                    assert False, "this should be impossible"
+        for property_name, property_value in properties:
+            if property_name in IGNORED_ACTREE_PROPERTIES:
+                continue
+            property_names.append(property_name)
+            property_values.append(property_value)
+
+        if (
+            role == "link" and hover_text is not None
+        ):  # some links have extra descriptions that you get when you hover over them, add that here
+            if hover_text not in name:
+                property_names.append("hover_text")
+                property_values.append(hover_text)
+
+        # empty generic node
+        if not name:
+            if len(property_names) == 0:
+                if role in [
+                    "generic",
+                    "img",
+                    # "list",
+                    "strong",
+                    "paragraph",
+                    "banner",
+                    "navigation",
+                    "Section",
+                    "LabelText",
+                    "Legend",
+                    # "listitem",
+                ]:
                     valid_node = False
+            # elif role in ["listitem"]:
+            #     valid_node = False
 
-                # empty generic node
-                if not name:
-                    if len(property_names) == 0:
-                        if role in [
-                            "generic",
-                            "img",
-                            #"list",
-                            "strong",
-                            "paragraph",
-                            "banner",
-                            "navigation",
-                            "Section",
-                            "LabelText",
-                            "Legend",
-                            #"listitem",
-                        ]:
-                            valid_node = False
-                    # elif role in ["listitem"]:
-                    #     valid_node = False
+        if not valid_node:
+            return None
+        return role, name, property_names, property_values
 
+    @staticmethod
+    def accessibility_tree_to_web_things(
+        accessibility_tree: AccessibilityTree | ColumnarAccessibilityTree, env
+    ):
+        """Parse the accessibility tree into a recursive data structure"""
+        return TextObservationProcessor.render_accessibility_tree(
+            accessibility_tree, env
+        )[2]
 
-            except Exception as e:
+    @staticmethod
+    def accessibility_node_text(
+        role: str,
+        name: str,
+        properties: tuple[tuple[str, Any], ...],
+        obs_node_id: str,
+    ) -> tuple[str, bool]:
+        """The text of a node of the accessibility tree and whether it is
+        shown"""
+        valid_node = True
+        node_str = f"[{obs_node_id}] {role} {repr(name)}"
+        property_strs = [
+            f"{property_name}: {property_value}"
+            for property_name, property_value in properties
+            if property_name not in IGNORED_ACTREE_PROPERTIES
+        ]
+
+        if property_strs:
+            node_str += " " + " ".join(property_strs)
+
+        # check valid
+        if not node_str.strip():
+            valid_node = False
+
+        # empty generic node
+        if not name.strip():
+            if not property_strs:
+                if role in [
+                    "generic",
+                    "img",
+                    "list",
+                    "strong",
+                    "paragraph",
+                    "banner",
+                    "navigation",
+                    "Section",
+                    "LabelText",
+                    "Legend",
+                    "listitem",
+                ]:
+                    valid_node = False
+            elif role in ["listitem"]:
                 valid_node = False
 
-            children = []
-            if valid_node:
-                new_node = WebThing(role, name, int(obs_node_id), parent, children, property_names, property_values, env)
-                new_parent = new_node
-            else:
-                new_parent = parent
-
-
-            for _, child_node_id in enumerate(node["childIds"]):
-
-                if child_node_id not in node_id_to_idx:
-                    continue
-
-                child_nodes = dfs(
-                    node_id_to_idx[child_node_id], child_node_id, new_parent
-                )
-                children.extend(child_nodes)
-
-            if valid_node:
-                new_node.children = children
-                return [new_node]
-            else:
-                return children
-
-        nodes = dfs(0, accessibility_tree[0]["nodeId"], None)
-
-        if len(nodes)!=1: assert False, f"{len(nodes)} nodes generated by call to root web_things, should be 1"
-
-        WebThing.root = nodes[0].clean()
-        WebThing.root.assign_nths()
-        WebThing.URL = env.page.url
-
-        return WebThing.root
+        return node_str, valid_node
 
     @staticmethod
     def parse_accessibility_tree(
-        accessibility_tree: AccessibilityTree,
+        accessibility_tree: AccessibilityTree | ColumnarAccessibilityTree,
     ) -> tuple[str, dict[str, Any]]:
         """Parse the accessibility tree into a string text"""
-        node_id_to_idx = {}
-        for idx, node in enumerate(accessibility_tree):
-            node_id_to_idx[node["nodeId"]] = idx
-
-        obs_nodes_info = {}
+        (
+            tree_str,
+            obs_nodes_info,
+            _,
+        ) = TextObservationProcessor.render_accessibility_tree(
+            accessibility_tree, clean=False
+        )
+        return tree_str, obs_nodes_info
 
-        def dfs(idx: int, obs_node_id: str, depth: int) -> str:
-            tree_str = ""
-            node = accessibility_tree[idx]
-            indent = "\t" * depth
-            valid_node = True
-            try:
-                role = node["role"]["value"]
-                name = node["name"]["value"]
-                node_str = f"[{obs_node_id}] {role} {repr(name)}"
-                properties = []
-                for property in node.get("properties", []):
-                    try:
-                        if property["name"] in IGNORED_ACTREE_PROPERTIES:
-                            continue
-                        properties.append(
-                            f'{property["name"]}: {property["value"]["value"]}'
-                        )
-                    except KeyError:
-                        pass
+    @staticmethod
+    def render_accessibility_tree(
+        accessibility_tree: AccessibilityTree | ColumnarAccessibilityTree,
+        env=None,
+        clean: bool = True,
+    ) -> tuple[str, dict[str, Any], Any]:
+        """Render the accessibility tree in a single traversal: the text,
+        cleaned as clean_accesibility_tree does unless `clean` is False,
+        obs_nodes_info and, given the env, the cleaned WebThing tree"""
+        if env is not None:
+            from webarena.browser_env.web_things import (
+                WebThing,  # avoid circular import
+            )
 
-                if properties:
-                    node_str += " " + " ".join(properties)
+        tree = accessibility_tree
+        if not isinstance(tree, ColumnarAccessibilityTree):
+            tree = ColumnarAccessibilityTree.from_nodes(tree)  # type: ignore[arg-type]
 
-                # check valid
-                if not node_str.strip():
+        obs_nodes_info = {}
+        lines: list[str] = []
+        # the web things in pre-order and the ones without a parent
+        web_things: list[Any] = []
+        root_web_things: list[Any] = []
+        role_codes = tree.role_codes.tolist()
+        name_codes = tree.name_codes.tolist()
+        backend_ids = tree.backend_ids.tolist()
+        child_offsets = tree.child_offsets.tolist()
+        child_indices = tree.child_indices.tolist()
+        strings = tree.strings
+
+        # an explicit stack, deep trees do not hit the recursion limit. The
+        # text and the web things skip different nodes, each entry carries
+        # the text depth and the parent web thing.
+        stack: list[tuple[int, int, Any]] = [(0, 0, None)]
+        while stack:
+            idx, depth, parent = stack.pop()
+            obs_node_id = tree.node_ids[idx]
+            # a node without role or name is not shown
+            valid_node = role_codes[idx] >= 0
+            if valid_node:
+                role = strings[role_codes[idx]]
+                name = strings[name_codes[idx]]
+                properties = tree.properties[idx]
+                (
+                    node_str,
+                    valid_node,
+                ) = TextObservationProcessor.accessibility_node_text(
+                    role, name, properties, obs_node_id
+                )
+            if valid_node:
+                line = "\t" * depth + node_str
+                if not clean:
+                    lines.append(line)
+                elif (
+                    role == "StaticText"
+                    and obs_node_id.isdecimal()
+                    and "\n" not in node_str
+                ):
+                    # the quoted name and properties, as the line based
+                    # cleaning reads them
+                    prefix = f"[{obs_node_id}] StaticText "
+                    static_text = node_str[len(prefix) + 1 : -1]
+                    if TextObservationProcessor.is_new_static_text(
+                        static_text, lines
+                    ):
+                        lines.append(line)
+                else:
+                    for text_line in line.split("\n"):
+                        TextObservationProcessor.append_clean_line(
+                            text_line, lines
+                        )
+                # the text is still shown when the node info is missing
+                if backend_ids[idx] < 0:
                     valid_node = False
-
-                # empty generic node
-                if not name.strip():
-                    if not properties:
-                        if role in [
-                            "generic",
-                            "img",
-                            "list",
-                            "strong",
-                            "paragraph",
-                            "banner",
-                            "navigation",
-                            "Section",
-                            "LabelText",
-                            "Legend",
-                            "listitem",
-                        ]:
-                            valid_node = False
-                    elif role in ["listitem"]:
-                        valid_node = False
-
-                if valid_node:
-                    tree_str += f"{indent}{node_str}"
+                else:
                     obs_nodes_info[obs_node_id] = {
-                        "backend_id": node["backendDOMNodeId"],
-                        "union_bound": node["union_bound"],
+                        "backend_id": backend_ids[idx],
+                        "union_bound": tree.union_bound(idx),
                         "text": node_str,
                     }
 
-            except Exception as e:
-                valid_node = False
-
-            for _, child_node_id in enumerate(node["childIds"]):
-                if child_node_id not in node_id_to_idx:
-                    continue
-                # mark this to save some tokens
-                child_depth = depth + 1 if valid_node else depth
-                child_str = dfs(
-                    node_id_to_idx[child_node_id], child_node_id, child_depth
+            if env is not None and role_codes[idx] >= 0:
+                fields = TextObservationProcessor.web_thing_fields(
+                    role, name, properties, tree.hover_texts.get(idx)
                 )
-                if child_str.strip():
-                    if tree_str.strip():
-                        tree_str += "\n"
-                    tree_str += child_str
+                if fields is not None:
+                    (
+                        web_role,
+                        web_name,
+                        property_names,
+                        property_values,
+                    ) = fields
+                    web_thing = WebThing(
+                        web_role,
+                        web_name,
+                        int(obs_node_id),
+                        parent,
+                        [],
+                        property_names,
+                        property_values,
+                        env,
+                    )
+                    if parent is None:
+                        root_web_things.append(web_thing)
+                    else:
+                        parent.children.append(web_thing)
+                    web_things.append(web_thing)
+                    parent = web_thing
+
+            # mark this to save some tokens
+            child_depth = depth + 1 if valid_node else depth
+            stack.extend(
+                [
+                    (child_idx, child_depth, parent)
+                    for child_idx in reversed(
+                        child_indices[
+                            child_offsets[idx] : child_offsets[idx + 1]
+                        ]
+                    )
+                ]
+            )
 
-            return tree_str
+        content = "\n".join(lines)
+        if env is None:
+            return content, obs_nodes_info, None
 
-        tree_str = dfs(0, accessibility_tree[0]["nodeId"], 0)
-        return tree_str, obs_nodes_info
+        if len(root_web_things) != 1:
+            assert (
+                False
+            ), f"{len(root_web_things)} nodes generated by call to root web_things, should be 1"
+        WebThing.clean_nodes(web_things)
+        WebThing.root = root_web_things[0]
+        WebThing.root.assign_nths()
+        WebThing.URL = env.page.url
+        return content, obs_nodes_info, WebThing.root
+
+    @staticmethod
+    def is_new_static_text(static_text: str, clean_lines: list[str]) -> bool:
+        """Whether the static text is not already in the last lines"""
+        return bool(static_text) and all(
+            static_text not in prev_line for prev_line in clean_lines[-3:]
+        )
+
+    @staticmethod
+    def append_clean_line(line: str, clean_lines: list[str]) -> None:
+        # remove statictext if the content already appears in the previous line
+        if "statictext" in line.lower():
+            pattern = r"\[\d+\] StaticText (.+)"
+
+            match = re.search(pattern, line, re.DOTALL)
+            if match:
+                static_text = match.group(1)[1:-1]  # remove the quotes
+                if TextObservationProcessor.is_new_static_text(
+                    static_text, clean_lines
+                ):
+                    clean_lines.append(line)
+        else:
+            clean_lines.append(line)
 
     @staticmethod
     def clean_accesibility_tree(tree_str: str) -> str:
         """further clean accesibility tree"""
         clean_lines: list[str] = []
         for line in tree_str.split("\n"):
-            # remove statictext if the content already appears in the previous line
-            if "statictext" in line.lower():
-                prev_lines = clean_lines[-3:]
-                pattern = r"\[\d+\] StaticText (.+)"
-
-                match = re.search(pattern, line, re.DOTALL)
-                if match:
-                    static_text = match.group(1)[1:-1]  # remove the quotes
-                    if static_text and all(
-                        static_text not in prev_line
-                        for prev_line in prev_lines
-                    ):
-                        clean_lines.append(line)
-            else:
-                clean_lines.append(line)
+            TextObservationProcessor.append_clean_line(line, clean_lines)
 
         return "\n".join(clean_lines)
 
     def process(self, page: Page, client: CDPSession, env=None) -> str:
+        self.cdp_calls = 0
+        # the seconds spent in each stage of the observation
+        timings: dict[str, float] = {}
+        start = time.perf_counter()
         # get the tab info
         open_tabs = page.context.pages
         try:
@@ -736,36 +1174,46 @@ class TextObservationProcessor(ObservationProcessor):
                 ["Tab {idx}" for idx in range(len(open_tabs))]
             )
 
+        timings["tabs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         try:
             browser_info = self.fetch_browser_info(page, client)
         except Exception:
             page.wait_for_load_state("load", timeout=500)
             browser_info = self.fetch_browser_info(page, client)
+        timings["browser_info"] = time.perf_counter() - start
 
         if self.observation_type == "html":
+            start = time.perf_counter()
             dom_tree = self.fetch_page_html(
                 browser_info,
                 page,
                 client,
                 current_viewport_only=self.current_viewport_only,
             )
+            timings["tree"] = time.perf_counter() - start
+            start = time.perf_counter()
             content, obs_nodes_info = self.parse_html(dom_tree)
+            timings["render"] = time.perf_counter() - start
             self.obs_nodes_info = obs_nodes_info
             self.meta_data["obs_nodes_info"] = obs_nodes_info
 
         elif self.observation_type == "accessibility_tree":
+            start = time.perf_counter()
             accessibility_tree = self.fetch_page_accessibility_tree(
                 browser_info,
                 client,
                 current_viewport_only=self.current_viewport_only,
             )
-            content, obs_nodes_info = self.parse_accessibility_tree(
-                accessibility_tree
-            )
-
-            web_things = self.accessibility_tree_to_web_things(accessibility_tree, env)
-
-            content = self.clean_accesibility_tree(content)
+            timings["tree"] = time.perf_counter() - start
+            start = time.perf_counter()
+            (
+                content,
+                obs_nodes_info,
+                web_things,
+            ) = self.render_accessibility_tree(accessibility_tree, env)
+            timings["render"] = time.perf_counter() - start
 
             self.obs_nodes_info = obs_nodes_info
             self.meta_data["obs_nodes_info"] = obs_nodes_info
@@ -777,9 +1225,47 @@ class TextObservationProcessor(ObservationProcessor):
             )
 
         self.browser_config = browser_info["config"]
+        self.meta_data["cdp_calls"] = self.cdp_calls
+        self.meta_data["timings"] = timings
         content = f"{tab_title_str}\n\n{content}"
+        self.update_observation_delta(obs_nodes_info, page.url, content)
         return content
 
+    def update_observation_delta(
+        self, obs_nodes_info: dict[str, Any], url: str, content: str
+    ) -> None:
+        if self.observation_differ is None:
+            return
+        # the accessibility tree node ids are stable within a document, the
+        # html ones are not
+        if self.observation_type == "html":
+            nodes = {
+                str(node_info["backend_id"]): node_info["text"]
+                for node_info in obs_nodes_info.values()
+            }
+        else:
+            nodes = {
+                node_id: node_info["text"]
+                for node_id, node_info in obs_nodes_info.items()
+            }
+        self.meta_data["observation_delta"] = self.observation_differ.diff(
+            nodes, url, content
+        )
+
+    def reuse(self, page: Page, content: str) -> None:
+        """The page did not change, the previous observation `content`
+        stands and its meta data is kept apart from the per-observation
+        statistics"""
+        self.cdp_calls = 0
+        self.meta_data["cdp_calls"] = 0
+        self.meta_data["timings"] = {}
+        self.update_observation_delta(self.obs_nodes_info, page.url, content)
+
+    def reset_observation_delta(self) -> None:
+        """The next observation is a keyframe, e.g., in a new episode"""
+        if self.observation_differ is not None:
+            self.observation_differ.reset()
+
     def get_element_center(self, element_id: str) -> tuple[float, float]:
         node_info = self.obs_nodes_info[element_id]
         node_bound = node_info["union_bound"].force()
@@ -792,13 +1278,124 @@ class TextObservationProcessor(ObservationProcessor):
         )
 
 
+@dataclass
+class ScreenshotConfig:
+    """How ImageObservationProcessor captures the screenshot over CDP"""
+
+    format: str = "jpeg"  # png, jpeg or webp
+    quality: int = 80  # jpeg and webp only
+    # x, y, width and height of the captured region of the viewport
+    clip: dict[str, float] | None = None
+    scale: float = 1.0  # the scale the region is rendered at
+    downsample: int = 1  # the integer factor applied while decoding
+
+    def __post_init__(self) -> None:
+        if self.format not in ["png", "jpeg", "webp"]:
+            raise ValueError(f"Unsupported screenshot format: {self.format}")
+        if self.downsample < 1:
+            raise ValueError("downsample must be a positive integer")
+
+    def output_size(self, viewport_size: ViewportSize) -> tuple[int, int]:
+        """The (height, width) of the decoded screenshot"""
+        clip = self.clip or viewport_size
+        height = int(clip["height"] * self.scale) // self.downsample
+        width = int(clip["width"] * self.scale) // self.downsample
+        return height, width
+
+
 class ImageObservationProcessor(ObservationProcessor):
-    def __init__(self, observation_type: str):
+    def __init__(
+        self,
+        observation_type: str,
+        viewport_size: ViewportSize | None = None,
+        screenshot_config: ScreenshotConfig | None = None,
+        screencast: Screencast | None = None,
+    ):
         self.observation_type = observation_type
         self.observation_tag = "image"
         self.meta_data = create_empty_metadata()
+        self.viewport_size = viewport_size
+        # None keeps the lossless page.screenshot() capture
+        self.screenshot_config = screenshot_config
+        # return the latest streamed frame instead of capturing the viewport
+        self.screencast = screencast
 
-    def process(self, page: Page, client: CDPSession, env=None) -> npt.NDArray[np.uint8]:
+    def capture(
+        self,
+        page: Page,
+        client: CDPSession,
+        config: ScreenshotConfig | None = None,
+    ) -> npt.NDArray[np.uint8]:
+        """Capture the viewport with Page.captureScreenshot, by default
+        with the screenshot config of the processor"""
+        config = config or self.screenshot_config
+        assert config is not None
+        params: dict[str, Any] = {"format": config.format, "fromSurface": True}
+        if config.format != "png":
+            params["quality"] = config.quality
+        if config.clip is not None or config.scale != 1.0:
+            clip = config.clip or {
+                "x": 0,
+                "y": 0,
+                "width": page.viewport_size["width"],  # type: ignore[index]
+                "height": page.viewport_size["height"],  # type: ignore[index]
+            }
+            # the clip is in document coordinates
+            scroll_x, scroll_y = page.evaluate(
+                "[window.scrollX, window.scrollY]"
+            )
+            params["clip"] = {
+                "x": clip["x"] + scroll_x,
+                "y": clip["y"] + scroll_y,
+                "width": clip["width"],
+                "height": clip["height"],
+                "scale": config.scale,
+            }
+        data = base64.b64decode(
+            client.send("Page.captureScreenshot", params)["data"]
+        )
+        return image_bytes_to_numpy(data, config.downsample)
+
+    def screencast_fallback_config(self) -> ScreenshotConfig:
+        """The capture that looks like a screencast frame, used when no
+        frame arrived since the last action"""
+        assert self.screencast is not None and self.viewport_size is not None
+        config = self.screenshot_config or ScreenshotConfig()
+        return replace(
+            config,
+            format=self.screencast.config.format,
+            quality=self.screencast.config.quality,
+            clip=None,
+            scale=self.screencast.config.frame_scale(self.viewport_size),
+        )
+
+    def process(
+        self, page: Page, client: CDPSession, env=None
+    ) -> npt.NDArray[np.uint8]:
+        if self.screencast is not None:
+            frame = self.screencast.latest_frame(client)
+            if frame is not None:
+                downsample = (
+                    self.screenshot_config.downsample
+                    if self.screenshot_config is not None
+                    else 1
+                )
+                return frame.to_numpy(downsample)
+            # the page was not repainted since the action, or it was just
+            # opened
+            config = self.screencast_fallback_config()
+            try:
+                return self.capture(page, client, config)
+            except Exception:
+                page.wait_for_event("load")
+                return self.capture(page, client, config)
+        if self.screenshot_config is not None:
+            try:
+                screenshot = self.capture(page, client)
+            except:
+                page.wait_for_event("load")
+                screenshot = self.capture(page, client)
+            return screenshot
         try:
             screenshot = png_bytes_to_numpy(page.screenshot())
         except:
@@ -807,6 +1404,100 @@ class ImageObservationProcessor(ObservationProcessor):
         return screenshot
 
 
+class PendingObservation:
+    """The value a LazyObservation holds for a modality that is not
+    computed yet. Only the code that bypasses `LazyObservation.__getitem__`
+    sees it, and it fails loudly instead of passing for an image."""
+
+    def __array__(self, *args: Any, **kwargs: Any) -> Any:
+        raise RuntimeError(
+            "The observation is not computed, read it through the "
+            "LazyObservation"
+        )
+
+    def __repr__(self) -> str:
+        return "<lazy>"
+
+
+PENDING_OBSERVATION = PendingObservation()
+
+
+class LazyObservation(dict):
+    """An observation dict whose modalities in `thunks` are only computed
+    when they are read, e.g., the screenshot of a text-only run.
+    The thunks capture the live page, so they expire with the step.
+    `dict(obs)`, `{**obs}`, `copy.copy(obs)` and the iteration over the
+    items compute the modalities, a pickled observation only leaves out the
+    modalities that expired unread."""
+
+    def __init__(
+        self,
+        observations: dict[str, Observation],
+        thunks: dict[str, Callable[[], Observation]],
+    ) -> None:
+        super().__init__(observations)
+        for key in thunks:
+            dict.__setitem__(self, key, PENDING_OBSERVATION)
+        self.thunks = dict(thunks)
+        self.expired = False
+
+    def __getitem__(self, key: str) -> Observation:
+        if key in self.thunks:
+            if self.expired:
+                raise RuntimeError(
+                    f"The {key} observation was not read before the next step"
+                )
+            dict.__setitem__(self, key, self.thunks.pop(key)())
+        return dict.__getitem__(self, key)
+
+    def __iter__(self):  # type: ignore[no-untyped-def]
+        # overriding it makes dict(obs), {**obs} and dict.update go through
+        # keys() and __getitem__ instead of copying the placeholders
+        return dict.__iter__(self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def values(self):  # type: ignore[override]
+        return [self[key] for key in self]
+
+    def items(self):  # type: ignore[override]
+        return [(key, self[key]) for key in self]
+
+    def copy(self) -> dict[str, Observation]:  # type: ignore[override]
+        """A plain dict with all the modalities computed"""
+        return dict(self.items())
+
+    __copy__ = copy
+
+    def expire(self) -> None:
+        self.expired = True
+
+    def __reduce__(self) -> Any:
+        # the thunks are not picklable, the modalities are computed unless
+        # they expired unread
+        return (
+            dict,
+            (
+                {
+                    key: self[key]
+                    for key in self
+                    if not (self.expired and key in self.thunks)
+                },
+            ),
+        )
+
+    def __repr__(self) -> str:
+        return repr(
+            {
+                key: "<lazy>"
+                if key in self.thunks
+                else dict.__getitem__(self, key)
+                for key in self
+            }
+        )
+
+
 class ObservationHandler:
     """Main entry point to access all observation processor"""
 
@@ -817,15 +1508,31 @@ class ObservationHandler:
         image_observation_type: str,
         current_viewport_only: bool,
         viewport_size: ViewportSize,
+        screenshot_config: ScreenshotConfig | None = None,
+        screencast: Screencast | None = None,
+        bounds_source: str = "snapshot",
+        incremental_accessibility_tree: bool = False,
+        observation_delta: bool = False,
+        keyframe_interval: int = 10,
     ) -> None:
         self.main_observation_type = main_observation_type
         self.text_processor = TextObservationProcessor(
-            text_observation_type, current_viewport_only, viewport_size
+            text_observation_type,
+            current_viewport_only,
+            viewport_size,
+            bounds_source,
+            incremental_accessibility_tree,
+            observation_delta,
+            keyframe_interval,
         )
         self.image_processor = ImageObservationProcessor(
-            image_observation_type
+            image_observation_type,
+            viewport_size,
+            screenshot_config,
+            screencast,
         )
         self.viewport_size = viewport_size
+        self.screenshot_config = screenshot_config
 
     def get_observation_space(self) -> spaces.Dict:
         text_space = spaces.Text(
@@ -834,28 +1541,73 @@ class ObservationHandler:
             charset=ASCII_CHARSET + FREQ_UNICODE_CHARSET,
         )
 
+        screencast = self.image_processor.screencast
+        if screencast is not None:
+            height, width = screencast.config.output_size(self.viewport_size)
+            if self.screenshot_config is not None:
+                height //= self.screenshot_config.downsample
+                width //= self.screenshot_config.downsample
+        elif self.screenshot_config is not None:
+            height, width = self.screenshot_config.output_size(
+                self.viewport_size
+            )
+        else:
+            height, width = (
+                self.viewport_size["height"],
+                self.viewport_size["width"],
+            )
         image_space = spaces.Box(
             # Each position stores the RGB values. Note the swapped axes (height first).
-            np.zeros(
-                (self.viewport_size["height"], self.viewport_size["width"], 3),
-                dtype=np.uint8,
-            ),
-            np.ones(
-                (self.viewport_size["height"], self.viewport_size["width"], 3),
-                dtype=np.uint8,
-            )
-            * 255.0,
+            np.zeros((height, width, 3), dtype=np.uint8),
+            np.ones((height, width, 3), dtype=np.uint8) * 255.0,
             dtype=np.uint8,
         )
 
         return spaces.Dict({"text": text_space, "image": image_space})
 
     def get_observation(
-        self, page: Page, client: CDPSession, env=None
+        self,
+        page: Page,
+        client: CDPSession,
+        env=None,
+        modalities: tuple[str, ...] = ("text", "image"),
     ) -> dict[str, Observation]:
-        text_obs = self.text_processor.process(page, client, env=env)
-        image_obs = self.image_processor.process(page, client)
-        return {"text": text_obs, "image": image_obs}
+        """Only the requested modalities are in the observation.
+        The text is processed right away because the element id based
+        actions need its metadata, the screenshot is taken when it is read."""
+        observations = {}
+        thunks = {}
+        if "text" in modalities:
+            observations["text"] = self.text_processor.process(
+                page, client, env=env
+            )
+        if "image" in modalities:
+            thunks["image"] = lambda: self.image_processor.process(
+                page, client
+            )
+        return LazyObservation(observations, thunks)
+
+    def reuse_observation(
+        self,
+        previous: LazyObservation,
+        page: Page,
+        client: CDPSession,
+    ) -> LazyObservation:
+        """The observation of an unchanged page, with the modalities of
+        `previous`. The text and an already taken screenshot are reused, a
+        screenshot that was not read is still taken lazily."""
+        observations = {}
+        thunks = {}
+        for key in previous:
+            if key == "image" and key in previous.thunks:
+                thunks["image"] = lambda: self.image_processor.process(
+                    page, client
+                )
+            else:
+                observations[key] = dict.__getitem__(previous, key)
+        if "text" in observations:
+            self.text_processor.reuse(page, observations["text"])
+        return LazyObservation(observations, thunks)
 
     def get_observation_metadata(self) -> dict[str, ObservationMetadata]:
         return {
@@ -872,3 +1624,282 @@ class ObservationHandler:
             return self.image_processor
         else:
             raise ValueError("Invalid main observation type")
+
+
+class AsyncTextObservationProcessor(TextObservationProcessor):
+    """The async counterpart of TextObservationProcessor.
+    The trees are built and parsed by the same code, only the CDP calls are
+    awaited. The bounding boxes are still lazy, when the viewport filtering
+    needs all of them, they are resolved in a batch."""
+
+    class AsyncBoundingBoxThunk(TextObservationProcessor.BoundingBoxThunk):
+        async def aforce(self):
+            if not self.already_forced:
+                processor = AsyncTextObservationProcessor
+                response = await processor.aget_bounding_client_rect(
+                    self.client, self.backend_node_id
+                )
+                self.bounding_box = self.response_to_bounding_box(response)
+                self.already_forced = True
+
+            return self.bounding_box
+
+        def force(self):
+            if not self.already_forced:
+                raise RuntimeError(
+                    "The bounding box is not resolved yet, call `aforce` first"
+                )
+            return self.bounding_box
+
+    def make_bounding_box_thunk(
+        self, client: ACDPSession, backend_node_id: str
+    ) -> "AsyncTextObservationProcessor.AsyncBoundingBoxThunk":
+        return AsyncTextObservationProcessor.AsyncBoundingBoxThunk(
+            client, backend_node_id
+        )
+
+    @staticmethod
+    async def aget_bounding_client_rect(
+        client: ACDPSession, backend_node_id: str
+    ) -> dict[str, Any]:
+        try:
+            remote_object = await client.send(
+                "DOM.resolveNode", {"backendNodeId": int(backend_node_id)}
+            )
+            remote_object_id = remote_object["object"]["objectId"]
+            response = await client.send(
+                "Runtime.callFunctionOn",
+                {
+                    "objectId": remote_object_id,
+                    "functionDeclaration": BOUNDING_CLIENT_RECT_JS,
+                    "returnByValue": True,
+                },
+            )
+            return response
+        except Exception as e:
+            return {"result": {"subtype": "error"}}
+
+    async def aforce_bounding_boxes(
+        self, client: ACDPSession, nodes: DOMTree | AccessibilityTree
+    ) -> None:
+        """Resolve the bounding boxes of all nodes in a batch, see
+        `force_bounding_boxes`, the unresolved ones concurrently"""
+        await self.aforce_thunks(client, self.pending_bounding_boxes(nodes))
+
+    async def aforce_thunks(
+        self,
+        client: ACDPSession,
+        thunks: list["AsyncTextObservationProcessor.AsyncBoundingBoxThunk"],
+    ) -> None:
+        if not thunks:
+            return
+        try:
+            await client.send("DOM.enable", {"includeWhitespace": "all"})
+            root = await client.send(
+                "DOM.getDocument", {"depth": -1, "pierce": True}
+            )
+            await client.send("DOM.disable")
+            paths = self.backend_node_paths(
+                root["root"],
+                {int(thunk.backend_node_id) for thunk in thunks},
+            )
+            response = await client.send(
+                "Runtime.evaluate",
+                {
+                    "expression": self.batch_bounding_client_rects_expression(
+                        paths, thunks
+                    ),
+                    "returnByValue": True,
+                },
+            )
+            self.cdp_calls += 4
+            unresolved = self.fill_bounding_boxes(
+                paths, thunks, response["result"]["value"]
+            )
+        except Exception:
+            unresolved = thunks
+        await asyncio.gather(*[thunk.aforce() for thunk in unresolved])
+        self.cdp_calls += 2 * len(unresolved)
+
+    async def afetch_browser_info(
+        self,
+        page: APage,
+        client: ACDPSession,
+    ) -> BrowserInfo:
+        # extract domtree
+        tree = None
+        if self.needs_dom_snapshot():
+            tree = await client.send(
+                "DOMSnapshot.captureSnapshot",
+                {"computedStyles": [], "includeDOMRects": True},
+            )
+            self.cdp_calls += 1
+
+        # extract browser info
+        return self.build_browser_info(
+            tree, *await page.evaluate(WINDOW_METRICS_JS)
+        )
+
+    async def afetch_page_html(
+        self,
+        info: BrowserInfo,
+        client: ACDPSession,
+        current_viewport_only: bool,
+    ) -> DOMTree:
+        dom_tree = self.build_dom_tree(info, client)
+        # remove the nodes that are not in the current viewport
+        if current_viewport_only:
+            if self.bounds_source == "snapshot":
+                self.fill_bounding_boxes_from_snapshot(dom_tree, info)
+            await self.aforce_bounding_boxes(client, dom_tree)
+            dom_tree = self.filter_dom_tree_in_viewport(dom_tree, info)
+        return dom_tree
+
+    async def afetch_page_accessibility_tree(
+        self,
+        info: BrowserInfo,
+        client: ACDPSession,
+        current_viewport_only: bool,
+    ) -> ColumnarAccessibilityTree:
+        response = await client.send("Accessibility.getFullAXTree", {})
+        self.cdp_calls += 1
+        accessibility_tree = self.build_accessibility_tree(
+            response["nodes"], client
+        )
+        # filter nodes that are not in the current viewport
+        if current_viewport_only:
+            if self.bounds_source == "snapshot":
+                self.fill_tree_bounds_from_snapshot(accessibility_tree, info)
+            pending, thunks = self.pending_tree_bounding_boxes(
+                accessibility_tree
+            )
+            await self.aforce_thunks(client, thunks)
+            self.set_tree_bounds_from_thunks(
+                accessibility_tree, pending, thunks
+            )
+            accessibility_tree = self.filter_accessibility_tree_in_viewport(
+                accessibility_tree, info
+            )
+        return accessibility_tree
+
+    async def aprocess(self, page: APage, client: ACDPSession) -> str:
+        self.cdp_calls = 0
+        timings: dict[str, float] = {}
+        start = time.perf_counter()
+        # get the tab info
+        open_tabs = page.context.pages
+        try:
+            tab_titles = [await tab.title() for tab in open_tabs]
+            current_tab_idx = open_tabs.index(page)
+            for idx in range(len(open_tabs)):
+                if idx == current_tab_idx:
+                    tab_titles[idx] = f"Tab {idx} (current): {tab_titles[idx]}"
+                else:
+                    tab_titles[idx] = f"Tab {idx}: {tab_titles[idx]}"
+            tab_title_str = " | ".join(tab_titles)
+        except Exception:
+            tab_title_str = " | ".join(
+                ["Tab {idx}" for idx in range(len(open_tabs))]
+            )
+
+        timings["tabs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            browser_info = await self.afetch_browser_info(page, client)
+        except Exception:
+            await page.wait_for_load_state("load", timeout=500)
+            browser_info = await self.afetch_browser_info(page, client)
+        timings["browser_info"] = time.perf_counter() - start
+
+        if self.observation_type == "html":
+            start = time.perf_counter()
+            dom_tree = await self.afetch_page_html(
+                browser_info,
+                client,
+                current_viewport_only=self.current_viewport_only,
+            )
+            timings["tree"] = time.perf_counter() - start
+            start = time.perf_counter()
+            content, obs_nodes_info = self.parse_html(dom_tree)
+            timings["render"] = time.perf_counter() - start
+
+        elif self.observation_type == "accessibility_tree":
+            start = time.perf_counter()
+            accessibility_tree = await self.afetch_page_accessibility_tree(
+                browser_info,
+                client,
+                current_viewport_only=self.current_viewport_only,
+            )
+            timings["tree"] = time.perf_counter() - start
+            start = time.perf_counter()
+            content, obs_nodes_info, _ = self.render_accessibility_tree(
+                accessibility_tree
+            )
+            timings["render"] = time.perf_counter() - start
+
+        else:
+            raise ValueError(
+                f"Invalid observatrion type: {self.observation_type}"
+            )
+
+        self.obs_nodes_info = obs_nodes_info
+        self.meta_data["obs_nodes_info"] = obs_nodes_info
+        self.meta_data["cdp_calls"] = self.cdp_calls
+        self.meta_data["timings"] = timings
+        self.browser_config = browser_info["config"]
+        content = f"{tab_title_str}\n\n{content}"
+        self.update_observation_delta(obs_nodes_info, page.url, content)
+        return content
+
+    async def aget_element_center(
+        self, element_id: str
+    ) -> tuple[float, float]:
+        node_info = self.obs_nodes_info[element_id]
+        await node_info["union_bound"].aforce()
+        return self.get_element_center(element_id)
+
+
+class AsyncImageObservationProcessor(ImageObservationProcessor):
+    async def aprocess(
+        self, page: APage, client: ACDPSession
+    ) -> npt.NDArray[np.uint8]:
+        try:
+            screenshot = png_bytes_to_numpy(await page.screenshot())
+        except:
+            await page.wait_for_event("load")
+            screenshot = png_bytes_to_numpy(await page.screenshot())
+        return screenshot
+
+
+class AsyncObservationHandler(ObservationHandler):
+    """The async counterpart of ObservationHandler"""
+
+    def __init__(
+        self,
+        main_observation_type: str,
+        text_observation_type: str,
+        image_observation_type: str,
+        current_viewport_only: bool,
+        viewport_size: ViewportSize,
+    ) -> None:
+        super().__init__(
+            main_observation_type,
+            text_observation_type,
+            image_observation_type,
+            current_viewport_only,
+            viewport_size,
+        )
+        self.text_processor = AsyncTextObservationProcessor(
+            text_observation_type, current_viewport_only, viewport_size
+        )
+        self.image_processor = AsyncImageObservationProcessor(
+            image_observation_type, viewport_size
+        )
+
+    async def aget_observation(
+        self, page: APage, client: ACDPSession
+    ) -> dict[str, Observation]:
+        text_obs = await self.text_processor.aprocess(page, client)
+        image_obs = await self.image_processor.aprocess(page, client)
+        return {"text": text_obs, "image": image_obs}
@@ -0,0 +1,52 @@
+"""Abort the requests a text-only agent never looks at"""
+import re
+
+from playwright.sync_api import Request, Route
+
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+BLOCKED_URL_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googlesyndication\.com",
+    r"facebook\.(com|net)/tr",
+    r"connect\.facebook\.net",
+    r"hotjar\.com",
+    r"newrelic\.com",
+    r"nr-data\.net",
+    r"sentry\.io",
+)
+
+
+class ResourceBlocker:
+    """A route handler that aborts the requests whose resource type is in
+    `resource_types` or whose url matches one of `url_patterns`, and leaves
+    all other requests to the handlers registered before it.
+    The document itself is never blocked."""
+
+    def __init__(
+        self,
+        resource_types: tuple[str, ...] = BLOCKED_RESOURCE_TYPES,
+        url_patterns: tuple[str, ...] = BLOCKED_URL_PATTERNS,
+    ) -> None:
+        self.resource_types = frozenset(resource_types)
+        self.url_pattern = (
+            re.compile("|".join(f"(?:{p})" for p in url_patterns))
+            if url_patterns
+            else None
+        )
+        self.blocked = 0
+
+    def should_block(self, request: Request) -> bool:
+        if request.resource_type == "document":
+            return False
+        if request.resource_type in self.resource_types:
+            return True
+        return bool(self.url_pattern and self.url_pattern.search(request.url))
+
+    def handle(self, route: Route, request: Request) -> None:
+        if self.should_block(request):
+            self.blocked += 1
+            route.abort("blockedbyclient")
+        else:
+            route.fallback()
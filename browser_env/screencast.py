@@ -0,0 +1,134 @@
+"""Stream the frames of a page over CDP instead of taking a screenshot per
+step"""
+import base64
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from playwright.sync_api import CDPSession, ViewportSize
+
+from .utils import image_bytes_to_numpy
+
+
+@dataclass
+class ScreencastConfig:
+    format: str = "jpeg"  # jpeg or png
+    quality: int = 60
+    # only every nth compositor frame is sent, bounds the CPU spent on
+    # encoding and decoding
+    every_nth_frame: int = 1
+    max_width: int | None = None
+    max_height: int | None = None
+    # the number of recent frames kept per page
+    buffer_size: int = 8
+
+    def frame_scale(self, viewport_size: ViewportSize) -> float:
+        """The factor chrome shrinks the frames by to fit in max_width and
+        max_height, it never enlarges them"""
+        scale = 1.0
+        if self.max_width is not None:
+            scale = min(scale, self.max_width / viewport_size["width"])
+        if self.max_height is not None:
+            scale = min(scale, self.max_height / viewport_size["height"])
+        return scale
+
+    def output_size(self, viewport_size: ViewportSize) -> tuple[int, int]:
+        """The (height, width) of the frames"""
+        scale = self.frame_scale(viewport_size)
+        return (
+            int(viewport_size["height"] * scale),
+            int(viewport_size["width"] * scale),
+        )
+
+
+@dataclass
+class ScreencastFrame:
+    data: str  # base64 encoded image
+    # when chrome painted the frame, seconds since the epoch
+    timestamp: float
+
+    def to_numpy(self, downsample: int = 1) -> npt.NDArray[np.uint8]:
+        return image_bytes_to_numpy(base64.b64decode(self.data), downsample)
+
+
+class ScreencastRecorder:
+    """Keep the latest frames of the screencast of one page in a ring buffer"""
+
+    def __init__(self, client: CDPSession, config: ScreencastConfig) -> None:
+        self.client = client
+        self.frames: deque[ScreencastFrame] = deque(maxlen=config.buffer_size)
+        params: dict[str, Any] = {
+            "format": config.format,
+            "quality": config.quality,
+            "everyNthFrame": config.every_nth_frame,
+        }
+        if config.max_width is not None:
+            params["maxWidth"] = config.max_width
+        if config.max_height is not None:
+            params["maxHeight"] = config.max_height
+        client.on("Page.screencastFrame", self._on_frame)
+        client.send("Page.startScreencast", params)
+
+    def _on_frame(self, event: dict[str, Any]) -> None:
+        # the frame may have been painted long before it is dispatched, e.g.,
+        # while the env waited for the action
+        timestamp = event.get("metadata", {}).get("timestamp", time.time())
+        self.frames.append(ScreencastFrame(event["data"], timestamp))
+        try:
+            # chrome sends the next frame only after the ack
+            self.client.send(
+                "Page.screencastFrameAck", {"sessionId": event["sessionId"]}
+            )
+        except Exception:
+            # the page is closed
+            pass
+
+
+class Screencast:
+    """The screencasts of all pages of an env, started lazily per page"""
+
+    def __init__(self, config: ScreencastConfig) -> None:
+        self.config = config
+        self.recorders: weakref.WeakKeyDictionary[
+            CDPSession, ScreencastRecorder
+        ] = weakref.WeakKeyDictionary()
+        # the frames painted before this time show the page before the last
+        # action
+        self.stale_before = 0.0
+
+    def invalidate_frames(self) -> None:
+        """Called after an action, only the frames painted from now on are
+        returned by `latest_frame`"""
+        self.stale_before = time.time()
+
+    def track(self, client: CDPSession) -> ScreencastRecorder | None:
+        if client not in self.recorders:
+            try:
+                self.recorders[client] = ScreencastRecorder(
+                    client, self.config
+                )
+            except Exception:
+                # the session is detached, e.g., the page is closed
+                return None
+        return self.recorders[client]
+
+    def latest_frame(self, client: CDPSession) -> ScreencastFrame | None:
+        """The most recent frame of the page, None until a frame painted
+        after the last action arrived. Chrome only sends a frame when the
+        page is repainted, the caller captures the page itself instead."""
+        recorder = self.track(client)
+        if recorder is None or not recorder.frames:
+            return None
+        frame = recorder.frames[-1]
+        if frame.timestamp <= self.stale_before:
+            return None
+        return frame
+
+    def recent_frames(self, client: CDPSession) -> list[ScreencastFrame]:
+        """The last `buffer_size` frames of the page, oldest first"""
+        recorder = self.track(client)
+        return list(recorder.frames) if recorder is not None else []
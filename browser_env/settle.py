@@ -0,0 +1,185 @@
+"""Event-driven detection of when a page has settled after an action"""
+import time
+import weakref
+from typing import Any
+
+from playwright.sync_api import CDPSession, Page
+
+# resolves once no DOM mutation happened for `quietMs`, or after `timeoutMs`
+DOM_QUIESCENCE_JS = """
+([quietMs, timeoutMs]) => new Promise((resolve) => {
+    const start = performance.now();
+    let quietTimer = null;
+    let observer = null;
+    const done = () => {
+        if (observer) observer.disconnect();
+        clearTimeout(quietTimer);
+        resolve(performance.now() - start);
+    };
+    const root = document.documentElement || document;
+    observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(done, quietMs);
+    });
+    observer.observe(root, {
+        subtree: true,
+        childList: true,
+        attributes: true,
+        characterData: true,
+    });
+    quietTimer = setTimeout(done, quietMs);
+    setTimeout(done, timeoutMs);
+})
+"""
+
+
+class NetworkTracker:
+    """Count the pending requests of a page over CDP Network events"""
+
+    def __init__(self, client: CDPSession) -> None:
+        # the start time of every pending request
+        self.pending: dict[str, float] = {}
+        self.last_activity = time.perf_counter()
+        self.listeners = [
+            ("Network.requestWillBeSent", self._on_request_start),
+            ("Network.loadingFinished", self._on_request_end),
+            ("Network.loadingFailed", self._on_request_end),
+        ]
+        client.send("Network.enable")
+        for event, listener in self.listeners:
+            client.on(event, listener)
+
+    def detach(self, client: CDPSession) -> None:
+        """Stop listening, the Network domain stays enabled for the other
+        users of the session"""
+        for event, listener in self.listeners:
+            client.remove_listener(event, listener)
+
+    def expire(self, started_before: float) -> None:
+        """Forget the requests that started before `started_before`, their
+        end may never be reported, e.g., the page navigated away"""
+        self.pending = {
+            request_id: started
+            for request_id, started in self.pending.items()
+            if started >= started_before
+        }
+
+    def _on_request_start(self, event: dict[str, Any]) -> None:
+        self.last_activity = time.perf_counter()
+        self.pending[event["requestId"]] = self.last_activity
+
+    def _on_request_end(self, event: dict[str, Any]) -> None:
+        self.pending.pop(event["requestId"], None)
+        self.last_activity = time.perf_counter()
+
+
+class PageSettler:
+    """Wait until the page is settled instead of sleeping for a fixed time.
+    A page is settled when
+        1. at most `max_pending_requests` requests are pending and no request
+           started or finished for `network_idle_time` seconds, the requests
+           that were already pending a whole settle window before are
+           ignored
+        2. the DOM was not mutated for `dom_quiet_time` seconds
+    The caller provides the upper bound of the total waiting time.
+    """
+
+    def __init__(
+        self,
+        network_idle_time: float = 0.5,
+        dom_quiet_time: float = 0.2,
+        max_pending_requests: int = 0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.network_idle_time = network_idle_time
+        self.dom_quiet_time = dom_quiet_time
+        self.max_pending_requests = max_pending_requests
+        self.poll_interval = poll_interval
+        self.trackers: weakref.WeakKeyDictionary[
+            CDPSession, NetworkTracker
+        ] = weakref.WeakKeyDictionary()
+
+    def track(self, client: CDPSession) -> NetworkTracker | None:
+        """Start counting the requests of the page behind the client.
+        It is called lazily by `settle`, call it before triggering the
+        navigation to also count the very first requests."""
+        if client not in self.trackers:
+            try:
+                self.trackers[client] = NetworkTracker(client)
+            except Exception:
+                # the session is detached, e.g., the page is closed
+                return None
+        return self.trackers[client]
+
+    def untrack(self, client: CDPSession) -> None:
+        """Stop counting the requests of the page behind the client"""
+        tracker = self.trackers.pop(client, None)
+        if tracker is not None:
+            tracker.detach(client)
+
+    def _wait_network_idle(
+        self, page: Page, client: CDPSession | None, deadline: float
+    ) -> None:
+        tracker = self.track(client) if client is not None else None
+        if tracker is None:
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                try:
+                    page.wait_for_load_state(
+                        "networkidle", timeout=remaining * 1000
+                    )
+                except Exception:
+                    pass
+            return
+
+        start = time.perf_counter()
+        # the requests pending for longer than the settle window are not
+        # waited for again
+        tracker.expire(start - (deadline - start))
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            # requests triggered by the action may not have started yet,
+            # so the idle window starts at the earliest when we start waiting
+            idle_since = max(tracker.last_activity, start)
+            if (
+                len(tracker.pending) <= self.max_pending_requests
+                and now - idle_since >= self.network_idle_time
+            ):
+                return
+            # waiting inside playwright dispatches the CDP events
+            page.wait_for_timeout(
+                min(self.poll_interval, deadline - now) * 1000
+            )
+
+    def _wait_dom_quiescence(self, page: Page, deadline: float) -> None:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return
+        try:
+            page.evaluate(
+                DOM_QUIESCENCE_JS,
+                [self.dom_quiet_time * 1000, remaining * 1000],
+            )
+        except Exception:
+            # the execution context is destroyed by a navigation
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                try:
+                    page.wait_for_load_state("load", timeout=remaining * 1000)
+                except Exception:
+                    pass
+
+    def settle(
+        self, page: Page, client: CDPSession | None, timeout: float
+    ) -> float:
+        """Wait for the page to settle for at most `timeout` seconds.
+        Return the time spent waiting."""
+        start = time.perf_counter()
+        if timeout <= 0:
+            return 0.0
+        deadline = start + timeout
+        self._wait_network_idle(page, client, deadline)
+        self._wait_dom_quiescence(page, deadline)
+        return time.perf_counter() - start
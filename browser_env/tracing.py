@@ -0,0 +1,34 @@
+"""Decide which tasks are traced"""
+import shutil
+import tempfile
+from pathlib import Path
+
+# "always": keep the trace of every task
+# "failures": trace every task but only keep the traces of failed tasks
+# "every_n": trace every nth task
+# "off": no tracing
+TRACE_POLICIES = ("always", "failures", "every_n", "off")
+
+
+class TraceStaging:
+    """A local directory for the traces of the contexts replaced by
+    `restore`, they are moved next to the final trace by `save_trace`.
+    The archives are built by the playwright driver while the tracing is
+    stopped, which blocks the thread that owns the context."""
+
+    def __init__(self) -> None:
+        self.staging_dir = Path(tempfile.mkdtemp(prefix="traces-"))
+        self.staged = 0
+
+    def staging_path(self, trace_path: str | Path) -> Path:
+        self.staged += 1
+        return self.staging_dir / f"{self.staged}-{Path(trace_path).name}"
+
+    @staticmethod
+    def move(staging_path: Path, trace_path: str | Path) -> None:
+        trace_path = Path(trace_path)
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(staging_path, trace_path)
+
+    def close(self) -> None:
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
@@ -13,6 +13,39 @@ class DetachedPage:
     content: str  # html
 
 
+class LazyDetachedPage(DetachedPage):
+    """A DetachedPage that serializes the html only when `content` is read.
+    The html can be read until the env executes the next action, then the
+    handle expires because the live page no longer matches the step."""
+
+    def __init__(self, page: Any) -> None:
+        self.url = page.url
+        self._page = page
+        self._content: str | None = None
+
+    @property  # type: ignore[override]
+    def content(self) -> str:
+        if self._content is None:
+            if self._page is None:
+                raise RuntimeError(
+                    "The page changed after this step, create the env with "
+                    "eager_page_content=True to keep the html"
+                )
+            self._content = self._page.content()
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+
+    def expire(self) -> None:
+        self._page = None
+
+    def __repr__(self) -> str:
+        loaded = self._content is not None
+        return f"LazyDetachedPage(url={self.url!r}, loaded={loaded})"
+
+
 def png_bytes_to_numpy(png: bytes) -> npt.NDArray[np.uint8]:
     """Convert png bytes to numpy array
 
@@ -24,6 +57,24 @@ def png_bytes_to_numpy(png: bytes) -> npt.NDArray[np.uint8]:
     return np.array(Image.open(BytesIO(png)))
 
 
+def image_bytes_to_numpy(
+    data: bytes, downsample: int = 1
+) -> npt.NDArray[np.uint8]:
+    """Decode png, jpeg or webp bytes into a new, writable RGB array.
+    JPEG is downsampled while decoding (DCT scaling), the other formats
+    afterwards."""
+    image = Image.open(BytesIO(data))
+    if downsample > 1:
+        size = (image.width // downsample, image.height // downsample)
+        # only JPEG supports it, it picks the smallest scale >= size
+        image.draft("RGB", size)
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.BOX)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.array(image)
+
+
 class AccessibilityTreeNode(TypedDict):
     nodeId: str
     ignored: bool
@@ -36,7 +87,7 @@ class AccessibilityTreeNode(TypedDict):
     backendDOMNodeId: str
     frameId: str
     bound: list[float] | None
-    union_bound: Any # actually a thunk of list[float] | None
+    union_bound: Any  # actually a thunk of list[float] | None
     offsetrect_bound: list[float] | None
 
 
@@ -64,7 +115,7 @@ class BrowserConfig(TypedDict):
 
 
 class BrowserInfo(TypedDict):
-    DOMTree: dict[str, Any]
+    DOMTree: dict[str, Any] | None  # only captured when it is needed
     config: BrowserConfig
 
 
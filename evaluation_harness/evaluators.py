@@ -4,19 +4,18 @@ import collections
 import html
 import importlib
 import json
-import time
 import urllib
 from pathlib import Path
 from typing import Any, Tuple, Union
 
+import playwright
 from beartype import beartype
 from nltk.tokenize import word_tokenize  # type: ignore
 from playwright.sync_api import CDPSession, Page
-import playwright
-
-from webarena.browser_env.web_things import WebThing
 from webarena.browser_env.actions import Action, create_stop_action
+from webarena.browser_env.settle import PageSettler
 from webarena.browser_env.utils import StateInfo
+from webarena.browser_env.web_things import WebThing
 from webarena.evaluation_harness.helper_functions import (
     PseudoPage,
     gitlab_get_project_memeber_role,
@@ -105,7 +104,7 @@ class StringEvaluator(Evaluator):
         clean_pred = StringEvaluator.clean_answer(pred)
         # print(f'{clean_ref=}')
         # if len(clean_pred) < 200:
-            # print(f"must include prediction = '{clean_pred}'")
+        # print(f"must include prediction = '{clean_pred}'")
 
         # tokenize the answer if the ref is a single word
         # prevent false positive (e.g, 0)
@@ -269,6 +268,21 @@ class HTMLContentEvaluator(Evaluator):
         config_file: Path | str,
         page: Page | PseudoPage,
         client: CDPSession | None = None,
+    ) -> float:
+        # its listeners are removed from the env's CDP session at the end
+        settler = PageSettler()
+        try:
+            return self._evaluate(config_file, page, client, settler)
+        finally:
+            if client is not None:
+                settler.untrack(client)
+
+    def _evaluate(
+        self,
+        config_file: Path | str,
+        page: Page | PseudoPage,
+        client: CDPSession | None,
+        settler: PageSettler,
     ) -> float:
         with open(config_file, "r") as f:
             configs = json.load(f)
@@ -288,8 +302,13 @@ class HTMLContentEvaluator(Evaluator):
             # navigate to that url
             if target_url != "last":
                 try:
+                    if client is not None:
+                        settler.track(client)
                     page.goto(target_url)
-                    time.sleep(3)  # TODO [shuyanzh]: fix this hard-coded sleep
+                    # wait for the page to settle, at most 3 seconds
+                    settler.settle(
+                        page, client, timeout=3  # type: ignore[arg-type]
+                    )
                 except playwright._impl._errors.Error as e:
                     print(f"Error while going to target url {target_url}: {e}")
                     return 0.0
@@ -394,6 +413,7 @@ def evaluator_router(config_file: Path | str) -> EvaluatorComb:
 
     return EvaluatorComb(evaluators)
 
+
 @beartype
 def evaluator_closure(config_file: Path | str):
     evaluator = evaluator_router(config_file)
@@ -407,9 +427,15 @@ def evaluator_closure(config_file: Path | str):
         else:
             dummy_action = False
 
-        evaluation_result = evaluator(WebThing.low_level_trajectory, config_file, env.page, env.get_page_client(env.page))
+        evaluation_result = evaluator(
+            WebThing.low_level_trajectory,
+            config_file,
+            env.page,
+            env.get_page_client(env.page),
+        )
 
-        if dummy_action: WebThing.low_level_trajectory.pop()
+        if dummy_action:
+            WebThing.low_level_trajectory.pop()
 
         return evaluation_result
 
@@ -1,17 +1,20 @@
 """Script to run end-to-end evaluation on the benchmark"""
 import argparse
+import collections
 import glob
 import json
 import logging
+import multiprocessing
 import os
+import queue
 import random
 import subprocess
 import tempfile
 import time
 from pathlib import Path
+from typing import Any, Iterable, Iterator
 
 import openai
-
 from webarena.agent import (
     Agent,
     PromptAgent,
@@ -22,6 +25,8 @@ from webarena.agent.prompts import *
 from webarena.browser_env import (
     Action,
     ActionTypes,
+    ScreencastConfig,
+    ScreenshotConfig,
     ScriptBrowserEnv,
     StateInfo,
     Trajectory,
@@ -85,8 +90,92 @@ def config() -> argparse.Namespace:
     )
     parser.add_argument("--viewport_width", type=int, default=1280)
     parser.add_argument("--viewport_height", type=int, default=720)
-    parser.add_argument("--save_trace_enabled", action="store_true")
+    parser.add_argument(
+        "--save_trace_enabled",
+        action="store_true",
+        help="Shorthand for --trace_policy always, the default",
+    )
+    parser.add_argument(
+        "--trace_policy",
+        choices=["always", "failures", "every_n", "off"],
+        default="always",
+        help="Which tasks are saved as a playwright trace, 'failures' keeps only the traces of failed tasks",
+    )
+    parser.add_argument("--trace_every_n", type=int, default=10)
+    parser.add_argument(
+        "--observation_delta",
+        action="store_true",
+        help="Diff each text observation against the last keyframe, used by the prompts with observation_delta in their meta data",
+    )
+    parser.add_argument("--keyframe_interval", type=int, default=10)
+    parser.add_argument(
+        "--reuse_unchanged_observation",
+        action="store_true",
+        help="Reuse the previous observation when a page fingerprint shows the action changed nothing, e.g., a failed click",
+    )
+    parser.add_argument(
+        "--no_render_screenshot",
+        action="store_true",
+        help="Leave the screenshots out of the rendered trajectories, the text-only runs then never take one",
+    )
+    parser.add_argument(
+        "--no_trace_snapshots",
+        action="store_true",
+        help="Leave the DOM snapshots out of the traces",
+    )
     parser.add_argument("--sleep_after_execution", type=float, default=0.0)
+    parser.add_argument(
+        "--settle_strategy",
+        choices=["sleep", "event"],
+        default="event",
+        help="How to wait for the page after an action. With 'event', sleep_after_execution is the upper bound",
+    )
+    parser.add_argument(
+        "--persistent_browser",
+        action="store_true",
+        help="Keep the browser alive across tasks and only recreate the context",
+    )
+    parser.add_argument("--browser_pool_size", type=int, default=1)
+    parser.add_argument(
+        "--asset_cache_dir",
+        type=str,
+        default=None,
+        help="Serve the static assets of the sites from an on-disk cache in this directory, can be shared by all workers",
+    )
+    parser.add_argument("--asset_cache_size_mb", type=int, default=1024)
+    parser.add_argument(
+        "--screenshot_format",
+        choices=["default", "png", "jpeg", "webp"],
+        default="default",
+        help="Capture the screenshots over CDP in this format, 'default' keeps the lossless page.screenshot()",
+    )
+    parser.add_argument("--screenshot_quality", type=int, default=80)
+    parser.add_argument("--screenshot_downsample", type=int, default=1)
+    parser.add_argument(
+        "--screencast",
+        action="store_true",
+        help="Stream the frames of the pages over CDP and use the latest frame as the image observation",
+    )
+    parser.add_argument("--screencast_quality", type=int, default=60)
+    parser.add_argument("--screencast_every_nth_frame", type=int, default=1)
+    parser.add_argument(
+        "--har_mode",
+        choices=["off", "record", "replay"],
+        default="off",
+        help="Record the network traffic of each task to --har_dir, or replay it without any backend",
+    )
+    parser.add_argument("--har_dir", type=str, default=None)
+    parser.add_argument(
+        "--block_resources",
+        choices=["auto", "on", "off"],
+        default="auto",
+        help="Abort image, media, font and tracker requests. 'auto' blocks them for text observations",
+    )
+    parser.add_argument(
+        "--prefetch_next_task",
+        action="store_true",
+        help="Load the start pages of the next task while the agent works on the current one",
+    )
 
     parser.add_argument("--max_steps", type=int, default=30)
 
@@ -138,6 +227,26 @@ def config() -> argparse.Namespace:
         default="",
     )
 
+    # parallelism
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each worker owns one browser environment",
+    )
+    parser.add_argument(
+        "--max_task_retries",
+        type=int,
+        default=1,
+        help="How many times a task is rerun after its worker crashed",
+    )
+    parser.add_argument(
+        "--max_worker_restarts",
+        type=int,
+        default=3,
+        help="How many times a worker that crashed outside of a task, e.g., while building the agent, is replaced",
+    )
+
     # example config
     parser.add_argument("--test_start_idx", type=int, default=0)
     parser.add_argument("--test_end_idx", type=int, default=1000)
@@ -214,20 +323,40 @@ def early_stop(
     return False, ""
 
 
-def test(
-    args: argparse.Namespace,
-    agent: Agent | PromptAgent | TeacherForcingAgent,
-    config_file_list: list[str],
-) -> None:
-    scores = []
-    max_steps = args.max_steps
+def renew_config_file(config_file: str, har_mode: str = "off") -> str:
+    """Renew the login cookies of the task, return the updated config file.
+    A replayed task reuses the cookies of the recording, the sites may not
+    even be running."""
+    with open(config_file) as f:
+        _c = json.load(f)
+    if not _c["storage_state"] or har_mode == "replay":
+        return config_file
+
+    cookie_file_name = os.path.basename(_c["storage_state"])
+    comb = get_site_comb_from_filepath(cookie_file_name)
+    temp_dir = tempfile.mkdtemp()
+    # subprocess to renew the cookie
+    subprocess.run(
+        [
+            "python",
+            "browser_env/auto_login.py",
+            "--auth_folder",
+            temp_dir,
+            "--site_list",
+            *comb,
+        ]
+    )
+    _c["storage_state"] = f"{temp_dir}/{cookie_file_name}"
+    assert os.path.exists(_c["storage_state"])
+    # update the config file
+    config_file = f"{temp_dir}/{os.path.basename(config_file)}"
+    with open(config_file, "w") as f:
+        json.dump(_c, f)
+    return config_file
 
-    early_stop_thresholds = {
-        "parsing_failure": args.parsing_failure_th,
-        "repeating_action": args.repeating_action_failure_th,
-    }
 
-    env = ScriptBrowserEnv(
+def build_env(args: argparse.Namespace) -> ScriptBrowserEnv:
+    return ScriptBrowserEnv(
         headless=not args.render,
         slow_mo=args.slow_mo,
         observation_type=args.observation_type,
@@ -237,10 +366,71 @@ def test(
             "height": args.viewport_height,
         },
         save_trace_enabled=args.save_trace_enabled,
+        trace_policy=args.trace_policy,
+        trace_every_n=args.trace_every_n,
+        trace_snapshots=not args.no_trace_snapshots,
+        observation_delta=args.observation_delta,
+        keyframe_interval=args.keyframe_interval,
+        reuse_unchanged_observation=args.reuse_unchanged_observation,
         sleep_after_execution=args.sleep_after_execution,
+        settle_strategy=args.settle_strategy,
+        persistent_browser=args.persistent_browser or args.prefetch_next_task,
+        browser_pool_size=args.browser_pool_size,
+        asset_cache_dir=args.asset_cache_dir,
+        asset_cache_size=args.asset_cache_size_mb << 20,
+        block_resources={"auto": None, "on": True, "off": False}[
+            args.block_resources
+        ],
+        har_mode=args.har_mode,
+        har_dir=args.har_dir,
+        screenshot_config=ScreenshotConfig(
+            format=args.screenshot_format,
+            quality=args.screenshot_quality,
+            downsample=args.screenshot_downsample,
+        )
+        if args.screenshot_format != "default"
+        else None,
+        screencast_config=ScreencastConfig(
+            quality=args.screencast_quality,
+            every_nth_frame=args.screencast_every_nth_frame,
+        )
+        if args.screencast
+        else None,
     )
 
-    for config_file in config_file_list:
+
+def test(
+    args: argparse.Namespace,
+    agent: Agent | PromptAgent | TeacherForcingAgent,
+    config_file_list: Iterable[str],
+    result_queue: Any = None,
+) -> list[float]:
+    """Run the agent on the tasks.
+    When `result_queue` is given, ("start", pid, config_file) is reported
+    when a task is taken and ("done", pid, config_file, score) when the
+    task is finished."""
+    scores = []
+    max_steps = args.max_steps
+
+    early_stop_thresholds = {
+        "parsing_failure": args.parsing_failure_th,
+        "repeating_action": args.repeating_action_failure_th,
+    }
+
+    env = build_env(args)
+
+    # config files whose cookies were renewed when prefetching them
+    renewed_config_files: dict[str, str] = {}
+    # the next task is only pulled early when it is prefetched, so that
+    # other workers can take it from the shared queue otherwise
+    config_files = iter(config_file_list)
+    next_config_file = next(config_files, None)
+    while next_config_file is not None:
+        config_file = task_config_file = next_config_file
+        next_config_file = None
+        score = None
+        if result_queue is not None:
+            result_queue.put(("start", os.getpid(), task_config_file))
         try:
             render_helper = RenderHelper(
                 config_file, args.result_dir, args.action_set_tag
@@ -251,28 +441,12 @@ def test(
                 _c = json.load(f)
                 intent = _c["intent"]
                 task_id = _c["task_id"]
-                # automatically login
-                if _c["storage_state"]:
-                    cookie_file_name = os.path.basename(_c["storage_state"])
-                    comb = get_site_comb_from_filepath(cookie_file_name)
-                    temp_dir = tempfile.mkdtemp()
-                    # subprocess to renew the cookie
-                    subprocess.run(
-                        [
-                            "python",
-                            "browser_env/auto_login.py",
-                            "--auth_folder",
-                            temp_dir,
-                            "--site_list",
-                            *comb,
-                        ]
-                    )
-                    _c["storage_state"] = f"{temp_dir}/{cookie_file_name}"
-                    assert os.path.exists(_c["storage_state"])
-                    # update the config file
-                    config_file = f"{temp_dir}/{os.path.basename(config_file)}"
-                    with open(config_file, "w") as f:
-                        json.dump(_c, f)
+
+            # automatically login
+            if config_file in renewed_config_files:
+                config_file = renewed_config_files.pop(config_file)
+            else:
+                config_file = renew_config_file(config_file, args.har_mode)
 
             logger.info(f"[Config file]: {config_file}")
             logger.info(f"[Intent]: {intent}")
@@ -280,6 +454,19 @@ def test(
             agent.reset(config_file)
             trajectory: Trajectory = []
             obs, info = env.reset(options={"config_file": config_file})
+            if args.prefetch_next_task:
+                next_config_file = next(config_files, None)
+            if next_config_file is not None:
+                if result_queue is not None:
+                    # reserved by this worker from now on
+                    result_queue.put(("start", os.getpid(), next_config_file))
+                try:
+                    renewed_config_files[next_config_file] = renew_config_file(
+                        next_config_file, args.har_mode
+                    )
+                    env.prefetch(renewed_config_files[next_config_file])
+                except Exception as e:
+                    logger.info(f"[Prefetch Error] {repr(e)}")
             state_info: StateInfo = {"observation": obs, "info": info}
             trajectory.append(state_info)
 
@@ -341,12 +528,16 @@ def test(
                 logger.info(f"[Result] (PASS) {config_file}")
             else:
                 logger.info(f"[Result] (FAIL) {config_file}")
-
-            if args.save_trace_enabled:
-                env.save_trace(
-                    Path(args.result_dir) / "traces" / f"{task_id}.zip"
+            if env.har_misses:
+                logger.info(
+                    f"[HAR Misses] {len(env.har_misses)} requests not in {env.har_path}: {env.har_misses}"
                 )
 
+            env.save_trace(
+                Path(args.result_dir) / "traces" / f"{task_id}.zip",
+                success=score == 1,
+            )
+
         except openai.error.OpenAIError as e:
             logger.info(f"[OpenAI Error] {repr(e)}")
         except Exception as e:
@@ -360,9 +551,131 @@ def test(
                 f.write(traceback.format_exc())  # write stack trace to file
 
         render_helper.close()
+        if result_queue is not None:
+            result_queue.put(("done", os.getpid(), task_config_file, score))
+        if next_config_file is None:
+            next_config_file = next(config_files, None)
 
+    if env.asset_cache is not None:
+        logger.info(f"[Asset cache] {env.asset_cache.stats()}")
     env.close()
-    logger.info(f"Average score: {sum(scores) / len(scores)}")
+    if scores:
+        logger.info(f"Average score: {sum(scores) / len(scores)}")
+    return scores
+
+
+def iter_task_queue(task_queue: Any) -> Iterator[str]:
+    """Pull config files from the shared queue until it is drained"""
+    while True:
+        try:
+            yield task_queue.get(timeout=5)
+        except queue.Empty:
+            return
+
+
+def worker(
+    args: argparse.Namespace, task_queue: Any, result_queue: Any
+) -> None:
+    agent = construct_agent(args)
+    test(args, agent, iter_task_queue(task_queue), result_queue)
+
+
+def test_parallel(
+    args: argparse.Namespace, config_file_list: list[str]
+) -> None:
+    """Run the tasks with `args.num_workers` processes.
+    Every worker owns one environment and pulls tasks from a shared queue.
+    A crashed worker is replaced and its task is put back to the queue.
+    The config files that were never processed are logged at the end."""
+    # fork so that the workers log to the same log file
+    mp = multiprocessing.get_context("fork")
+    task_queue = mp.Queue()
+    result_queue = mp.Queue()
+    for config_file in config_file_list:
+        task_queue.put(config_file)
+
+    def start_worker() -> multiprocessing.process.BaseProcess:
+        process = mp.Process(
+            target=worker, args=(args, task_queue, result_queue)
+        )
+        process.start()
+        return process
+
+    workers = [start_worker() for _ in range(args.num_workers)]
+    running: collections.defaultdict[int, set[str]] = collections.defaultdict(
+        set
+    )
+    retries: collections.Counter[str] = collections.Counter()
+    finished: set[str] = set()
+    # the tasks that crashed their worker more than max_task_retries times
+    dropped: set[str] = set()
+    worker_restarts = 0
+    scores: list[float] = []
+
+    def handle_message(message: tuple[Any, ...]) -> None:
+        match message:
+            case ("start", pid, config_file):
+                running[pid].add(config_file)
+            case ("done", pid, config_file, score):
+                running[pid].discard(config_file)
+                finished.add(config_file)
+                if score is not None:
+                    scores.append(score)
+
+    while workers:
+        try:
+            handle_message(result_queue.get(timeout=1))
+            continue
+        except queue.Empty:
+            pass
+        for process in list(workers):
+            if process.is_alive():
+                continue
+            workers.remove(process)
+            # drain the messages sent before the process exited
+            while True:
+                try:
+                    handle_message(result_queue.get(timeout=0.1))
+                except queue.Empty:
+                    break
+            crashed_config_files = running.pop(process.pid, set())  # type: ignore[arg-type]
+            if process.exitcode == 0:
+                continue
+            for config_file in sorted(crashed_config_files):
+                logger.info(
+                    f"[Worker Crashed] exit code {process.exitcode} on {config_file}"
+                )
+                if retries[config_file] < args.max_task_retries:
+                    retries[config_file] += 1
+                    task_queue.put(config_file)
+                else:
+                    dropped.add(config_file)
+            if not set(config_file_list) - finished - dropped:
+                continue
+            if not crashed_config_files:
+                # e.g., the agent or the environment could not be built
+                if worker_restarts >= args.max_worker_restarts:
+                    logger.info(
+                        f"[Worker Crashed] exit code {process.exitcode} outside of a task, not replaced"
+                    )
+                    continue
+                worker_restarts += 1
+                logger.info(
+                    f"[Worker Crashed] exit code {process.exitcode} outside of a task, replaced"
+                )
+            workers.append(start_worker())
+
+    if scores:
+        logger.info(f"Average score: {sum(scores) / len(scores)}")
+    unprocessed = [
+        config_file
+        for config_file in config_file_list
+        if config_file not in finished
+    ]
+    if unprocessed:
+        logger.info(
+            f"[Unprocessed] {len(unprocessed)} config files were never processed: {unprocessed}"
+        )
 
 
 def prepare(args: argparse.Namespace) -> None:
@@ -429,11 +742,13 @@ if __name__ == "__main__":
     else:
         print(f"Total {len(test_file_list)} tasks left")
         args.render = False
-        args.render_screenshot = True
-        args.save_trace_enabled = True
+        args.render_screenshot = not args.no_render_screenshot
 
         args.current_viewport_only = True
         dump_config(args)
 
-        agent = construct_agent(args)
-        test(args, agent, test_file_list)
+        if args.num_workers > 1:
+            test_parallel(args, test_file_list)
+        else:
+            agent = construct_agent(args)
+            test(args, agent, test_file_list)
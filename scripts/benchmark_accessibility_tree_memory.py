@@ -0,0 +1,127 @@
+"""Compare the memory of the accessibility tree kept as CDP dicts, with a
+bounding box thunk per node, with the columnar tree"""
+import argparse
+import copy
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from webarena.browser_env.accessibility_tree import (
+    ColumnarAccessibilityTree,
+)
+from webarena.browser_env.processors import TextObservationProcessor
+
+
+def make_cdp_nodes(num_nodes: int, seed: int = 0) -> list[dict[str, Any]]:
+    """CDP nodes of a listing page: few roles, many repeated names"""
+    rng = random.Random(seed)
+    names = [f"Product {idx}" for idx in range(num_nodes // 20)] + [
+        "",
+        "Add to Cart",
+        "Add to Wish List",
+        "Add to Compare",
+    ]
+    nodes: list[dict[str, Any]] = []
+    for idx in range(num_nodes):
+        role = (
+            "RootWebArea"
+            if idx == 0
+            else rng.choice(
+                ["generic", "link", "StaticText", "button", "listitem", "img"]
+            )
+        )
+        name = rng.choice(names)
+        node = {
+            "nodeId": str(idx + 1),
+            "ignored": False,
+            "role": {"type": "role", "value": role},
+            "chromeRole": {"type": "internalRole", "value": 0},
+            "name": {
+                "type": "computedString",
+                "value": name,
+                "sources": [{"type": "contents", "value": {"value": name}}],
+            },
+            "properties": [
+                {
+                    "name": "focusable",
+                    "value": {"type": "booleanOrUndefined", "value": True},
+                }
+            ],
+            "childIds": [],
+            "backendDOMNodeId": idx + 1,
+            "frameId": "F" * 32,
+        }
+        if idx:
+            # a shallow tree, a few children per node
+            parent = rng.randrange((idx - 1) // 8, (idx - 1) // 4 + 1)
+            node["parentId"] = nodes[parent]["nodeId"]
+            nodes[parent]["childIds"].append(node["nodeId"])
+        nodes.append(node)
+    return nodes
+
+
+def dict_tree(nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # the CDP dicts with a lazy bounding box each
+    tree = copy.deepcopy(nodes)
+    for node in tree:
+        node["union_bound"] = TextObservationProcessor.BoundingBoxThunk(
+            None, str(node["backendDOMNodeId"])  # type: ignore[arg-type]
+        )
+    return tree
+
+
+def columnar_tree(nodes: list[dict[str, Any]]) -> ColumnarAccessibilityTree:
+    return ColumnarAccessibilityTree.from_nodes(copy.deepcopy(nodes))
+
+
+def retained_bytes(build: Callable[[], Any]) -> tuple[int, Any]:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "trees", nargs="*", help="json files of saved CDP node lists"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 50_000]
+    )
+    parser.add_argument(
+        "--num_steps",
+        type=int,
+        default=30,
+        help="The trees of a trajectory kept at once",
+    )
+    args = parser.parse_args()
+
+    trees = []
+    for path in args.trees:
+        with open(path) as f:
+            trees.append((path, json.load(f)))
+    if not trees:
+        for num_nodes in args.sizes:
+            trees.append((f"{num_nodes} nodes", make_cdp_nodes(num_nodes)))
+
+    for name, nodes in trees:
+        dict_bytes, _ = retained_bytes(lambda: dict_tree(nodes))
+        columnar_bytes, tree = retained_bytes(lambda: columnar_tree(nodes))
+        start = time.perf_counter()
+        TextObservationProcessor.parse_accessibility_tree(tree)
+        render_latency = time.perf_counter() - start
+        print(
+            f"{name}: dicts {dict_bytes / 2**20:.1f}MiB, columnar "
+            f"{columnar_bytes / 2**20:.1f}MiB "
+            f"({dict_bytes / columnar_bytes:.1f}x), "
+            f"{args.num_steps} steps {dict_bytes * args.num_steps / 2**20:.0f}"
+            f"MiB vs {columnar_bytes * args.num_steps / 2**20:.0f}MiB, "
+            f"render {render_latency * 1000:.1f}ms"
+        )
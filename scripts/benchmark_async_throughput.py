@@ -0,0 +1,85 @@
+"""Measure the episode throughput of AsyncEpisodeRunner for different
+concurrency levels. A scripted agent replays a fixed action sequence and waits `--llm_latency`
+seconds before every action to simulate the LLM call."""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from typing import Any
+
+from webarena.browser_env import (
+    Action,
+    AsyncEpisodeRunner,
+    Trajectory,
+    create_goto_url_action,
+    create_scroll_action,
+    create_stop_action,
+)
+
+
+class ScriptedAsyncAgent:
+    def __init__(self, url: str, llm_latency: float) -> None:
+        self.url = url
+        self.llm_latency = llm_latency
+
+    def reset(self, test_config_file: str) -> None:
+        self.actions = [
+            create_goto_url_action(self.url),
+            create_scroll_action("down"),
+            create_scroll_action("up"),
+            create_stop_action(""),
+        ]
+
+    async def anext_action(
+        self, trajectory: Trajectory, intent: str, meta_data: Any
+    ) -> Action:
+        await asyncio.sleep(self.llm_latency)
+        return self.actions.pop(0)
+
+
+def make_config_files(num_episodes: int, start_url: str) -> list[str]:
+    config_files = []
+    for task_id in range(num_episodes):
+        config = {
+            "task_id": task_id,
+            "intent": "benchmark",
+            "start_url": start_url,
+            "storage_state": None,
+        }
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".json", delete=False
+        ) as f:
+            json.dump(config, f)
+            config_files.append(f.name)
+    return config_files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_episodes", type=int, default=16)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 8]
+    )
+    parser.add_argument("--llm_latency", type=float, default=1.0)
+    parser.add_argument("--url", type=str, default="http://www.example.com")
+    args = parser.parse_args()
+
+    config_files = make_config_files(args.num_episodes, args.url)
+    for max_concurrency in args.concurrency:
+        runner = AsyncEpisodeRunner(
+            agent_factory=lambda: ScriptedAsyncAgent(
+                args.url, args.llm_latency
+            ),
+            max_concurrency=max_concurrency,
+        )
+        start = time.perf_counter()
+        results = runner.run(config_files)
+        elapsed = time.perf_counter() - start
+        num_errors = sum(1 for result in results if result.error)
+        print(
+            f"concurrency={max_concurrency}: "
+            f"{len(results) / elapsed * 3600:.1f} episodes/hour "
+            f"({elapsed:.1f}s for {len(results)} episodes, "
+            f"{num_errors} errors)"
+        )
@@ -0,0 +1,90 @@
+"""Compare the single-pass rendering of the accessibility tree with the
+separate text, cleaning and WebThing passes on saved or synthetic trees"""
+import argparse
+import copy
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from benchmark_tree_rendering import make_accessibility_tree
+from webarena.browser_env.accessibility_tree import (
+    ColumnarAccessibilityTree,
+)
+from webarena.browser_env.processors import TextObservationProcessor
+
+
+def separate_passes(tree: list[dict[str, Any]], env: Any) -> tuple[float, Any]:
+    start = time.perf_counter()
+    parse = TextObservationProcessor.parse_accessibility_tree
+    content, obs_nodes_info = parse(tree)  # type: ignore[arg-type]
+    web_things = TextObservationProcessor.accessibility_tree_to_web_things(
+        tree, env  # type: ignore[arg-type]
+    )
+    content = TextObservationProcessor.clean_accesibility_tree(content)
+    return time.perf_counter() - start, (content, obs_nodes_info, web_things)
+
+
+def single_pass(tree: list[dict[str, Any]], env: Any) -> tuple[float, Any]:
+    # the processors build the columnar tree from the CDP nodes
+    columnar_tree = ColumnarAccessibilityTree.from_nodes(tree)
+    start = time.perf_counter()
+    result = TextObservationProcessor.render_accessibility_tree(
+        columnar_tree, env
+    )
+    return time.perf_counter() - start, result
+
+
+def best_of(
+    fn: Callable[[list[dict[str, Any]], Any], tuple[float, Any]],
+    tree: list[dict[str, Any]],
+    env: Any,
+    num_runs: int,
+) -> tuple[float, Any]:
+    latencies = []
+    for _ in range(num_runs):
+        # the web things are cleaned in place
+        latency, result = fn(copy.deepcopy(tree), env)
+        latencies.append(latency)
+    return min(latencies), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "trees", nargs="*", help="json files of saved accessibility trees"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[5_000, 20_000]
+    )
+    parser.add_argument("--max_depth", type=int, default=30)
+    parser.add_argument("--num_runs", type=int, default=5)
+    args = parser.parse_args()
+
+    trees = []
+    for path in args.trees:
+        with open(path) as f:
+            trees.append((path, json.load(f)))
+    if not trees:
+        for num_nodes in args.sizes:
+            tree = make_accessibility_tree(num_nodes, args.max_depth)
+            trees.append((f"{num_nodes} nodes", tree))
+    for node in (node for _, tree in trees for node in tree):
+        node.setdefault("union_bound", None)
+
+    # the WebThings only read the url of the env
+    env = SimpleNamespace(page=SimpleNamespace(url="http://localhost"))
+    for name, tree in trees:
+        separate_latency, expected = best_of(
+            separate_passes, tree, env, args.num_runs
+        )
+        latency, result = best_of(single_pass, tree, env, args.num_runs)
+        assert result[:2] == expected[:2], f"{name}: the texts disagree"
+        assert (
+            result[2].serialize() == expected[2].serialize()
+        ), f"{name}: the WebThings disagree"
+        print(
+            f"{name}: separate passes {separate_latency * 1000:.1f}ms, "
+            f"single pass {latency * 1000:.1f}ms "
+            f"({separate_latency / latency:.1f}x)"
+        )
@@ -0,0 +1,56 @@
+"""Measure the latency of ScriptBrowserEnv.reset() with and without a
+persistent browser"""
+import argparse
+import statistics
+import time
+
+from webarena.browser_env import ScriptBrowserEnv
+
+
+def benchmark_reset(
+    persistent_browser: bool,
+    num_resets: int,
+    config_file: str | None,
+    observation_type: str,
+) -> list[float]:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type=observation_type,
+        persistent_browser=persistent_browser,
+    )
+    options = {"config_file": config_file} if config_file else None
+    latencies = []
+    for _ in range(num_resets):
+        start = time.perf_counter()
+        env.reset(options=options)
+        latencies.append(time.perf_counter() - start)
+    env.close()
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_resets", type=int, default=20)
+    parser.add_argument("--config_file", type=str, default=None)
+    parser.add_argument(
+        "--observation_type",
+        choices=["accessibility_tree", "html", "image"],
+        default="accessibility_tree",
+    )
+    args = parser.parse_args()
+
+    for persistent_browser in [False, True]:
+        latencies = benchmark_reset(
+            persistent_browser,
+            args.num_resets,
+            args.config_file,
+            args.observation_type,
+        )
+        # the first reset always launches the browser
+        warm = latencies[1:] or latencies
+        print(
+            f"persistent_browser={persistent_browser}: "
+            f"first={latencies[0]:.3f}s "
+            f"mean={statistics.mean(warm):.3f}s "
+            f"median={statistics.median(warm):.3f}s"
+        )
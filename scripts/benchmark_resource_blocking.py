@@ -0,0 +1,82 @@
+"""Measure the page-load and step latency of accessibility tree runs with
+and without resource blocking"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from webarena.browser_env import (
+    ScriptBrowserEnv,
+    create_goto_url_action,
+    create_scroll_action,
+)
+from webarena.browser_env.env_config import (
+    GITLAB,
+    MAP,
+    REDDIT,
+    SHOPPING,
+    SHOPPING_ADMIN,
+    WIKIPEDIA,
+)
+
+SITES = {
+    "shopping": SHOPPING,
+    "shopping_admin": SHOPPING_ADMIN,
+    "reddit": REDDIT,
+    "gitlab": GITLAB,
+    "wikipedia": WIKIPEDIA,
+    "map": MAP,
+}
+
+
+def benchmark_site(
+    url: str, block_resources: bool, num_runs: int
+) -> tuple[list[float], list[float]]:
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"start_url": url}, f)
+        config_file = f.name
+
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        persistent_browser=True,
+        block_resources=block_resources,
+    )
+    load_latencies, step_latencies = [], []
+    try:
+        for _ in range(num_runs):
+            start = time.perf_counter()
+            env.reset(options={"config_file": config_file})
+            load_latencies.append(time.perf_counter() - start)
+            for action in [
+                create_scroll_action("down"),
+                create_goto_url_action(url),
+            ]:
+                start = time.perf_counter()
+                env.step(action)
+                step_latencies.append(time.perf_counter() - start)
+    finally:
+        env.close()
+    return load_latencies, step_latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_runs", type=int, default=5)
+    parser.add_argument(
+        "--sites", nargs="+", choices=list(SITES), default=list(SITES)
+    )
+    args = parser.parse_args()
+
+    for site in args.sites:
+        for block_resources in [False, True]:
+            load_latencies, step_latencies = benchmark_site(
+                SITES[site], block_resources, args.num_runs
+            )
+            print(
+                f"{site} block_resources={block_resources}: "
+                f"page load median={statistics.median(load_latencies):.3f}s "
+                f"step median={statistics.median(step_latencies):.3f}s"
+            )
@@ -0,0 +1,68 @@
+"""Measure the step time and the trajectory memory with eager and lazy
+info["page"] html"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from webarena.browser_env import (
+    ScriptBrowserEnv,
+    create_goto_url_action,
+    create_scroll_action,
+)
+
+
+def benchmark_step_info(
+    url: str, eager_page_content: bool, num_steps: int
+) -> tuple[list[float], int]:
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"start_url": url}, f)
+        config_file = f.name
+
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        eager_page_content=eager_page_content,
+    )
+    trajectory = []
+    latencies = []
+    try:
+        tracemalloc.start()
+        obs, info = env.reset(options={"config_file": config_file})
+        trajectory.append({"observation": obs, "info": info})
+        for step in range(num_steps):
+            if step % 2 == 0:
+                action = create_scroll_action("down")
+            else:
+                action = create_goto_url_action(url)
+            start = time.perf_counter()
+            obs, _, _, _, info = env.step(action)
+            latencies.append(time.perf_counter() - start)
+            trajectory.append({"observation": obs, "info": info})
+        # the memory still held by the trajectory, e.g., for the evaluation
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        env.close()
+    return latencies, memory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", type=str, required=True)
+    parser.add_argument("--num_steps", type=int, default=10)
+    args = parser.parse_args()
+
+    for eager_page_content in [True, False]:
+        latencies, memory = benchmark_step_info(
+            args.url, eager_page_content, args.num_steps
+        )
+        print(
+            f"eager_page_content={eager_page_content}: "
+            f"step median={statistics.median(latencies):.3f}s "
+            f"mean={statistics.mean(latencies):.3f}s "
+            f"trajectory memory={memory / 2**20:.1f}MiB"
+        )
@@ -0,0 +1,267 @@
+"""Compare the explicit-stack tree renderers with the recursive ones they
+replaced on saved trees, or on synthetic ones if none are given.
+
+A tree can be saved from a page with
+    json.dump(client.send("Accessibility.getFullAXTree", {})["nodes"], f)
+or, for the html renderer, from TextObservationProcessor.build_dom_tree.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Callable
+
+from webarena.browser_env.accessibility_tree import (
+    ColumnarAccessibilityTree,
+)
+from webarena.browser_env.constants import IGNORED_ACTREE_PROPERTIES
+from webarena.browser_env.processors import TextObservationProcessor
+
+
+def parse_html_recursively(
+    dom_tree: list[dict[str, Any]]
+) -> tuple[str, dict[str, Any]]:
+    """The recursive renderer of TextObservationProcessor.parse_html"""
+
+    obs_nodes_info = {}
+    nodeid_to_cursor = {
+        node["nodeId"]: idx for idx, node in enumerate(dom_tree)
+    }
+
+    def dfs(node_cursor: int, depth: int) -> str:
+        tree_str = ""
+        node = dom_tree[node_cursor]
+        indent = "\t" * depth
+        valid_node = True
+        try:
+            node_str = f"[{node_cursor}] <{node['nodeName']}"
+            if node["attributes"]:
+                node_str += f" {node['attributes']}"
+            node_str += f"> {node['nodeValue']}"
+            valid_node = bool(node["attributes"] or node["nodeValue"])
+
+            if valid_node:
+                obs_nodes_info[str(node_cursor)] = {
+                    "backend_id": node["backendNodeId"],
+                    "union_bound": node["union_bound"],
+                    "text": node_str,
+                }
+                tree_str += f"{indent}{node_str}\n"
+
+        except Exception as e:
+            valid_node = False
+
+        for child_ids in node["childIds"]:
+            child_cursor = nodeid_to_cursor[child_ids]
+            child_depth = depth + 1 if valid_node else depth
+            child_str = dfs(child_cursor, child_depth)
+            tree_str += child_str
+
+        return tree_str
+
+    html = dfs(0, 0)
+    return html, obs_nodes_info
+
+
+def parse_accessibility_tree_recursively(
+    accessibility_tree: list[dict[str, Any]],
+) -> tuple[str, dict[str, Any]]:
+    """The recursive renderer of
+    TextObservationProcessor.parse_accessibility_tree"""
+    node_id_to_idx = {}
+    for idx, node in enumerate(accessibility_tree):
+        node_id_to_idx[node["nodeId"]] = idx
+
+    obs_nodes_info = {}
+
+    def dfs(idx: int, obs_node_id: str, depth: int) -> str:
+        tree_str = ""
+        node = accessibility_tree[idx]
+        indent = "\t" * depth
+        valid_node = True
+        try:
+            role = node["role"]["value"]
+            name = node["name"]["value"]
+            node_str = f"[{obs_node_id}] {role} {repr(name)}"
+            properties = []
+            for property in node.get("properties", []):
+                try:
+                    if property["name"] in IGNORED_ACTREE_PROPERTIES:
+                        continue
+                    properties.append(
+                        f'{property["name"]}: {property["value"]["value"]}'
+                    )
+                except KeyError:
+                    pass
+
+            if properties:
+                node_str += " " + " ".join(properties)
+
+            # check valid
+            if not node_str.strip():
+                valid_node = False
+
+            # empty generic node
+            if not name.strip():
+                if not properties:
+                    if role in [
+                        "generic",
+                        "img",
+                        "list",
+                        "strong",
+                        "paragraph",
+                        "banner",
+                        "navigation",
+                        "Section",
+                        "LabelText",
+                        "Legend",
+                        "listitem",
+                    ]:
+                        valid_node = False
+                elif role in ["listitem"]:
+                    valid_node = False
+
+            if valid_node:
+                tree_str += f"{indent}{node_str}"
+                obs_nodes_info[obs_node_id] = {
+                    "backend_id": node["backendDOMNodeId"],
+                    "union_bound": node["union_bound"],
+                    "text": node_str,
+                }
+
+        except Exception as e:
+            valid_node = False
+
+        for _, child_node_id in enumerate(node["childIds"]):
+            if child_node_id not in node_id_to_idx:
+                continue
+            # mark this to save some tokens
+            child_depth = depth + 1 if valid_node else depth
+            child_str = dfs(
+                node_id_to_idx[child_node_id], child_node_id, child_depth
+            )
+            if child_str.strip():
+                if tree_str.strip():
+                    tree_str += "\n"
+                tree_str += child_str
+
+        return tree_str
+
+    tree_str = dfs(0, accessibility_tree[0]["nodeId"], 0)
+    return tree_str, obs_nodes_info
+
+
+def make_accessibility_tree(
+    num_nodes: int, max_depth: int, seed: int = 0
+) -> list[dict[str, Any]]:
+    """A random tree with long nested runs, like a diff page"""
+    rng = random.Random(seed)
+    tree: list[dict[str, Any]] = []
+    depths = []
+    for idx in range(num_nodes):
+        if idx == 0:
+            parent, depth = -1, 0
+        elif rng.random() < 0.95 and depths[idx - 1] < max_depth:
+            parent, depth = idx - 1, depths[idx - 1] + 1
+        else:
+            parent = rng.randrange(idx)
+            depth = depths[parent] + 1
+            if depth > max_depth:
+                parent, depth = 0, 1
+        role = rng.choice(["generic", "link", "StaticText", "listitem"])
+        name = "" if role == "generic" else f"text {idx}"
+        tree.append(
+            {
+                "nodeId": str(idx),
+                "role": {"value": "RootWebArea" if idx == 0 else role},
+                "name": {"value": name},
+                "properties": [],
+                "childIds": [],
+                "backendDOMNodeId": idx,
+            }
+        )
+        depths.append(depth)
+        if parent >= 0:
+            tree[parent]["childIds"].append(str(idx))
+    return tree
+
+
+def make_dom_tree(
+    accessibility_tree: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """The html tree of the same shape"""
+    return [
+        {
+            "nodeId": node["nodeId"],
+            "nodeName": "div",
+            "attributes": "",
+            "nodeValue": node["name"]["value"],
+            "backendNodeId": node["backendDOMNodeId"],
+            "childIds": node["childIds"],
+        }
+        for node in accessibility_tree
+    ]
+
+
+def best_of(
+    fn: Callable[[list[dict[str, Any]]], tuple[str, dict[str, Any]]],
+    tree: list[dict[str, Any]],
+    num_runs: int,
+) -> tuple[float, str]:
+    latencies = []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        text, _ = fn(tree)
+        latencies.append(time.perf_counter() - start)
+    return min(latencies), text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "trees", nargs="*", help="json files of saved node lists"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 50_000]
+    )
+    parser.add_argument("--max_depth", type=int, default=500)
+    parser.add_argument("--num_runs", type=int, default=3)
+    args = parser.parse_args()
+
+    # the recursive renderers need a frame per tree level
+    sys.setrecursionlimit(100_000)
+
+    trees = []
+    for path in args.trees:
+        with open(path) as f:
+            tree = json.load(f)
+        trees.append((path, tree))
+    if not trees:
+        for num_nodes in args.sizes:
+            tree = make_accessibility_tree(num_nodes, args.max_depth)
+            trees.append((f"{num_nodes} accessibility nodes", tree))
+            trees.append((f"{num_nodes} html nodes", make_dom_tree(tree)))
+    for node in (node for _, tree in trees for node in tree):
+        node.setdefault("union_bound", None)
+
+    nodes_of = dict(trees)
+    for name, tree in trees:
+        if "nodeName" in tree[0]:
+            baseline = parse_html_recursively
+            renderer = TextObservationProcessor.parse_html
+        else:
+            baseline = parse_accessibility_tree_recursively
+            renderer = TextObservationProcessor.parse_accessibility_tree
+            # the processors build the columnar tree from the CDP nodes
+            tree = ColumnarAccessibilityTree.from_nodes(tree)  # type: ignore[assignment]
+        recursive_latency, expected = best_of(
+            baseline, nodes_of[name], args.num_runs
+        )
+        latency, text = best_of(renderer, tree, args.num_runs)  # type: ignore[arg-type]
+        assert text == expected, f"{name}: the renderers disagree"
+        print(
+            f"{name}: recursive {recursive_latency * 1000:.1f}ms, "
+            f"explicit stack {latency * 1000:.1f}ms "
+            f"({recursive_latency / latency:.1f}x)"
+        )
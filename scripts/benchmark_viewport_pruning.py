@@ -0,0 +1,64 @@
+"""Measure how the viewport pruning of the tree scales on synthetic trees"""
+import argparse
+import copy
+import random
+import time
+from typing import Any
+
+from webarena.browser_env.processors import TextObservationProcessor
+
+
+def make_tree(
+    num_nodes: int, removal_rate: float, seed: int = 0
+) -> tuple[list[dict[str, Any]], list[bool]]:
+    """A random tree with wide and deep parts, like a long listing page"""
+    rng = random.Random(seed)
+    tree: list[dict[str, Any]] = [
+        {"nodeId": "0", "parentId": "-1", "childIds": []}
+    ]
+    for idx in range(1, num_nodes):
+        # mostly attach to a recent node, sometimes to any node
+        if rng.random() < 0.8:
+            parent = rng.randrange(max(0, idx - 10), idx)
+        else:
+            parent = rng.randrange(idx)
+        tree.append(
+            {"nodeId": str(idx), "parentId": str(parent), "childIds": []}
+        )
+        tree[parent]["childIds"].append(str(idx))
+    removal_mask = [False] + [
+        rng.random() < removal_rate for _ in range(num_nodes - 1)
+    ]
+    return tree, removal_mask
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 20_000, 50_000, 100_000],
+    )
+    parser.add_argument(
+        "--removal_rate",
+        type=float,
+        default=0.9,
+        help="Most nodes of a large page are off-screen",
+    )
+    parser.add_argument("--num_runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_nodes in args.sizes:
+        tree, removal_mask = make_tree(num_nodes, args.removal_rate)
+        latencies = []
+        for _ in range(args.num_runs):
+            nodes = copy.deepcopy(tree)
+            start = time.perf_counter()
+            TextObservationProcessor.prune_tree(nodes, removal_mask)  # type: ignore[arg-type]
+            latencies.append(time.perf_counter() - start)
+        latency = min(latencies)
+        print(
+            f"{num_nodes} nodes: {latency * 1000:.1f}ms "
+            f"({latency / num_nodes * 1e6:.2f}us per node)"
+        )
@@ -2,7 +2,6 @@ from typing import AsyncGenerator, Generator
 
 import pytest
 import pytest_asyncio
-
 from webarena.browser_env import AsyncScriptBrowserEnv, ScriptBrowserEnv
 
 HEADLESS = True
@@ -23,6 +22,18 @@ def script_browser_env() -> Generator[ScriptBrowserEnv, None, None]:
     env.close()
 
 
+@pytest.fixture(scope="function")
+def persistent_script_browser_env() -> Generator[ScriptBrowserEnv, None, None]:
+    env = ScriptBrowserEnv(
+        headless=HEADLESS,
+        slow_mo=SLOW_MO,
+        persistent_browser=True,
+        browser_pool_size=2,
+    )
+    yield env
+    env.close()
+
+
 @pytest.fixture(scope="function")
 def current_viewport_script_browser_env() -> Generator[
     ScriptBrowserEnv, None, None
@@ -3,8 +3,8 @@ from typing import Dict, Optional, Tuple, Type, Union, cast
 
 import pytest
 from playwright.sync_api import Page, expect
-
 from webarena.browser_env import (
+    AsyncScriptBrowserEnv,
     ScriptBrowserEnv,
     create_id_based_action,
     create_key_press_action,
@@ -173,6 +173,37 @@ def test_id_click(
     assert "radio 'Weekly'" in obs["text"]
 
 
+@pytest.mark.asyncio
+async def test_async_id_click() -> None:
+    env = AsyncScriptBrowserEnv(
+        headless=HEADLESS,
+        slow_mo=SLOW_MO,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+    )
+    await env.areset()
+
+    obs, success, _, _, info = await env.astep(
+        create_playwright_action(
+            'page.goto("https://russmaxdesign.github.io/exercise/")'
+        )
+    )
+    assert success
+    assert "link 'McKenna/Bell'" in obs["text"]
+    assert obs["image"].shape[:2] == (720, 1280)
+    element_id = re.search(r"\[(\d+)\] link 'McKenna/Bell'", obs["text"]).group(1)  # type: ignore
+
+    obs, success, _, _, info = await env.astep(
+        create_id_based_action(f"click [{element_id}]")
+    )
+    assert success
+    assert (
+        info["page"].url
+        == "https://russmaxdesign.github.io/exercise/#link-four"
+    )
+    await env.aclose()
+
+
 def test_id_hover(
     accessibility_tree_current_viewport_script_browser_env: ScriptBrowserEnv,
 ) -> None:
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from webarena.browser_env import (
+    ScriptBrowserEnv,
+    create_goto_url_action,
+)
+from webarena.browser_env.asset_cache import AssetCache
+
+HEADLESS = True
+
+
+def test_asset_cache_lru_eviction(tmp_path: Path) -> None:
+    cache = AssetCache(tmp_path, max_size=250)
+    for idx in range(3):
+        cache.put(f"key{idx}", 200, {}, str(idx).encode() * 100)
+        # make the access times distinguishable, key2 is the newest entry
+        access_time = time.time() - 10 + idx
+        entry_path = cache.entry_dir / f"key{idx}.json"
+        os.utime(entry_path, (access_time, access_time))
+
+    # key0 was the least recently used entry
+    assert cache.evictions == 1
+    assert cache.get("key0") is None
+    entry, body = cache.get("key2")  # type: ignore[misc]
+    assert entry["status"] == 200
+    assert body == b"2" * 100
+    # the size is recovered from the directory
+    assert AssetCache(tmp_path).size == cache.size == 200
+
+
+def test_asset_cache_shared_directory(tmp_path: Path) -> None:
+    # two workers sharing the directory, neither of them alone is full
+    first = AssetCache(tmp_path, max_size=250)
+    second = AssetCache(tmp_path, max_size=250)
+    first.put("key0", 200, {}, b"0" * 100)
+    first.put("key1", 200, {}, b"1" * 100)
+    old_time = time.time() - 10
+    for idx in range(2):
+        entry_path = first.entry_dir / f"key{idx}.json"
+        os.utime(entry_path, (old_time + idx, old_time + idx))
+    second.put("key2", 200, {}, b"2" * 100)
+    # the total is enforced, not the size seen by the second worker
+    assert second.evictions == 1
+    assert second.get("key0") is None
+    assert second.size == first.disk_size() == 200
+
+    # an entry whose blob was already removed by another worker
+    entry = json.loads((first.entry_dir / "key1.json").read_text())
+    (first.blob_dir / entry["body"]).unlink()
+    first.size = 1000
+    first.evict()
+    assert first.size == first.disk_size() == 100
+    assert first.get("key2") is not None
+
+
+def test_asset_cache_shared_across_contexts(tmp_path: Path) -> None:
+    env = ScriptBrowserEnv(headless=HEADLESS, asset_cache_dir=str(tmp_path))
+    try:
+        env.reset()
+        url = "https://www.rfc-editor.org/rfc/rfc2606.html"
+        env.step(create_goto_url_action(url))
+        misses = env.asset_cache.misses  # type: ignore[union-attr]
+        assert misses > 0
+        assert env.asset_cache.hits == 0  # type: ignore[union-attr]
+
+        # a fresh context loads the same assets from the disk
+        env.reset()
+        _, success, _, _, info = env.step(create_goto_url_action(url))
+        assert success
+        assert info["page"].url == url
+        assert env.asset_cache.hits > 0  # type: ignore[union-attr]
+        assert env.asset_cache.misses == misses  # type: ignore[union-attr]
+    finally:
+        env.close()
@@ -0,0 +1,164 @@
+import copy
+import json
+from pathlib import Path
+
+from webarena.agent.prompts.prompt_constructor import (
+    DirectPromptConstructor,
+)
+from webarena.agent.prompts.raw.p_direct_id_actree_2s import prompt
+from webarena.browser_env import (
+    DetachedPage,
+    ScriptBrowserEnv,
+    Trajectory,
+    create_scroll_action,
+)
+from webarena.browser_env.observation_delta import (
+    ObservationDiffer,
+    render_observation_delta,
+)
+from webarena.browser_env.processors import TextObservationProcessor
+from webarena.llms.lm_config import LMConfig
+from webarena.llms.tokenizers import Tokenizer
+
+HEADLESS = True
+
+
+def test_observation_differ() -> None:
+    differ = ObservationDiffer(keyframe_interval=3)
+    url = "http://www.example.com"
+    unchanged = {
+        str(idx): f"[{idx}] StaticText 'Line {idx}'" for idx in range(6, 12)
+    }
+    nodes = {
+        "1": "[1] RootWebArea 'Example'",
+        "2": "[2] link 'More'",
+        "3": "[3] textbox 'Search' focused: False",
+        "4": "[4] StaticText 'Hello'",
+        **unchanged,
+    }
+    delta = differ.diff(nodes, url, "keyframe observation")
+    assert delta["keyframe"]
+    assert delta["keyframe_observation"] == "keyframe observation"
+
+    nodes = {
+        "1": "[1] RootWebArea 'Example'",
+        "3": "[3] textbox 'Search' focused: True",
+        "4": "[4] StaticText 'Hello'",
+        "5": "[5] link 'Less'",
+        **unchanged,
+    }
+    delta = differ.diff(nodes, url, "second observation")
+    assert not delta["keyframe"]
+    assert delta["keyframe_observation"] == "keyframe observation"
+    assert delta["added"] == {"5": "[5] link 'Less'"}
+    assert delta["removed"] == {"2": "[2] link 'More'"}
+    assert delta["changed"] == {"3": "[3] textbox 'Search' focused: True"}
+    assert render_observation_delta(delta).splitlines() == [
+        "Changes since the observation above:",
+        "Added:",
+        "\t[5] link 'Less'",
+        "Removed:",
+        "\t[2] link 'More'",
+        "Changed:",
+        "\t[3] textbox 'Search' focused: True",
+    ]
+
+    # the delta is cumulative since the keyframe, not since the last step
+    nodes = {**nodes, "4": "[4] StaticText 'Bye'"}
+    delta = differ.diff(nodes, url, "third observation")
+    assert delta["keyframe_observation"] == "keyframe observation"
+    assert delta["added"] == {"5": "[5] link 'Less'"}
+    assert delta["removed"] == {"2": "[2] link 'More'"}
+    assert delta["changed"] == {
+        "3": "[3] textbox 'Search' focused: True",
+        "4": "[4] StaticText 'Bye'",
+    }
+
+    # the periodic keyframe, three observations after the last one
+    assert differ.diff(nodes, url)["keyframe"]
+    # a new page
+    assert differ.diff(nodes, "http://www.example.org")["keyframe"]
+
+
+def test_observation_delta_prompt(tmp_path: Path) -> None:
+    instruction = copy.deepcopy(prompt)
+    instruction["meta_data"]["observation_delta"] = True
+    instruction_path = tmp_path / "instruction.json"
+    instruction_path.write_text(json.dumps(instruction))
+    lm_config = LMConfig(
+        provider="openai",
+        model="gpt-3.5-turbo",
+        mode="chat",
+        gen_config={"max_obs_length": 0},
+    )
+    prompt_constructor = DirectPromptConstructor(
+        instruction_path, lm_config, Tokenizer("openai", "gpt-3.5-turbo")
+    )
+    processor = TextObservationProcessor(
+        "accessibility_tree",
+        current_viewport_only=False,
+        viewport_size={"width": 1280, "height": 720},
+        observation_delta=True,
+    )
+    url = "http://www.example.com"
+
+    steps = [
+        ["[1] RootWebArea 'Shop'", "[2] link 'Cart'", "[3] button 'Buy'"],
+        ["[1] RootWebArea 'Shop'", "[2] link 'Cart'", "[3] button 'Buy'"],
+        ["[1] RootWebArea 'Shop'", "[2] link 'Cart (1)'", "[3] button 'Buy'"],
+        ["[1] RootWebArea 'Shop'", "[2] link 'Cart (1)'", "[4] link 'Pay'"],
+    ]
+    unchanged = [f"[{idx}] StaticText 'Item {idx}'" for idx in range(5, 11)]
+    trajectory: Trajectory = []
+    for step, lines in enumerate(steps):
+        lines = lines + unchanged
+        obs_nodes_info = {
+            line[1:].split("]")[0]: {"text": line} for line in lines
+        }
+        content = "Tab 0 (current): Shop\n\n" + "\n".join(lines)
+        processor.update_observation_delta(obs_nodes_info, url, content)
+        trajectory.append(
+            {
+                "observation": {"text": content},
+                "info": {
+                    "page": DetachedPage(url, ""),
+                    # the meta data dict is shared by all the steps
+                    "observation_metadata": {"text": processor.meta_data},
+                },
+            }
+        )
+        api_input = prompt_constructor.construct(
+            trajectory,
+            "Buy the item",
+            {"action_history": ["None"]},
+        )
+        current = api_input[-1]["content"]  # type: ignore[index]
+        assert processor.meta_data["observation_delta"]["keyframe"] == (
+            step == 0
+        )
+        # the page stays in the prompt after the first step
+        for element_id in ["[1]", "[2]"]:
+            assert element_id in current
+        if step == 3:
+            assert "Removed:\n\t[3] button 'Buy'" in current
+            assert "Added:\n\t[4] link 'Pay'" in current
+            assert "Changed:\n\t[2] link 'Cart (1)'" in current
+
+
+def test_observation_delta_env() -> None:
+    env = ScriptBrowserEnv(
+        headless=HEADLESS,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        observation_delta=True,
+    )
+    try:
+        _, info = env.reset()
+        delta = info["observation_metadata"]["text"]["observation_delta"]
+        assert delta["keyframe"]
+        _, success, _, _, info = env.step(create_scroll_action("down"))
+        assert success
+        delta = info["observation_metadata"]["text"]["observation_delta"]
+        assert not delta["keyframe"]
+    finally:
+        env.close()
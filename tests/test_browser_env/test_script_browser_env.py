@@ -1,23 +1,48 @@
-import asyncio
 import collections
+import copy
 import json
+import pickle
+import random
 import tempfile
-from typing import Callable, Dict, Optional, Tuple, Type, Union, cast
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
+import numpy as np
 import pytest
 from gymnasium.vector import AsyncVectorEnv
 from playwright.sync_api import Page
-
+from webarena.agent import Agent
 from webarena.browser_env import (
     Action,
+    AsyncEpisodeRunner,
     AsyncScriptBrowserEnv,
     DetachedPage,
+    ScreencastConfig,
+    ScreenshotConfig,
     ScriptBrowserEnv,
+    Trajectory,
     create_focus_and_click_action,
     create_goto_url_action,
     create_keyboard_type_action,
+    create_new_tab_action,
+    create_page_focus_action,
     create_playwright_action,
     create_scroll_action,
+    create_stop_action,
+)
+from webarena.browser_env.accessibility_tree import (
+    ColumnarAccessibilityTree,
 )
 from webarena.browser_env.actions import create_id_based_action
 from webarena.browser_env.env_config import (
@@ -27,6 +52,12 @@ from webarena.browser_env.env_config import (
     SHOPPING,
     SHOPPING_ADMIN,
 )
+from webarena.browser_env.processors import (
+    LazyObservation,
+    TextObservationProcessor,
+)
+from webarena.browser_env.screencast import Screencast
+from webarena.browser_env.settle import PageSettler
 
 
 def test_script_browser_env(script_browser_env: ScriptBrowserEnv) -> None:
@@ -51,6 +82,799 @@ def test_script_browser_env(script_browser_env: ScriptBrowserEnv) -> None:
     assert info["page"].url == "https://www.rfc-editor.org/rfc/rfc2606.html"
 
 
+def test_persistent_browser_reset(
+    persistent_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    env = persistent_script_browser_env
+    env.reset()
+    first_browser, first_context = env.browser, env.context
+    env.reset()
+    env.reset()
+    # the pool is reused round-robin and only the context is recreated
+    assert env.browser is first_browser
+    assert env.context is not first_context
+    assert len(env.browsers) == 2
+    assert all(browser.is_connected() for browser in env.browsers)
+    assert len(first_browser.contexts) == 1
+    _, success, _, _, info = env.step(
+        create_goto_url_action("http://www.example.com"),
+    )
+    assert success
+    assert info["page"].url == "http://www.example.com/"
+
+
+def test_prefetch_next_task(
+    persistent_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    temp_config = tempfile.NamedTemporaryFile("w", delete=False)
+    config = {
+        "start_url": "http://www.example.com |AND| "
+        "https://www.rfc-editor.org/rfc/rfc2606.html",
+    }
+    json.dump(config, temp_config)
+    temp_config.close()
+
+    env = persistent_script_browser_env
+    env.reset()
+    env.prefetch(temp_config.name)
+    assert env.prefetched is not None
+    prefetched_context = env.prefetched[1]
+    env.reset(options={"config_file": temp_config.name})
+    assert env.prefetched is None
+    assert env.context is prefetched_context
+    assert len(env.context.pages) == 2
+    assert env.page.url == "http://www.example.com/"
+
+
+def test_event_settle_strategy() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        settle_strategy="event",
+        sleep_after_execution=2.0,
+    )
+    try:
+        _, info = env.reset()
+        assert 0 <= info["settle_time"] <= 2.5
+        _, success, _, _, info = env.step(
+            create_goto_url_action("http://www.example.com"),
+        )
+        assert success
+        # the sleep is only an upper bound, a static page settles earlier
+        assert info["settle_time"] < 2.0
+        assert info["page"].url == "http://www.example.com/"
+    finally:
+        env.close()
+
+
+def test_resource_blocking(
+    accessibility_tree_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    env = accessibility_tree_script_browser_env
+    # on by default for text observations
+    assert env.resource_blocker is not None
+    env.reset()
+    obs, success, _, _, info = env.step(
+        create_goto_url_action("https://en.wikipedia.org/wiki/Main_Page")
+    )
+    assert success
+    assert env.resource_blocker.blocked > 0
+    assert "Wikipedia" in obs["text"]
+
+    image_env = ScriptBrowserEnv(observation_type="image")
+    assert image_env.resource_blocker is None
+    image_env.close()
+
+
+def test_har_record_and_replay(tmp_path: Path) -> None:
+    config_file = tmp_path / "0.json"
+    config_file.write_text(json.dumps({"start_url": "http://www.example.com"}))
+    har_dir = str(tmp_path / "har")
+
+    env = ScriptBrowserEnv(headless=True, har_mode="record", har_dir=har_dir)
+    env.reset(options={"config_file": str(config_file)})
+    env.close()
+    assert (tmp_path / "har" / "0.har").exists()
+
+    env = ScriptBrowserEnv(headless=True, har_mode="replay", har_dir=har_dir)
+    try:
+        obs, info = env.reset(options={"config_file": str(config_file)})
+        assert info["page"].url == "http://www.example.com/"
+        assert "Example Domain" in obs["text"]
+        assert info["har_misses"] == []
+        # never fetched from the network
+        _, _, _, _, info = env.step(
+            create_goto_url_action(
+                "https://www.rfc-editor.org/rfc/rfc2606.html"
+            )
+        )
+        assert info["har_misses"] == [
+            "https://www.rfc-editor.org/rfc/rfc2606.html"
+        ]
+    finally:
+        env.close()
+
+
+def test_lazy_page_content(script_browser_env: ScriptBrowserEnv) -> None:
+    env = script_browser_env
+    env.reset()
+    _, _, _, _, info = env.step(
+        create_goto_url_action("http://www.example.com")
+    )
+    page = info["page"]
+    assert isinstance(page, DetachedPage)
+    assert page.url == "http://www.example.com/"
+    # serialized on demand while the page is still at this step
+    assert "Example Domain" in page.content
+    _, _, _, _, info = env.step(
+        create_goto_url_action("https://www.rfc-editor.org/rfc/rfc2606.html")
+    )
+    # the html that was read is kept, the unread one expires
+    assert "Example Domain" in page.content
+    unread_page = info["page"]
+    env.step(create_scroll_action("down"))
+    with pytest.raises(RuntimeError):
+        unread_page.content
+
+    env.eager_page_content = True
+    _, _, _, _, info = env.step(
+        create_goto_url_action("http://www.example.com")
+    )
+    env.step(create_scroll_action("down"))
+    assert "Example Domain" in info["page"].content
+
+
+def test_lazy_observation_modalities(
+    accessibility_tree_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    env = accessibility_tree_script_browser_env
+    obs, _ = env.reset()
+    assert set(obs) == {"text", "image"}
+    # the screenshot is taken on read
+    assert obs["image"].shape[:2] == (720, 1280)
+
+    obs, _, _, _, _ = env.step(
+        create_goto_url_action("http://www.example.com")
+    )
+    text_obs, _, _, _, _ = env.step(
+        create_scroll_action("down"), observation_modalities=("text",)
+    )
+    assert "Example Domain" in text_obs["text"]
+    assert "image" not in text_obs
+    # the previous step is gone, its screenshot can't be taken anymore
+    with pytest.raises(RuntimeError):
+        obs["image"]
+
+
+def test_lazy_observation_copies() -> None:
+    calls = []
+
+    def take_screenshot() -> np.ndarray:
+        calls.append(1)
+        return np.zeros((2, 2, 3), dtype=np.uint8)
+
+    obs = LazyObservation({"text": "page"}, {"image": take_screenshot})
+    # the copies compute the screenshot instead of copying a placeholder
+    for obs_copy in [dict(obs), {**obs}, copy.copy(obs), dict(obs.items())]:
+        assert isinstance(obs_copy["image"], np.ndarray)
+    assert len(calls) == 1
+
+    obs = LazyObservation({"text": "page"}, {"image": take_screenshot})
+    obs.expire()
+    with pytest.raises(RuntimeError):
+        dict(obs)
+    with pytest.raises(RuntimeError):
+        np.asarray(dict.__getitem__(obs, "image"))
+    # a pickled observation leaves out what expired unread
+    assert pickle.loads(pickle.dumps(obs)) == {"text": "page"}
+
+
+def test_reuse_unchanged_observation() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        reuse_unchanged_observation=True,
+    )
+    try:
+        env.reset()
+        obs, _, _, _, info = env.step(
+            create_goto_url_action("http://www.example.com")
+        )
+        assert not info["observation_reuse"]["reused"]
+        # the page fits in the viewport, scrolling does nothing
+        scrolled_obs, _, _, _, info = env.step(create_scroll_action("down"))
+        assert info["observation_reuse"]["reused"]
+        assert info["observation_reuse"]["hit_rate"] == 0.5
+        assert scrolled_obs["text"] == obs["text"]
+        assert scrolled_obs["image"].shape[:2] == (720, 1280)
+        assert info["observation_metadata"]["text"]["cdp_calls"] == 0
+
+        _, _, _, _, info = env.step(
+            create_playwright_action(
+                "page.evaluate(\"document.body.append('Appended')\")"
+            )
+        )
+        assert not info["observation_reuse"]["reused"]
+        assert "Appended" in env.obs["text"]  # type: ignore[index]
+
+        env.step(create_new_tab_action())
+        _, _, _, _, info = env.step2(lambda: None)
+        assert info["observation_reuse"]["reused"]
+        # the tab titles are part of the text observation
+        _, _, _, _, info = env.step2(
+            lambda: env.context.pages[0].evaluate("document.title = 'Renamed'")
+        )
+        assert not info["observation_reuse"]["reused"]
+        assert "Tab 0: Renamed" in env.obs["text"]  # type: ignore[index]
+    finally:
+        env.close()
+
+
+def test_cdp_screenshot() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="image",
+        screenshot_config=ScreenshotConfig(
+            format="jpeg", quality=70, downsample=2
+        ),
+    )
+    try:
+        assert env.observation_space["image"].shape == (360, 640, 3)
+        obs, _ = env.reset()
+        first_image = obs["image"]
+        assert first_image.shape == (360, 640, 3)
+        first_image[:] = 0
+        obs, _, _, _, _ = env.step(
+            create_goto_url_action("http://www.example.com")
+        )
+        # every observation is a new array the caller can write into
+        assert obs["image"].flags.writeable
+        assert not np.shares_memory(obs["image"], first_image)
+        assert obs["image"].any()
+    finally:
+        env.close()
+
+
+def test_screencast_image_observation() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="image",
+        sleep_after_execution=0.5,
+        screencast_config=ScreencastConfig(quality=50, buffer_size=4),
+    )
+    try:
+        env.reset()
+        obs, _, _, _, _ = env.step(
+            create_goto_url_action("http://www.example.com")
+        )
+        assert obs["image"].shape == (720, 1280, 3)
+        frames = env.screencast_frames()
+        assert 0 < len(frames) <= 4
+        assert frames[-1].to_numpy().shape == (720, 1280, 3)
+    finally:
+        env.close()
+
+
+def test_screencast_stale_frames() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="image",
+        sleep_after_execution=0.0,
+        screencast_config=ScreencastConfig(max_width=640, max_height=640),
+    )
+    try:
+        assert env.observation_space["image"].shape == (360, 640, 3)
+        env.reset()
+        page = env.page
+        client = env.get_page_client(page)
+        page.wait_for_timeout(500)
+        assert env.screencast is not None
+        assert env.screencast.latest_frame(client) is not None
+        # no event is dispatched between the action and the observation, the
+        # frames from before the action are not used
+        obs, _, _, _, _ = env.step(
+            create_goto_url_action("http://www.example.com")
+        )
+        assert env.screencast.latest_frame(client) is None
+        assert obs["image"].shape == (360, 640, 3)
+    finally:
+        env.close()
+
+
+class _FakeCDPSession:
+    def __init__(self) -> None:
+        self.handlers: dict[str, Callable[[dict[str, Any]], None]] = {}
+        self.sent: list[str] = []
+
+    def on(self, event: str, handler: Callable[[Any], None]) -> None:
+        self.handlers[event] = handler
+
+    def send(self, method: str, params: dict[str, Any] = {}) -> None:
+        self.sent.append(method)
+
+    def paint(self, timestamp: float) -> None:
+        self.handlers["Page.screencastFrame"](
+            {
+                "data": "",
+                "sessionId": 1,
+                "metadata": {"timestamp": timestamp},
+            }
+        )
+
+
+def test_screencast_late_pre_action_frame() -> None:
+    screencast = Screencast(ScreencastConfig())
+    client = _FakeCDPSession()
+    screencast.track(client)  # type: ignore[arg-type]
+    assert client.sent == ["Page.startScreencast"]
+    before_action = time.time()
+    screencast.invalidate_frames()
+    # painted before the action, dispatched while the env settles
+    client.paint(before_action)
+    assert screencast.latest_frame(client) is None  # type: ignore[arg-type]
+    client.paint(time.time() + 1)
+    frame = screencast.latest_frame(client)  # type: ignore[arg-type]
+    assert frame is not None and frame.timestamp > before_action
+    assert client.sent.count("Page.screencastFrameAck") == 2
+
+
+def test_settle_ignores_lost_requests() -> None:
+    settler = PageSettler(network_idle_time=0.1)
+    client = _FakeCDPSession()
+    settler.track(client)  # type: ignore[arg-type]
+    # its loadingFinished event never comes, e.g., the page navigated away
+    client.handlers["Network.requestWillBeSent"]({"requestId": "lost"})
+    page = SimpleNamespace(
+        wait_for_timeout=lambda ms: time.sleep(ms / 1000),
+        evaluate=lambda *args: 0,
+    )
+    assert settler.settle(page, client, timeout=0.3) >= 0.3  # type: ignore[arg-type]
+    time.sleep(0.1)
+    # pending for longer than the settle window, it is not waited for again
+    assert settler.settle(page, client, timeout=0.3) < 0.25  # type: ignore[arg-type]
+
+
+def test_trace_policy(tmp_path: Path) -> None:
+    env = ScriptBrowserEnv(
+        headless=True, trace_policy="failures", trace_snapshots=False
+    )
+    try:
+        env.reset()
+        env.step(create_goto_url_action("http://www.example.com"))
+        # a successful task leaves no trace
+        env.save_trace(tmp_path / "success.zip", success=True)
+        env.reset()
+        env.step(create_goto_url_action("http://www.example.com"))
+        env.save_trace(tmp_path / "failure.zip", success=False)
+    finally:
+        env.close()
+    assert not (tmp_path / "success.zip").exists()
+    assert (tmp_path / "failure.zip").stat().st_size > 0
+
+    env = ScriptBrowserEnv(
+        headless=True, trace_policy="every_n", trace_every_n=2
+    )
+    try:
+        for idx in range(3):
+            env.reset()
+            # a restore continues the task, it is neither counted nor lost
+            env.restore(env.checkpoint())
+            env.save_trace(tmp_path / "every_n" / f"{idx}.zip")
+        assert env.trace_staging is not None
+        staging_dir = env.trace_staging.staging_dir
+    finally:
+        env.close()
+    assert sorted(p.name for p in (tmp_path / "every_n").iterdir()) == [
+        "0-before-restore-0.zip",
+        "0.zip",
+        "2-before-restore-0.zip",
+        "2.zip",
+    ]
+    # close removes the staging directory
+    assert not staging_dir.exists()
+
+
+def test_backend_node_paths() -> None:
+    root = {
+        "backendNodeId": 1,
+        "nodeName": "#document",
+        "children": [
+            {"backendNodeId": 2, "nodeName": "HTML"},
+            {
+                "backendNodeId": 3,
+                "nodeName": "DIV",
+                "shadowRoots": [
+                    {
+                        "backendNodeId": 4,
+                        "nodeName": "#document-fragment",
+                        "shadowRootType": "open",
+                        "children": [
+                            {"backendNodeId": 5, "nodeName": "#text"}
+                        ],
+                    }
+                ],
+            },
+            {
+                "backendNodeId": 6,
+                "nodeName": "IFRAME",
+                "contentDocument": {
+                    "backendNodeId": 7,
+                    "nodeName": "#document",
+                    "children": [{"backendNodeId": 8, "nodeName": "HTML"}],
+                },
+            },
+        ],
+    }
+    paths = TextObservationProcessor.backend_node_paths(root, {2, 5, 8, 9})
+    assert paths == {
+        2: ([0], "HTML"),
+        5: ([1, "s", 0], "#text"),
+        8: ([2, "d", 0], "HTML"),
+    }
+
+
+def test_batched_bounding_boxes(
+    accessibility_tree_current_viewport_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    env = accessibility_tree_current_viewport_script_browser_env
+    env.reset()
+    _, success, _, _, info = env.step(
+        create_goto_url_action("https://russmaxdesign.github.io/exercise/")
+    )
+    assert success
+    # a few calls per observation instead of two per node
+    assert info["observation_metadata"]["text"]["cdp_calls"] <= 8
+
+    processor = env.observation_handler.text_processor
+    client = env.get_page_client(env.page)
+    tree = processor.build_accessibility_tree(
+        client.send("Accessibility.getFullAXTree", {})["nodes"], client
+    )
+    _, thunks = processor.pending_tree_bounding_boxes(tree)
+    processor.force_thunks(client, thunks)
+    for thunk in thunks:
+        expected = TextObservationProcessor.BoundingBoxThunk(
+            client, thunk.backend_node_id
+        ).force()
+        assert thunk.force() == expected
+
+
+def test_vectorized_viewport_ratio() -> None:
+    rng = np.random.default_rng(0)
+    bounds = rng.uniform(-500, 2000, (1000, 4))
+    bounds[:, 2:] = np.abs(bounds[:, 2:]) + 1
+    config = {"win_width": 1280, "win_height": 720}
+    ratios = TextObservationProcessor.get_elements_in_viewport_ratio(
+        bounds, config  # type: ignore[arg-type]
+    )
+    for (x, y, width, height), ratio in zip(bounds.tolist(), ratios):
+        assert ratio == TextObservationProcessor.get_element_in_viewport_ratio(
+            x, y, width, height, config  # type: ignore[arg-type]
+        )
+
+
+def _prune_tree_one_by_one(
+    tree: list[dict[str, Any]], removal_mask: list[bool]
+) -> list[dict[str, Any]]:
+    # the node by node removal the viewport filtering used to do
+    cursors = {node["nodeId"]: cursor for cursor, node in enumerate(tree)}
+    for node, removed in zip(tree, removal_mask):
+        if not removed:
+            continue
+        parent = tree[cursors[node["parentId"]]]
+        index = parent["childIds"].index(node["nodeId"])
+        parent["childIds"].pop(index)
+        for child_id in node["childIds"]:
+            parent["childIds"].insert(index, child_id)
+            index += 1
+        for child_id in node["childIds"]:
+            tree[cursors[child_id]]["parentId"] = node["parentId"]
+        node["parentId"] = "[REMOVED]"
+    return [node for node in tree if node["parentId"] != "[REMOVED]"]
+
+
+def test_prune_tree() -> None:
+    for seed in range(100):
+        rng = random.Random(seed)
+        num_nodes = rng.randint(1, 300)
+        tree: list[dict[str, Any]] = [
+            {"nodeId": "0", "parentId": "-1", "childIds": []}
+        ]
+        for idx in range(1, num_nodes):
+            parent = rng.randrange(idx)
+            tree.append(
+                {"nodeId": str(idx), "parentId": str(parent), "childIds": []}
+            )
+            tree[parent]["childIds"].append(str(idx))
+        # the DOM tree is in document order, the accessibility tree is not
+        if seed % 2:
+            tree = tree[:1] + rng.sample(tree[1:], len(tree) - 1)
+        removal_mask = [False] + [rng.random() < 0.7 for _ in tree[1:]]
+        assert TextObservationProcessor.prune_tree(
+            copy.deepcopy(tree), removal_mask  # type: ignore[arg-type]
+        ) == _prune_tree_one_by_one(copy.deepcopy(tree), removal_mask)
+
+
+def test_parse_trees_without_recursion() -> None:
+    def ax_node(
+        node_id: str, role: str, name: str, child_ids: list[str]
+    ) -> dict[str, Any]:
+        return {
+            "nodeId": node_id,
+            "role": {"value": role},
+            "name": {"value": name},
+            "childIds": child_ids,
+            "backendDOMNodeId": int(node_id),
+            "union_bound": None,
+        }
+
+    accessibility_tree = [
+        ax_node("1", "RootWebArea", "Example", ["2", "5", "404"]),
+        # skipped, its children are not indented
+        ax_node("2", "generic", "", ["3", "4"]),
+        ax_node("3", "link", "More", []),
+        ax_node("4", "StaticText", "Hello", []),
+        ax_node("5", "list", "", ["6"]),
+        ax_node("6", "listitem", "Item", []),
+    ]
+    # the node without a backend id is shown but its children are not
+    # indented
+    del accessibility_tree[4]["backendDOMNodeId"]
+    accessibility_tree[4]["name"]["value"] = "List"
+    text, obs_nodes_info = TextObservationProcessor.parse_accessibility_tree(
+        accessibility_tree  # type: ignore[arg-type]
+    )
+    assert text == "\n".join(
+        [
+            "[1] RootWebArea 'Example'",
+            "\t[3] link 'More'",
+            "\t[4] StaticText 'Hello'",
+            "\t[5] list 'List'",
+            "\t[6] listitem 'Item'",
+        ]
+    )
+    assert list(obs_nodes_info) == ["1", "3", "4", "6"]
+
+    # far deeper than the recursion limit
+    depth = 5_000
+    accessibility_tree = [
+        ax_node(str(idx), "group", f"Level {idx}", [str(idx + 1)])
+        for idx in range(1, depth + 1)
+    ]
+    accessibility_tree[-1]["childIds"] = []
+    text, _ = TextObservationProcessor.parse_accessibility_tree(
+        accessibility_tree  # type: ignore[arg-type]
+    )
+    lines = text.split("\n")
+    assert len(lines) == depth
+    assert lines[-1] == "\t" * (depth - 1) + f"[{depth}] group 'Level {depth}'"
+
+    dom_tree = [
+        {
+            "nodeId": str(idx),
+            "nodeName": "div",
+            "attributes": "",
+            "nodeValue": f"Level {idx}",
+            "backendNodeId": idx,
+            "union_bound": None,
+            "childIds": [str(idx + 1)] if idx + 1 < depth else [],
+        }
+        for idx in range(depth)
+    ]
+    html, obs_nodes_info = TextObservationProcessor.parse_html(
+        dom_tree  # type: ignore[arg-type]
+    )
+    lines = html.split("\n")
+    assert len(lines) == depth + 1 and lines[-1] == ""
+    assert lines[1] == "\t[1] <div> Level 1"
+    assert len(obs_nodes_info) == depth
+
+
+def test_render_accessibility_tree() -> None:
+    roles = ["generic", "StaticText", "link", "button", "time", "listitem"]
+    names = ["", "Hello", "Hello world", "world", "More"]
+    env = SimpleNamespace(page=SimpleNamespace(url="http://www.example.com"))
+    for seed in range(50):
+        rng = random.Random(seed)
+        tree: list[dict[str, Any]] = []
+        for idx in range(rng.randint(1, 200)):
+            node = {
+                "nodeId": str(idx + 1),
+                "role": {"value": rng.choice(roles) if idx else "RootWebArea"},
+                "name": {"value": rng.choice(names)},
+                "properties": [],
+                "childIds": [],
+                "backendDOMNodeId": idx,
+                "union_bound": None,
+            }
+            if rng.random() < 0.1:
+                node["properties"].append(
+                    {"name": "hidden", "value": {"value": True}}
+                )
+            tree.append(node)
+            if idx:
+                parent = rng.randrange(max(0, idx - 5), idx)
+                tree[parent]["childIds"].append(node["nodeId"])
+
+        (
+            content,
+            obs_nodes_info,
+        ) = TextObservationProcessor.parse_accessibility_tree(
+            copy.deepcopy(tree)  # type: ignore[arg-type]
+        )
+        (
+            single_pass_content,
+            single_pass_obs_nodes_info,
+            web_things,
+        ) = TextObservationProcessor.render_accessibility_tree(
+            copy.deepcopy(tree), env  # type: ignore[arg-type]
+        )
+        assert single_pass_content == (
+            TextObservationProcessor.clean_accesibility_tree(content)
+        )
+        assert single_pass_obs_nodes_info == obs_nodes_info
+        for thing in web_things.get_all_descendants():
+            assert all(child.parent is thing for child in thing.children)
+
+        # the same tree by column
+        columnar_tree = ColumnarAccessibilityTree.from_nodes(tree)
+        assert TextObservationProcessor.parse_accessibility_tree(
+            columnar_tree
+        ) == (content, obs_nodes_info)
+        assert TextObservationProcessor.parse_accessibility_tree(
+            columnar_tree.to_nodes()  # type: ignore[arg-type]
+        ) == (content, obs_nodes_info)
+        removal_mask = [False] + [rng.random() < 0.6 for _ in tree[1:]]
+        assert TextObservationProcessor.parse_accessibility_tree(
+            columnar_tree.prune(np.array(removal_mask))
+        ) == TextObservationProcessor.parse_accessibility_tree(
+            TextObservationProcessor.prune_tree(
+                copy.deepcopy(tree), removal_mask  # type: ignore[arg-type]
+            )
+        )
+
+
+def test_snapshot_bounds_viewport_filtering() -> None:
+    """The bounds of the DOMSnapshot keep the same nodes in the viewport
+    as the bounds of getBoundingClientRect, at the same positions"""
+    kept_nodes: dict[str, dict[str, list[list[float] | None]]] = {}
+    for bounds_source in ["snapshot", "client_rect"]:
+        env = ScriptBrowserEnv(
+            headless=True,
+            observation_type="accessibility_tree",
+            current_viewport_only=True,
+            bounds_source=bounds_source,
+        )
+        try:
+            env.reset()
+            obs, success, _, _, info = env.step(
+                create_goto_url_action(
+                    "https://russmaxdesign.github.io/exercise/"
+                )
+            )
+            assert success
+            assert "link 'McKenna/Bell'" in obs["text"]
+            metadata = info["observation_metadata"]["text"]
+            if bounds_source == "snapshot":
+                # the DOMSnapshot and the accessibility tree only
+                assert metadata["cdp_calls"] == 2
+            # the element ids are not stable across browsers, the nodes are
+            # matched by their text, the bounds are forced before closing
+            nodes: dict[
+                str, list[list[float] | None]
+            ] = collections.defaultdict(list)
+            for node_info in metadata["obs_nodes_info"].values():
+                text = node_info["text"].split("] ", 1)[-1]
+                union_bound = node_info["union_bound"]
+                nodes[text].append(
+                    union_bound.force() if union_bound else None
+                )
+            kept_nodes[bounds_source] = nodes
+        finally:
+            env.close()
+
+    snapshot_nodes = kept_nodes["snapshot"]
+    client_rect_nodes = kept_nodes["client_rect"]
+    assert snapshot_nodes.keys() == client_rect_nodes.keys()
+    for text, snapshot_bounds in snapshot_nodes.items():
+        client_rect_bounds = client_rect_nodes[text]
+        assert len(snapshot_bounds) == len(client_rect_bounds), text
+        for snapshot_bound, client_rect_bound in zip(
+            sorted(snapshot_bounds, key=lambda bound: bound or []),
+            sorted(client_rect_bounds, key=lambda bound: bound or []),
+        ):
+            if snapshot_bound is None or client_rect_bound is None:
+                assert snapshot_bound == client_rect_bound, text
+                continue
+            np.testing.assert_allclose(
+                snapshot_bound, client_rect_bound, atol=1.0, err_msg=text
+            )
+
+
+def test_accessibility_tree_skips_dom_snapshot(
+    accessibility_tree_script_browser_env: ScriptBrowserEnv,
+) -> None:
+    env = accessibility_tree_script_browser_env
+    env.reset()
+    obs, success, _, _, info = env.step(
+        create_goto_url_action("http://www.example.com")
+    )
+    assert success
+    assert "Example Domain" in obs["text"]
+    metadata = info["observation_metadata"]["text"]
+    # only Accessibility.getFullAXTree
+    assert metadata["cdp_calls"] == 1
+    assert set(metadata["timings"]) == {
+        "tabs",
+        "browser_info",
+        "tree",
+        "render",
+    }
+
+
+def test_incremental_accessibility_tree() -> None:
+    env = ScriptBrowserEnv(
+        headless=True,
+        observation_type="accessibility_tree",
+        current_viewport_only=True,
+        incremental_accessibility_tree=True,
+    )
+    try:
+        env.reset()
+        _, success, _, _, info = env.step(
+            create_goto_url_action("https://russmaxdesign.github.io/exercise/")
+        )
+        assert success
+        metadata = info["observation_metadata"]["text"]
+        assert metadata["accessibility_tree_fetch"] == "full"
+
+        obs, success, _, _, info = env.step(create_scroll_action("down"))
+        assert success
+        metadata = info["observation_metadata"]["text"]
+        assert metadata["accessibility_tree_fetch"] == "incremental"
+
+        # the same observation as from the full tree
+        processor = env.observation_handler.text_processor
+        processor.incremental_accessibility_tree = False
+        assert obs["text"] == processor.process(
+            env.page, env.get_page_client(env.page), env
+        )
+    finally:
+        env.close()
+
+
+def test_checkpoint_restore(script_browser_env: ScriptBrowserEnv) -> None:
+    env = script_browser_env
+    env.reset()
+    env.step(create_goto_url_action("http://www.example.com"))
+    env.page.evaluate("localStorage.setItem('key', 'value')")
+    env.step(create_new_tab_action())
+    env.step(
+        create_goto_url_action("https://www.rfc-editor.org/rfc/rfc2606.html")
+    )
+    env.step(create_scroll_action("down"))
+    scroll_y = env.page.evaluate("window.scrollY")
+    assert scroll_y > 0
+    checkpoint = env.checkpoint()
+    assert len(checkpoint.pages) == 2
+    assert checkpoint.current_page == 1
+
+    env.step(create_goto_url_action("http://www.example.com"))
+    _, info = env.restore(checkpoint)
+    assert len(env.context.pages) == 2
+    assert env.page is env.context.pages[1]
+    assert info["page"].url == "https://www.rfc-editor.org/rfc/rfc2606.html"
+    assert env.page.evaluate("window.scrollY") == scroll_y
+    example_page = env.context.pages[0]
+    assert example_page.url == "http://www.example.com/"
+    assert example_page.evaluate("localStorage.getItem('key')") == "value"
+
+    # the episode continues from the restored state
+    _, success, _, _, info = env.step(create_page_focus_action(0))
+    assert success
+    assert info["page"].url == "http://www.example.com/"
+
+
 @pytest.mark.asyncio
 async def test_async_script_browser_env(
     async_script_browser_env: AsyncScriptBrowserEnv,
@@ -76,6 +900,42 @@ async def test_async_script_browser_env(
     assert info["page"].url == "https://www.rfc-editor.org/rfc/rfc2606.html"
 
 
+class _ScriptedAgent(Agent):
+    def reset(self, test_config_file: str) -> None:
+        self.actions = [
+            create_goto_url_action("http://www.example.com"),
+            create_stop_action(""),
+        ]
+
+    def next_action(
+        self, trajectory: Trajectory, intent: str, meta_data: Any
+    ) -> Action:
+        # runs in a worker thread, see Agent.anext_action
+        time.sleep(0.1)
+        return self.actions.pop(0)
+
+
+def test_async_episode_runner() -> None:
+    config_files = []
+    for task_id in range(3):
+        temp_config = tempfile.NamedTemporaryFile("w", delete=False)
+        json.dump({"task_id": task_id, "intent": "test"}, temp_config)
+        temp_config.close()
+        config_files.append(temp_config.name)
+
+    runner = AsyncEpisodeRunner(_ScriptedAgent, max_concurrency=2)
+    results = runner.run(config_files)
+    assert [result.config_file for result in results] == config_files
+    for result in results:
+        assert not result.error, result.error
+        # reset state, goto action, state, stop action
+        assert len(result.trajectory) == 4
+        assert (
+            result.trajectory[-2]["info"]["page"].url  # type: ignore[index]
+            == "http://www.example.com/"
+        )
+
+
 def collate_actions(actions: list[Action]) -> dict[str, list[object]]:
     action_dict = collections.defaultdict(list)
     for action in actions:
@@ -7,7 +7,6 @@ from typing import Any
 
 import pytest
 from py import test
-
 from webarena.agent import Agent, TeacherForcingAgent
 from webarena.browser_env import ActionTypes, ScriptBrowserEnv
 from webarena.browser_env.env_config import *
@@ -143,11 +142,16 @@ def test_html_content_match_success(
 
     trajectory = tf_roll_out(agent, env, config_file)
 
+    client = env.get_page_client(env.page)
+    listeners = len(client._impl_obj.listeners("Network.loadingFinished"))
     evalutor = HTMLContentEvaluator()
-    score = evalutor(
-        trajectory, config_file, env.page, env.get_page_client(env.page)
+    for _ in range(2):
+        score = evalutor(trajectory, config_file, env.page, client)
+        assert score == 1.0
+    # the settler of each evaluation removes its listeners
+    assert (
+        len(client._impl_obj.listeners("Network.loadingFinished")) == listeners
     )
-    assert score == 1.0
 
 
 def test_html_content_match_fail(script_browser_env: ScriptBrowserEnv) -> None: